@@ -0,0 +1,83 @@
+"""
+# Benchmark the exact cover solver against the propagation solver on
+# clue-sparse boards
+#
+# Generates boards, blanks out a fraction of their clues, and times both
+# solvers counting solutions up to 2, guided by the generated solution.
+# Each board has its own random stream spawned from --seed, so a run makes
+# the same boards every time.
+#
+# From the main directory:
+#   python3 -m benchmarks.exactcover --boards 5 --sizes 15 20 --remove 0.3
+#
+"""
+import argparse
+import time
+
+import numpy as np
+
+from boardGenerator.generator import BoardGenerator, GenerationFailedError
+from fillomino.exactcover import ExactCoverSolver
+from fillomino.solver import Solver
+
+
+def generateBoard(rows, columns, rng):
+  """ Generate a board from the numpy Generator <rng>, retrying until generation succeeds """
+  while True:
+    try:
+      return BoardGenerator(rows, columns, seed=rng).generate()
+    except GenerationFailedError:
+      pass
+
+
+def removeClues(initialValues, fraction, rng):
+  """ Blank out <fraction> of the clues, at random """
+  
+  clues = initialValues.copy()
+  filled = np.flatnonzero(clues)
+  clues.flat[rng.choice(filled, int(len(filled) * fraction), replace=False)] = 0
+  return clues
+
+
+def timeSolver(solverClass, clues, guide):
+  """ Time counting up to 2 solutions, returning the count, seconds, and search nodes """
+  
+  startTime = time.perf_counter()
+  solver = solverClass(clues, guide=guide)
+  numSolutions = solver.countSolutions(limit=2)
+  return numSolutions, time.perf_counter() - startTime, solver.numNodes
+
+
+def main():
+  parser = argparse.ArgumentParser(description="Benchmark the exact cover solver")
+  parser.add_argument("--boards", type=int, default=5, help="boards of each size")
+  parser.add_argument("--sizes", type=int, nargs="+", default=[15, 20], help="board sizes (square)")
+  parser.add_argument("--remove", type=float, default=0.3, help="fraction of the clues to blank out")
+  parser.add_argument("--seed", type=int, default=0, help="random seed")
+  args = parser.parse_args()
+  
+  solvers = [("propagation", Solver), ("exact cover", ExactCoverSolver)]
+  
+  print("{:>5} {:>6} {:>6}  {:>12} {:>8} {:>7}  {:>12} {:>8} {:>7}"
+        .format("size", "board", "blank", "propagation", "nodes", "count", "exact cover", "nodes", "count"))
+  for size in args.sizes:
+    times = {name: [] for name, _ in solvers}
+    for boardNum, boardSeed in enumerate(np.random.SeedSequence(args.seed).spawn(args.boards)):
+      rng   = np.random.default_rng(boardSeed)
+      board = generateBoard(size, size, rng)
+      clues = removeClues(board.getInitialValues(), args.remove, rng)
+      
+      line = "{:>5} {:>6} {:>6.0%} ".format(size, boardNum, np.mean(clues == 0))
+      for name, solverClass in solvers:
+        numSolutions, seconds, numNodes = timeSolver(solverClass, clues, board.getFinalValues())
+        times[name].append(seconds)
+        line += " {:>11.3f}s {:>8} {:>7}".format(seconds, numNodes, numSolutions)
+      print(line, flush=True)
+    
+    for name, _ in solvers:
+      print("{:>5} {:>12}: mean {:.3f}s, median {:.3f}s, max {:.3f}s"
+            .format(size, name, np.mean(times[name]), np.median(times[name]), np.max(times[name])))
+
+
+if __name__ == "__main__":
+  main()
@@ -0,0 +1,52 @@
+"""
+# Benchmark board generation on a single core
+#
+# Generates boards one after another in this process, and reports boards
+# per second for each size. Failed attempts count towards the time taken.
+# Each board has its own random stream spawned from --seed, so a run makes
+# the same boards every time.
+#
+# From the main directory:
+#   python3 -m benchmarks.generator --boards 20 --sizes 10 20
+#
+"""
+import argparse
+import time
+
+import numpy as np
+
+from boardGenerator.generator import BoardGenerator, GenerationFailedError
+
+
+def timeGeneration(rows, columns, numBoards, seed):
+  """ Generate <numBoards> boards, returning the seconds taken and the number of failed attempts """
+  
+  numFailed = 0
+  startTime = time.perf_counter()
+  for boardSeed in np.random.SeedSequence(seed).spawn(numBoards):
+    rng = np.random.default_rng(boardSeed)
+    while True:
+      try:
+        BoardGenerator(rows, columns, seed=rng).generate()
+        break
+      except GenerationFailedError:
+        numFailed += 1
+  return time.perf_counter() - startTime, numFailed
+
+
+def main():
+  parser = argparse.ArgumentParser(description="Benchmark board generation")
+  parser.add_argument("--boards", type=int, default=20, help="boards of each size")
+  parser.add_argument("--sizes", type=int, nargs="+", default=[10, 20], help="board sizes (square)")
+  parser.add_argument("--seed", type=int, default=0, help="random seed")
+  args = parser.parse_args()
+  
+  print("{:>5} {:>7} {:>9} {:>12} {:>7}".format("size", "boards", "seconds", "boards/sec", "failed"))
+  for size in args.sizes:
+    seconds, numFailed = timeGeneration(size, size, args.boards, args.seed)
+    print("{:>5} {:>7} {:>9.2f} {:>12.2f} {:>7}".format(size, args.boards, seconds, args.boards / seconds, numFailed),
+          flush=True)
+
+
+if __name__ == "__main__":
+  main()
@@ -0,0 +1,68 @@
+"""
+# Benchmark counting solutions without knowing the answer
+#
+# Generates uniquely solvable boards, and times the propagation solver
+# counting solutions up to 2 with no guide. Each board has its own random
+# stream spawned from --seed, so a run makes the same boards every time.
+#
+# From the main directory:
+#   python3 -m benchmarks.solver --boards 5 --sizes 15 20
+#
+"""
+import argparse
+import time
+
+import numpy as np
+
+from boardGenerator.generator import BoardGenerator, GenerationFailedError
+from fillomino.solver import SearchLimitError, Solver
+
+
+def generateBoard(rows, columns, rng):
+  """ Generate a uniquely solvable board from the numpy Generator <rng>, retrying until generation succeeds """
+  while True:
+    try:
+      return BoardGenerator(rows, columns, uniqueSolution=True, seed=rng).generate()
+    except GenerationFailedError:
+      pass
+
+
+def timeCount(clues, maxNodes):
+  """ Time counting up to 2 solutions with no guide, returning the count (None if it gave up), seconds, and nodes """
+  
+  startTime = time.perf_counter()
+  solver = Solver(clues)
+  try:
+    numSolutions = solver.countSolutions(limit=2, maxNodes=maxNodes)
+  except SearchLimitError:
+    numSolutions = None
+  return numSolutions, time.perf_counter() - startTime, solver.numNodes
+
+
+def main():
+  parser = argparse.ArgumentParser(description="Benchmark unguided solution counts")
+  parser.add_argument("--boards", type=int, default=5, help="boards of each size")
+  parser.add_argument("--sizes", type=int, nargs="+", default=[15, 20], help="board sizes (square)")
+  parser.add_argument("--max-nodes", type=int, default=5000, help="search nodes to give up after")
+  parser.add_argument("--seed", type=int, default=0, help="random seed")
+  args = parser.parse_args()
+  
+  print("{:>5} {:>6} {:>6} {:>9} {:>8} {:>7}".format("size", "board", "clues", "seconds", "nodes", "count"))
+  for size in args.sizes:
+    times = []
+    for boardNum, boardSeed in enumerate(np.random.SeedSequence(args.seed).spawn(args.boards)):
+      board = generateBoard(size, size, np.random.default_rng(boardSeed))
+      clues = board.getInitialValues()
+      
+      numSolutions, seconds, numNodes = timeCount(clues, args.max_nodes)
+      times.append(seconds)
+      print("{:>5} {:>6} {:>6} {:>8.3f}s {:>8} {:>7}"
+            .format(size, boardNum, np.count_nonzero(clues), seconds, numNodes,
+                    "gave up" if numSolutions is None else numSolutions), flush=True)
+    
+    print("{:>5} mean {:.3f}s, median {:.3f}s, max {:.3f}s"
+          .format(size, np.mean(times), np.median(times), np.max(times)))
+
+
+if __name__ == "__main__":
+  main()
@@ -1,105 +1,134 @@
 import logging
-import random
-import threading
 
 logger = logging.getLogger(__name__)
 
 import copy
 import datetime
+import time
 
 import numpy as np
 
-from scipy import signal
+from scipy import ndimage, signal
 
 from fillomino.board import Board
+from fillomino.polyomino import PolyominoLibrary
+from fillomino.solver import SearchLimitError, Solver
 
 
 class GenerationFailedError(Exception):
   pass
 
-class CellList(object):
+class CellSet(object):
   """
-  # Treat a dictionary as a list to get the dicionary speed-up, but with
-  # the easier list operations
+  # Set of (row, column) cells on a board with the given dimensions
+  #
+  # Each cell is stored by its flat index (row * columns + column):
+  #  -the indices in the set are kept, in no particular order, in a list
+  #  -each cell's position in that list is kept too, -1 if it's not in the
+  #   set, so adding, removing, and picking a random cell are all O(1)
+  #  -removing a cell moves the last cell into its place
+  #
   """
   
   @staticmethod
-  def filledList(rows, columns):
-    """ Return a CellList of all possible (row,col) locations """
-    cellList = CellList()
-    cellList.cells = {row:{col:True for col in range(columns)} for row in range(rows)}
-    return cellList
+  def filledSet(rows, columns):
+    """ Return a CellSet of all possible (row,col) locations """
+    return CellSet.fromIndices(rows, columns, range(rows * columns))
   
-  def __init__(self):
-    self.cells = {}
+  @staticmethod
+  def fromIndices(rows, columns, indices):
+    """ Return a CellSet of the cells with the given flat indices """
+    cellSet = CellSet(rows, columns)
+    cellSet.indices = list(indices)
+    for position, index in enumerate(cellSet.indices):
+      cellSet.positions[index] = position
+    return cellSet
+  
+  def __init__(self, rows, columns):
+    self.rows      = rows
+    self.columns   = columns
+    self.indices   = []
+    self.positions = [-1] * (rows * columns)
   
   def append(self, item):
     """ Add a cell """
     
     row, col = item
-    rowCells        = self.cells.get(row, {})
-    rowCells[col]   = True
-    self.cells[row] = rowCells
+    index = row * self.columns + col
+    if self.positions[index] < 0:
+      self.positions[index] = len(self.indices)
+      self.indices.append(index)
   
   def remove(self, item):
-    """ Remove a cell """
-    if self.__contains__(item):
-      row, col = item
-      del self.cells[row][col]
-      if len(self.cells[row]) == 0:
-        del self.cells[row]
+    """ Remove a cell, if it's in the set """
+    
+    row, col = item
+    if not (0 <= row < self.rows and 0 <= col < self.columns):
+      return
+    index    = row * self.columns + col
+    position = self.positions[index]
+    if position < 0:
+      return
+    
+    # move the last cell into the removed cell's place
+    lastIndex = self.indices.pop()
+    if lastIndex != index:
+      self.indices[position]    = lastIndex
+      self.positions[lastIndex] = position
+    self.positions[index] = -1
   
   def pop(self):
     """ Pop a cell from somewhere """
-    for row,col in iter(self):
-      del self.cells[row][col]
-      if len(self.cells[row]) == 0:
-        del self.cells[row]
-      return row,col
-    return None
-  
-  def randomCell(self):
-    """ Return a randomly chosen cell """
     
-    allCells   = (list(iter(self)))
-    cellChoice = random.randint(0, len(allCells)-1)
-    return allCells[cellChoice]
-    
-  def __deepcopy__(self, memodict={}):
-    newCopy = CellList()
-    newCopy.cells = copy.deepcopy(self.cells)
+    if not self.indices:
+      return None
+    index = self.indices.pop()
+    self.positions[index] = -1
+    return divmod(index, self.columns)
+  
+  def randomCell(self, rng):
+    """ Return a cell chosen with the numpy Generator <rng> """
+    return divmod(self.indices[int(rng.integers(len(self.indices)))], self.columns)
+  
+  def toMask(self):
+    """ Boolean (rows x columns) array of the cells in the set """
+    mask = np.zeros(self.rows * self.columns, bool)
+    mask[self.indices] = True
+    return mask.reshape(self.rows, self.columns)
+  
+  def copy(self):
+    newCopy = CellSet(self.rows, self.columns)
+    newCopy.indices   = list(self.indices)
+    newCopy.positions = list(self.positions)
     return newCopy
   
+  def __deepcopy__(self, memodict={}):
+    return self.copy()
+  
   def __contains__(self, item):
     row, col = item
-    return bool(self.cells.get(row)) and bool(self.cells.get(row).get(col))
+    return 0 <= row < self.rows and 0 <= col < self.columns and\
+           self.positions[row * self.columns + col] >= 0
   
   def __iter__(self):
     """ Iterate over cells """
-    for k1,v1 in self.cells.items():
-      if v1:
-        for k2,_ in v1.items():
-          yield k1,k2
+    columns = self.columns
+    for index in tuple(self.indices):
+      yield divmod(index, columns)
   
   def __bool__(self):
-    return bool(self.cells)
+    return bool(self.indices)
   
   def __len__(self):
-    size = 0
-    for _,v in self.cells.items():
-      size += len(v)
-    return size
+    return len(self.indices)
   
   def __str__(self):
     
     # empty list
-    if not self.cells:
+    if not self.indices:
       return "[]"
     
-    op = "["
-    for row,col in iter(self):
-      op += "({},{}), ".format(row, col)
-    return op[:-2] + "]"
+    return "[" + ", ".join("({},{})".format(row, col) for row, col in iter(self)) + "]"
 
 
 
@@ -116,117 +145,50 @@ class BoardGenerator(object):
   #     -OR in at least groups of 2or3
   """
   
-  # numpy random is not thread-safe, so multiple threads get the same
-  # random numbers
-  numpyThreadLock = threading.RLock()
-  
   # max times to try creating a new random group within a blank region
   MAX_GROUP_CREATION_ATTEMPTS = 200
   
-  # max times to try and randomly fill a small region when an initial fill fails
-  MAX_FILL_SMALL_REGION_ATTEMPTS = 10
-  
-  @staticmethod
-  def _cellsAreNeighbours(row1, column1, row2, column2):
-    """ Are the two cells beside each other """
-    return (row1+1, column1) == (row2, column2) or\
-           (row1-1, column1) == (row2, column2) or\
-           (row1, column1+1) == (row2, column2) or\
-           (row1, column1-1) == (row2, column2)
+  # number of random groups checked at a time for walling in a blank cell
+  PLACEMENT_BATCH_SIZE = 256
   
+  # when looking for another solution that differs at a cell, the distances
+  # around the cell searched first, and the most search nodes to spend on
+  # each search
+  OTHER_SOLUTION_RADII     = (2, 4)
+  MAX_OTHER_SOLUTION_NODES = 10
   
-  @staticmethod
-  def _groupNeighbourCellsTogether(cellList):
-    """ Given a list of cells, return a list of connected cell groups """
-
-    cellList = copy.deepcopy(cellList)
-    
-    # list of connected cell groups
-    groups = []
-    
-    while len(cellList) > 0:
-      
-      # start a new cell group
-      cellGroup = CellList()
-      cellGroup.append(cellList.pop())
-      
-      # for each candidate neighbour cell
-      for cell in cellList:
-        
-        # if the candidate cell is touching any of the cells in this group
-        for cellInGroup in cellGroup:
-          if BoardGenerator._cellsAreNeighbours(*cellInGroup, *cell):
-            
-            # add candidate to our group
-            cellGroup.append(cell)
-            break
-            
-      
-      # if we added any cells to our group, remove them from the candidate list
-      if len(cellGroup) > 1:
-        for cell in cellGroup:
-          cellList.remove(cell)
-      
-      # add this group to our overall list of groups
-      groups.append(cellGroup)
-    
-    return groups
-  
-  @staticmethod
-  def hasIslandOnes(board):
+  def __init__(self, rows, columns, uniqueSolution=False, minimiseClues=False, seed=None):
     """
-    # Find areas of the board where a single blank space is surrounded by 1s
-    #
-    # Three possible locations:
-    #  -2-point match on a board corner
-    #  -3-point match on a board edge
-    #  -4-point match in the middle of the board
+    # -seed: (int, SeedSequence, or Generator) for the generator's own
+    #        numpy random stream, so the same seed and size always make
+    #        the same boards. None draws fresh entropy
     #
     """
-
-    # get the board dimensions
-    rows, columns = board.getBoardDimensions()
-    
-    # convolution filter looking for islands
-    islandFilter = np.array([[0,1,0],
-                             [1,0,1],
-                             [0,1,0]])
     
-    # find islands
-    matches = signal.convolve2d(board.getValues(), islandFilter, mode="same")
-    
-    # are there any 2-point matches in a corner
-    if matches[0,0] == 2 or matches[rows-1,0] == 2 or\
-       matches[0,columns-1] == 2 or matches[rows-1,columns-1] == 2:
-      return True
-    
-    # are there any 3-point matches on an edge
-    if (matches[0,:] == 3).any() or (matches[rows-1,:] == 3).any() or\
-       (matches[:,0] == 3).any() or (matches[:,columns-1] == 3).any():
-      return True
+    self.rows = rows
+    self.columns = columns
     
-    # are there any 4-point matches in the centre
-    if np.argwhere(matches[1:-1,1:-1] == 4).size > 0:
-      return True
+    # every random choice comes from this stream, so generators in other
+    # threads or processes don't share any random state
+    self.rng = np.random.default_rng(seed)
     
-    return False
-
-  def __init__(self, rows, columns):
+    # add clues until the board has exactly one solution
+    self.uniqueSolution = uniqueSolution
     
-    self.rows = rows
-    self.columns = columns
+    # remove clues for as long as the board stays uniquely solvable
+    #  -implies uniqueSolution
+    self.minimise = minimiseClues
     
     
   
   
   
   @staticmethod
-  def newRandomGroup(board, cellList):
+  def newRandomGroup(board, cellList, rng):
     """
     # Create a new, random-sized group in the cells given
+    #  -returns the CellSet of the group's cells
     """
-    board = copy.deepcopy(board)
-    cellList = copy.deepcopy(cellList)
     
     regionSize = len(cellList)
     
@@ -236,41 +198,25 @@ class BoardGenerator(object):
     creationAttempts = 0
     while True:
       
-      localCellList = copy.deepcopy(cellList)
-      
       # pick a random group size
-      groupSize = random.randint(2, min(regionSize, 9)-1)
+      groupSize = int(rng.integers(2, min(regionSize, 9)))
       #groupSize = random.choice(groups, p=groupWeights)
       
       # pick a random cell to start from
-      row, column = localCellList.randomCell()
+      row, column = cellList.randomCell(rng)
       
-      #print("row", row)
-      #print("column", column)
-      #print("groupSize", groupSize)
+      # pick a random group of that size that covers the cell
+      newGroup = BoardGenerator._randomPlacement(board, cellList, groupSize, rng, (row, column))
       
-      # create the group
-      newGroup = BoardGenerator._walkFreeCells(row, column, localCellList, limit=groupSize)
-      #for c in newGroup:
-      #  print(c)
-      #print(cellList)
-      #print("=====")
-      # add the group to the board
-      board = BoardGenerator.assignNumber(board, groupSize, newGroup, updateGroups=False)
-      board.updateGroups()
-      
-      # if the board is valid after adding the new group, then then we're good
-      if board.isBoardValid():
+      # add the group to the board, keeping it if the board is still valid
+      if newGroup is not None and BoardGenerator._tryAssignment(board, groupSize, newGroup):
         break
-      
-      # board is invalid, so undo our group add:
-      board = BoardGenerator.assignNumber(board, 0, newGroup, updateGroups=False)
 
       creationAttempts += 1
       if creationAttempts > BoardGenerator.MAX_GROUP_CREATION_ATTEMPTS:
         raise GenerationFailedError("Reached the maximum number of failed attempts to fill a region")
       
-    return board, newGroup
+    return newGroup
     
     # add in a full, randomly meandering group of X
     #  -X is randomly chosen (for each attempt)
@@ -286,136 +232,185 @@ class BoardGenerator(object):
     #  -option to skip updating the group information if we don't care about that
     #
     """
-    board = copy.deepcopy(board)
-    cellList = copy.deepcopy(cellList)
-
     for row,col in cellList:
       board.updateCell(row, col, number, updateGroups=updateGroups)
-    return board
   
   @staticmethod
-  def addInitialOnes(board, numOnes):
-    """ Add in 1's at random places of the board, making sure they're all valid """
-    board = copy.deepcopy(board)
+  def addInitialOnes(board, numOnes, rng):
+    """
+    # Add in 1's at random places of the board, making sure they're all valid
+    #  -returns a CellSet of the cells we added
+    #  -raises GenerationFailedError if there's no room left for another 1
+    #
+    # A 1 can go in a blank cell if:
+    #  -it's not next to another 1
+    #  -it doesn't leave a blank neighbour walled in by 1s
+    #
+    # The number of 1s next to each cell, and the set of cells a 1 can still
+    # go in, are kept up to date as each 1 is added, so each one is placed
+    # without checking the whole board. Adding 1s only ever rules cells out.
+    #
+    """
 
-    # locations of cells we've added
-    usedCells = CellList()
-    
     # get board dimensions
     rows, columns = board.getBoardDimensions()
     
+    def neighbours(row, col):
+      return [(newRow, newCol) for newRow, newCol in [(row, col-1), (row, col+1), (row-1, col), (row+1, col)]
+              if 0 <= newRow < rows and 0 <= newCol < columns]
+    
+    # number of neighbours, and neighbouring 1s, of each cell
+    ones  = board.getValues() == 1
+    blank = board.getValues() == 0
+    paddedOnes  = np.pad(ones, 1).astype(np.int8)
+    paddedCells = np.pad(np.ones((rows, columns), np.int8), 1)
+    oneNeighbours = paddedOnes[:-2, 1:-1] + paddedOnes[2:, 1:-1] + paddedOnes[1:-1, :-2] + paddedOnes[1:-1, 2:]
+    numNeighbours = paddedCells[:-2, 1:-1] + paddedCells[2:, 1:-1] + paddedCells[1:-1, :-2] + paddedCells[1:-1, 2:]
+    
+    # a blank cell with only one neighbour left that isn't a 1 rules out 1s
+    # in all of its neighbours
+    paddedTight = np.pad(blank & (oneNeighbours + 1 >= numNeighbours), 1)
+    nextToTight = paddedTight[:-2, 1:-1] | paddedTight[2:, 1:-1] | paddedTight[1:-1, :-2] | paddedTight[1:-1, 2:]
+    
+    # cells we can still put a 1 in
+    legalCells = CellSet.fromIndices(rows, columns,
+                                     np.flatnonzero(blank & (oneNeighbours == 0) & ~nextToTight).tolist())
+    oneNeighbours = oneNeighbours.tolist()
+    numNeighbours = numNeighbours.tolist()
+    blank         = blank.tolist()
+    
+    # locations of cells we've added
+    usedCells = CellSet(rows, columns)
+    
     for i in range(numOnes):
       
-      # loop until we add a "1" to a valid location on the board
-      while True:
-        row = random.randint(0, rows-1)
-        col = random.randint(0, columns-1)
+      if not legalCells:
+        raise GenerationFailedError("No room left for another 1 after adding {}".format(i))
         
-        # make sure we haven't randomly selected this location before
-        if (row, col) in usedCells:
-          continue
-        
-        # set the location to 1
-        board.values.itemset(row, col, 1)
-      
-        # make sure we haven't created a group of island 1's
-        if not BoardGenerator.hasIslandOnes(board):
+      # set a random legal location to 1
+      row, col = legalCells.randomCell(rng)
+      board.updateCell(row, col, 1)
+      usedCells.append((row, col))
+      legalCells.remove((row, col))
+      blank[row][col] = False
         
-          # if the board is still valid after our change, move on
-          board.updateGroups()
-          if board.isBoardValid():
-            usedCells.append((row, col))
-            break
-      
-        # we made the board invalid, so undo our change
-        board.values.itemset(row, col, 0)
-
+      # no more 1s next to this one, or next to any neighbour it nearly walls in
+      for neighRow, neighCol in neighbours(row, col):
+        oneNeighbours[neighRow][neighCol] += 1
+        legalCells.remove((neighRow, neighCol))
+        if blank[neighRow][neighCol] and\
+           oneNeighbours[neighRow][neighCol] + 1 >= numNeighbours[neighRow][neighCol]:
+          for cell in neighbours(neighRow, neighCol):
+            legalCells.remove(cell)
     
-    # return the board and the new cell location
-    return board, usedCells
+    # return the new cell locations
+    return usedCells
   
   
   @staticmethod
   def findBlankRegions(freeCells):
     """
-    # Find number of "blank" regions we have. Walk along the freeCells list
-    # until we run out of cells or walk into a previously visited cell.
-    #
-    # Idea is split a group of freeCells up into 1 or more connected regions.
+    # Split a set of free cells up into its connected "blank" regions, by
+    # labelling the connected cells of the free cell mask in a single pass
+    #  -returns a list of CellSets, one per region
     #
-    # -freeCells: (CellList) of blank cells
+    # -freeCells: (CellSet) of blank cells
     #
     """
     
-    # create a copy of the free cells so we can alter it
-    freeCells = copy.deepcopy(freeCells)
+    rows, columns = freeCells.rows, freeCells.columns
+    regions, numRegions = ndimage.label(freeCells.toMask())
     
-    blankRegions = []
+    # sort the cells by region, so each region is a contiguous run of cells
+    flatRegions = regions.ravel()
+    cellOrder   = np.argsort(flatRegions, kind="stable").tolist()
+    regionEnds  = np.cumsum(np.bincount(flatRegions, minlength=numRegions+1)).tolist()
     
-    # walk along the freeCells
-    while freeCells:
-      
-      # remove a free cell
-      row, column = freeCells.pop()
-      
-      # walk from this cell, along all the connected free cells, in order to
-      # find the extent of this blank region
-      blankRegions.append(BoardGenerator._walkFreeCells(row, column, freeCells))
-    
-    # return all the blank regions we found
-    return blankRegions
+    return [CellSet.fromIndices(rows, columns, cellOrder[regionEnds[region-1]:regionEnds[region]])
+            for region in range(1, numRegions+1)]
   
     
   @staticmethod
-  def _walkFreeCells(row, column, freeCells, visitedCells=None, limit=None):
+  def _randomPlacement(board, cellList, groupSize, rng, cell=None):
     """
-    # Starting from (row,column), walk along the cells in <freeCells>,
-    # ignoring the cells we've already visited.
-    #  -returns the list of cells we walked along
+    # Pick a random group of <groupSize> cells from <cellList>, out of all
+    # the groups that don't touch another group of <groupSize>
+    #  -looks the groups up in the polyomino library
+    #  -prefers groups that don't leave a lone blank cell, walled in by the
+    #   group, as those are hard to fill later
+    #  -returns a CellSet of the group's cells, or None if there are none
     #
-    # -row:          (int) row of current cell
-    # -column:       (int) column of current cell
-    # -freeCells:    (CellList) of cells we can walk to
-    # -visitedCells: (CellList) of cells we've already been to on this walk
-    # -limit:        (int) max number of cells to walk
+    # -cell: (row, column) the group must cover, or None
     #
     """
     
-    #freeCells = copy.deepcopy(freeCells)
-    #visitedCells = copy.deepcopy(visitedCells)
-    
-    if visitedCells is None:
-      visitedCells = CellList()
-    
-    # visited our start cell
-    visitedCells.append((row, column))
+    rows, columns = board.getBoardDimensions()
     
-    # if we've reached the limit
-    if limit is not None and len(visitedCells) == limit:
-      return visitedCells
+    # cells the group can use
+    region = cellList.toMask()
+    
+    # cells next to a group of the same size would join it
+    sameSize = np.pad(board.getValues() == groupSize, 1)
+    allowed  = region & ~(sameSize[:-2, 1:-1] | sameSize[2:, 1:-1] | sameSize[1:-1, :-2] | sameSize[1:-1, 2:])
+    
+    placements = PolyominoLibrary.getPlacements(allowed, groupSize, cell)
+    if len(placements) == 0:
+      return None
+    
+    # N, S, W, E neighbours of each cell, with an extra, never-free cell off the board
+    flatIndices = np.pad(np.arange(rows * columns).reshape(rows, columns), 1, constant_values=rows * columns)
+    neighbours  = np.stack([flatIndices[:-2, 1:-1], flatIndices[2:, 1:-1],
+                            flatIndices[1:-1, :-2], flatIndices[1:-1, 2:]], axis=-1).reshape(-1, 4)
+    neighbours  = np.vstack([neighbours, np.full((1, 4), rows * columns)])
+    
+    # number of free neighbours of each cell
+    free    = np.append(region.ravel(), False)
+    numFree = free[neighbours].sum(axis=1)
+    
+    def leavesHole(groups):
+      # each group's cells and their neighbours, sorted so the repeats of a
+      # cell are next to each other
+      #  -a neighbour counts once for every cell of the group it's next to, and
+      #   the group's own cells count for more than any cell's neighbours
+      numNextTo = 4 * groupSize
+      cells   = np.concatenate([groups, neighbours[groups].reshape(len(groups), numNextTo)], axis=1)
+      weights = np.concatenate([np.full(groups.shape, numNextTo+1), np.ones((len(groups), numNextTo), int)], axis=1)
+      order   = np.argsort(cells, axis=1)
+      cells   = np.take_along_axis(cells, order, axis=1)
+      weights = np.take_along_axis(weights, order, axis=1)
+      
+      # a group walls in a free cell if all of that cell's free neighbours are in the group
+      firstOfCell = np.ones(cells.shape, bool)
+      firstOfCell[:, 1:] = cells[:, 1:] != cells[:, :-1]
+      cellWeights = np.bincount(np.cumsum(firstOfCell.ravel()) - 1, weights.ravel())
+      groupOfCell, _ = np.nonzero(firstOfCell)
+      cells    = cells[firstOfCell]
+      walledIn = free[cells] & (cellWeights == numFree[cells])
+      holes = np.zeros(len(groups), bool)
+      holes[groupOfCell[walledIn]] = True
+      return holes
+    
+    # the first group, in a random order, that doesn't wall in a cell
+    #  -only checks groups until it finds one, a batch at a time
+    #  -if they all do, any group
+    order = rng.permutation(len(placements))
+    for start in range(0, len(order), BoardGenerator.PLACEMENT_BATCH_SIZE):
+      batch = placements[order[start:start+BoardGenerator.PLACEMENT_BATCH_SIZE]]
+      holes = leavesHole(batch)
+      if not holes.all():
+        placement = batch[np.argmin(holes)]
+        break
+    else:
+      placement = placements[order[0]]
     
-    # try walking N, S, E, W
-    directions = [(row, column+1), (row, column-1), (row+1, column), (row-1, column)]
-    random.shuffle(directions)
-    for newRow, newColumn in directions:
-  
-      # next cell location is valid if it:
-      #  -is a free cell
-      #  -hasn't already been visited
-      if (newRow, newColumn) in freeCells and (newRow, newColumn) not in visitedCells:
-        
-        # remove next cell from free cells and walk to it
-        freeCells.remove((newRow, newColumn))
-        BoardGenerator._walkFreeCells(newRow, newColumn, freeCells, visitedCells, limit=limit)
-        
-        if limit is not None and len(visitedCells) == limit:
-          break
-        
-    return visitedCells
+    newGroup = CellSet(rows, columns)
+    for flatCell in placement:
+      newGroup.append(divmod(int(flatCell), columns))
+    return newGroup
   
   
   @staticmethod
-  def populateRegions(board, freeCells):
+  def populateRegions(board, freeCells, rng):
     """
     # Break the list of free cells into contiguous "blank" regions. For each
     # blank region, add a randomly-sized number-group. See how many blank
@@ -423,13 +418,12 @@ class BoardGenerator(object):
     #
     # Will end up with a mostly-populated grid, with a few lone patches of un-filled
     # cells.
+    #  -fills in the board in place
+    #  -returns the list of lone patches
     #
     """
     #logger.debug("populating regions")
     
-    board = copy.deepcopy(board)
-    freeCells = copy.deepcopy(freeCells)
-    
     # list of cell groups that couldn't be filled in the random group-adding
     #  -will be of size 9 or smaller
     loneGroupList = []
@@ -452,7 +446,7 @@ class BoardGenerator(object):
       elif regionSize < 10:
       
         # fill this region with a group of that size, or smaller if that's invalid
-        board, usedCells = BoardGenerator.fillSmallRegion(board, blankCellList)
+        usedCells = BoardGenerator.fillSmallRegion(board, blankCellList, rng)
       
         # remove the newly added cells from our list of available cells
         for usedCell in usedCells:
@@ -463,14 +457,14 @@ class BoardGenerator(object):
         
           # group the left over cells into contiguous groups, and add
           # each group to the loneGroupList
-          for group in BoardGenerator._groupNeighbourCellsTogether(blankCellList):
+          for group in BoardGenerator.findBlankRegions(blankCellList):
             loneGroupList.append(group)
     
       # insert a new group to try and break up the region
       else:
       
         # add in a randomly meandering group of X cells
-        board, usedCells = BoardGenerator.newRandomGroup(board, blankCellList)
+        usedCells = BoardGenerator.newRandomGroup(board, blankCellList, rng)
       
         # remove the newly added cells from our list of available cells
         for usedCell in usedCells:
@@ -481,8 +475,8 @@ class BoardGenerator(object):
         blankRegionList += BoardGenerator.findBlankRegions(blankCellList)
     
     
-    # return our mostly-filled board and our list of loneGroups
-    return board, loneGroupList
+    # return our list of loneGroups
+    return loneGroupList
   
   def generate(self):
     """ Generate a new board """
@@ -490,17 +484,18 @@ class BoardGenerator(object):
     startTime = datetime.datetime.utcnow()
     
     # create a new blank board
+    #  -every step fills it in place, rolling back the attempts that fail
     bd = Board(rows=self.rows, columns=self.columns)
     
     # add in some random 1's
     numOnesLowerBound = int(np.ceil(self.rows * self.columns * 0.15))
     numOnesUpperBound = int(np.ceil(self.rows * self.columns * 0.20))
-    numOnes = random.randint(numOnesLowerBound, numOnesUpperBound-1)
-    bd, usedCells = BoardGenerator.addInitialOnes(bd, numOnes)
+    numOnes = int(self.rng.integers(numOnesLowerBound, numOnesUpperBound))
+    usedCells = BoardGenerator.addInitialOnes(bd, numOnes, self.rng)
     #logger.debug("{} one-cells".format(numOnes))
     
     # list of all available cells
-    freeCells = CellList.filledList(self.rows, self.columns)
+    freeCells = CellSet.filledSet(self.rows, self.columns)
 
     # remove the newly added 1-cells from our list of available cells
     for usedCell in usedCells:
@@ -509,7 +504,7 @@ class BoardGenerator(object):
     # fill most of the board by breaking the blank cells down into
     # contiguous groups and filling the space with randomly-sized
     # number groups
-    bd, loneGroupList = BoardGenerator.populateRegions(bd, freeCells)
+    loneGroupList = BoardGenerator.populateRegions(bd, freeCells, self.rng)
     
     # if we have lone groups of cells that we couldn't fill, try to
     # merge them into their neighbour's groups
@@ -518,7 +513,7 @@ class BoardGenerator(object):
       
       # try to add the cell to the (N,S,W,E)
       try:
-        bd = BoardGenerator.mergeLoneGroup(bd, loneGroup)
+        BoardGenerator.mergeLoneGroup(bd, loneGroup)
         
       except GenerationFailedError:
         cellsRemaining = len(loneGroupList)-iCell
@@ -542,7 +537,19 @@ class BoardGenerator(object):
       raise SystemError(errMsg)
     
     # create the initial state of the board
-    bd = BoardGenerator.defineInitialBoardState(bd)
+    bd = BoardGenerator.defineInitialBoardState(bd, self.rng)
+    
+    # make sure the board has one solution, and record what it cost
+    if self.uniqueSolution or self.minimise:
+      checkStartTime = time.perf_counter()
+      bd, numCluesAdded = BoardGenerator.makeUnique(bd)
+      if self.minimise:
+        bd = BoardGenerator.minimiseClues(bd, self.rng)
+      
+      stats = bd.getBoardStats("stats") or {}
+      stats["uniqueness"] = {"seconds":     round(time.perf_counter() - checkStartTime, 3),
+                             "clues_added": numCluesAdded}
+      bd.setBoardStats(stats=stats)
     
     #print(bd.getBoardStats("id"), "\n", bd.getFinalValues(), id(bd), "\n=============")
     return bd
@@ -552,16 +559,16 @@ class BoardGenerator(object):
   def mergeLoneGroup(board, cellList):
     """
     # Try to merge a group of blank cells into one of their neighbours
+    #  -fills in the board in place
     #
     """
     
     #logger.debug("lone cells: {}".format(cellList))
-    board = copy.deepcopy(board)
-    cellList = copy.deepcopy(cellList)
     
     # dimensions of grid
     maxRows, maxColumns = board.getBoardDimensions()
     
+    neighbourLabels = []
     neighbourGroups = []
     
     # for each cell in the group
@@ -580,17 +587,15 @@ class BoardGenerator(object):
           if groupSize == 0 or groupSize + len(cellList) > 9:
             continue
             
-          # look through all of the board's groups of this size
-          for group in board.getValidGroups()[groupSize]:
-            
-            # if we've found the group our neighbour belongs to
-            if (neighRow, neighCol) in group:
-  
-              # add group to our list if we don't already have a record of it
-              if group not in neighbourGroups:
-                neighbourGroups.append(group)
-                
-              break
+          # find the (valid) group our neighbour belongs to
+          label = board.getGroupLabel(neighRow, neighCol)
+          if board.getGroupStatus(label) != Board.GROUP_VALID:
+            continue
+          
+          # add group to our list if we don't already have a record of it
+          if label not in neighbourLabels:
+            neighbourLabels.append(label)
+            neighbourGroups.append(board.getGroupCells(label))
           
     
     #logger.debug("neighbours:")
@@ -601,25 +606,19 @@ class BoardGenerator(object):
     # in this group
     if len(cellList) not in [len(group) for group in neighbourGroups]:
       #logger.debug("filling in group")
-      board, success = BoardGenerator._tryAssignment(board, len(cellList), cellList)
-      return board
+      BoardGenerator._tryAssignment(board, len(cellList), cellList)
+      return
     
     # try merging with each of our neighbours in turn
     for group in neighbourGroups:
       
       # create a new, merged group
-      newGroup = copy.deepcopy(group)
-      for cell in cellList:
-        newGroup.append(cell)
+      newGroup = group + list(cellList)
       
       # try to create the new group
-      board, success = BoardGenerator._tryAssignment(board, len(newGroup), newGroup)
-      if success:
-        return board
-      
-      # merging failed, so revert the original group
-      board = BoardGenerator.assignNumber(board, len(group), group, updateGroups=False)
-      board.updateGroups()
+      #  -if merging fails, the original group is put back
+      if BoardGenerator._tryAssignment(board, len(newGroup), newGroup):
+        return
       
     # no luck merging
     msg = "Could not merge lone cell group: {}".format(cellList)
@@ -629,51 +628,43 @@ class BoardGenerator(object):
   @staticmethod
   def _tryAssignment(board, regionSize, cellList):
     """
-    # Fill cells with a number and check if the board is valid, reverting
-    # the changes if it isn't
-    #  -returns the board and whether the assignment was successful
+    # Fill cells with a number and check if the board is valid, rolling
+    # back the changes if it isn't
+    #  -returns whether the assignment was successful
     """
 
-    board = copy.deepcopy(board)
+    board.beginTransaction()
     
     # assign the cells
-    board = BoardGenerator.assignNumber(board, regionSize, cellList, updateGroups=False)
-    board.updateGroups()
+    BoardGenerator.assignNumber(board, regionSize, cellList)
     
-    # if we were successful, return
+    # if we were successful, keep the changes
     if board.isBoardValid():
-      return board, True
+      board.commitTransaction()
+      return True
     
-    # if we failed, revert the changes and return
+    # if we failed, put the cells back the way they were
     else:
-      board = BoardGenerator.assignNumber(board, 0, cellList, updateGroups=False)
-      board.updateGroups()
-      return board, False
+      board.rollbackTransaction()
+      return False
   
   
   @staticmethod
-  def _findIndicesToRemove(groupNum, probToKeep):
+  def _findIndicesToRemove(groupNum, probToKeep, rng):
     
     # total number to key (at least 1)
-    with BoardGenerator.numpyThreadLock:
-      seed = abs(np.int32(threading.get_ident() + datetime.datetime.utcnow().timestamp()))
-      np.random.seed(seed)
-      numToKeep = max(1, int(np.sum(np.random.binomial(1, probToKeep, groupNum))))
-      
-      # randomly choose <total-numToKeep> cells to remove
-      return np.random.choice(list(range(groupNum)), groupNum - numToKeep, replace=False)
+    numToKeep = max(1, int(rng.binomial(groupNum, probToKeep)))
+    
+    # randomly choose <total-numToKeep> cells to remove
+    return rng.choice(groupNum, groupNum - numToKeep, replace=False)
 
   @staticmethod
   def _removeSparseAreas(rows, columns, cellList):
     
     #return cellList
     
-    cellList = copy.deepcopy(cellList)
-    
     # turn the empty cells into a rows x columns matrix
-    boardVals = np.zeros((rows, columns))
-    for cell in cellList:
-      boardVals.itemset(*cell, 1)
+    boardVals = cellList.toMask().astype(float)
     
     # convolution filter looking for areas that will create an empty grid
     emptyRow = 3# int(np.floor(rows/10)) + 1
@@ -695,20 +686,20 @@ class BoardGenerator(object):
     
     # remove the gaps in the matrix
     for row, col in list(zip(*np.where(matches >= emptyGrid.size-1))):
-      boardVals.itemset(row, col, 0)
+      boardVals[row, col] = 0
     #print(boardVals)
 
     #print("=============================")
     
     # turn the matrix back into a cell list
-    newCellList = CellList()
-    for row, col in list(zip(*np.where(boardVals == 1))):
+    newCellList = CellSet(rows, columns)
+    for row, col in np.argwhere(boardVals == 1).tolist():
       newCellList.append((row, col))
     
     return newCellList
   
   @staticmethod
-  def defineInitialBoardState(board):
+  def defineInitialBoardState(board, rng):
     """
     # Define the initial state of a finished board
     #
@@ -716,6 +707,7 @@ class BoardGenerator(object):
     # cell being removed is proporitional to the group size (+- some magic)
     #
     # -board: (Board) where the current values are that of a valid, completed board
+    # -rng:   (Generator) numpy random stream to choose the cells with
     """
     
     # make sure the board is complete
@@ -731,7 +723,8 @@ class BoardGenerator(object):
     groups = board.getValidGroups()
     
     # list of cells we will remove
-    toRemove = CellList()
+    rows, columns = board.getBoardDimensions()
+    toRemove = CellSet(rows, columns)
     
     # probabilities to keep a cell in each numbered group
     probToKeep = {
@@ -750,62 +743,224 @@ class BoardGenerator(object):
       for group in groups[groupNum]:
         
         # randomly find X cells to remove, keeping at least one cell per group
-        for indexToRemove in BoardGenerator._findIndicesToRemove(groupNum, probToKeep[groupNum]):
+        for indexToRemove in BoardGenerator._findIndicesToRemove(groupNum, probToKeep[groupNum], rng):
           toRemove.append(group[indexToRemove])
     
     
     # make sure the grid isn't too sparse by populating "empty" regions
-    rows, columns = board.getBoardDimensions()
     toRemove = BoardGenerator._removeSparseAreas(rows, columns, toRemove)
     
     # blank out the board cells we have decided to remove
     for cellToRemove in toRemove:
       board.updateCell(*cellToRemove, 0, updateGroups=False, updateInitialCells=True)
-      board.updateGroups()
     
     # set the initial values
     board.initialValues = board.values.copy()
     
     return board
   
+  @staticmethod
+  def makeUnique(board):
+    """
+    # Add clues to the initial state of a finished board until it has
+    # exactly one solution, the final values
+    #  -returns the board and the number of clues added
+    #
+    # Any other solution has a different digit at some cell, so each blank
+    # cell is checked for a solution with another digit there. If there is
+    # one, the cell's final value becomes a clue. Either way the cell is then
+    # known, and later checks start from everything propagated so far.
+    #
+    # Cells whose search gives up are checked again at the end, when the
+    # clues added later have usually settled them; only if the search gives
+    # up again does the cell become a clue, to be safe. Last, the added clues
+    # that later clues made unnecessary are removed again, earliest first.
+    #
+    # -board: (Board) with initial and final values
+    #
+    """
+    
+    board = copy.deepcopy(board)
+    finalValues = board.getFinalValues()
+    
+    solver = Solver(board.getInitialValues(), guide=finalValues)
+    values, masks = solver.getInitialState()
+    if not solver.propagate(values, masks):
+      raise SystemError("the board's clues don't fit its final values")
+    
+    addedCells    = []
+    deferredCells = []
+    for row, column in np.argwhere(values == 0).tolist():
+      
+      # already worked out from earlier cells
+      if values[row, column] != 0:
+        continue
+      
+      # add a clue that tells the solutions apart, coming back to the cell
+      # later if the search gives up
+      otherSolution = BoardGenerator._otherSolutionAt(solver, values, masks, finalValues, row, column)
+      if otherSolution is None:
+        deferredCells.append((row, column))
+        continue
+      if otherSolution:
+        addedCells.append((row, column))
+      BoardGenerator._settleCell(board, solver, values, masks, finalValues, row, column, otherSolution)
+    
+    for row, column in deferredCells:
+      if values[row, column] != 0:
+        continue
+      addClue = BoardGenerator._otherSolutionAt(solver, values, masks, finalValues, row, column) is not False
+      if addClue:
+        addedCells.append((row, column))
+      BoardGenerator._settleCell(board, solver, values, masks, finalValues, row, column, addClue)
+    
+    board.initialValues = board.values.copy()
+    
+    # clues added later can make earlier ones unnecessary
+    board = BoardGenerator._removeClues(board, addedCells)
+    numCluesAdded = sum(int(board.getInitialValues()[row, column] != 0) for row, column in addedCells)
+    
+    return board, numCluesAdded
+  
+  @staticmethod
+  def _settleCell(board, solver, values, masks, finalValues, row, column, addClue):
+    """ Fill in a cell's final value, as a clue if <addClue>, and propagate it """
+    
+    digit = int(finalValues[row, column])
+    if addClue:
+      board.updateCell(row, column, digit, updateGroups=False, updateInitialCells=True)
+    
+    solver.assign(values, masks, [(row, column, digit, None)])
+    if not solver.propagate(values, masks):
+      raise SystemError("the board's clues don't fit its final values")
+  
+  @staticmethod
+  def minimiseClues(board, rng):
+    """
+    # Remove clues from the initial state of a finished board for as long
+    # as it stays uniquely solvable
+    #  -clues are tried once each, in a random order: removing clues never
+    #   removes solutions, so a clue that can't be removed now can't be
+    #   removed later either
+    #  -a clue is kept if the check for another solution gives up
+    #
+    # -board: (Board) with initial and final values, whose clues have
+    #         exactly one solution (see makeUnique())
+    # -rng:   (Generator) numpy random stream to order the clues with
+    #
+    """
+    
+    clueCells = np.argwhere(board.getInitialValues()).tolist()
+    rng.shuffle(clueCells)
+    return BoardGenerator._removeClues(board, clueCells)
+  
+  @staticmethod
+  def _removeClues(board, clueCells):
+    """
+    # Remove the clues at <clueCells>, in order, that the board's other
+    # clues make unnecessary
+    #  -returns a copy of the board with the new initial values
+    #  -a clue is kept if the check for another solution gives up
+    #
+    """
+    
+    board = copy.deepcopy(board)
+    finalValues = board.getFinalValues()
+    
+    # one solver for every check, so checks reuse the completions and dead
+    # ends found by earlier ones
+    solver = Solver(board.getInitialValues(), guide=finalValues)
+    clues  = board.getInitialValues().copy()
+    masks  = Solver.digitMasks(clues)
+    
+    # only the removed clue's cell changes, so its mask is changed in place
+    for row, column in clueCells:
+      clues[row, column] = 0
+      masks[row, column] = Solver.ALL_DIGITS
+      
+      # the other clues still have one solution if none has another digit here
+      if BoardGenerator._otherSolutionAt(solver, clues, masks, finalValues, row, column) is not False:
+        clues[row, column] = finalValues[row, column]
+        masks[row, column] = Solver.DIGIT_BITS[finalValues[row, column]]
+    
+    # set the new initial values
+    for row, column in np.argwhere(clues != board.getInitialValues()).tolist():
+      board.updateCell(row, column, clues[row, column], updateGroups=False, updateInitialCells=True)
+    board.initialValues = board.values.copy()
+    
+    return board
+  
+  @staticmethod
+  def _otherSolutionAt(solver, values, masks, finalValues, row, column):
+    """
+    # Does a (values, masks) state have a solution with a digit other than
+    # its final value at (row, column)
+    #  -looks for a solution that only differs close to the cell, with the
+    #   rest of the board fixed to its final values: these are quick, and
+    #   find most other solutions
+    #  -then propagates the whole state, and searches it
+    #  -each search gives up after MAX_OTHER_SOLUTION_NODES search nodes,
+    #   and None is returned if they all do
+    #
+    """
+    
+    values = values.copy()
+    masks  = masks.copy()
+    masks[row, column] &= ~np.uint16(1 << (int(finalValues[row, column])-1))
+    
+    def hasSolution(values, masks):
+      try:
+        return solver.countSolutions(limit=1, values=values, masks=masks,
+                                     maxNodes=BoardGenerator.MAX_OTHER_SOLUTION_NODES) != 0
+      except SearchLimitError:
+        return None
+    
+    # a solution that only differs close to the cell
+    finalMasks = Solver.digitMasks(finalValues)
+    for radius in BoardGenerator.OTHER_SOLUTION_RADII:
+      window = np.zeros(values.shape, bool)
+      window[max(0, row-radius):row+radius+1, max(0, column-radius):column+radius+1] = True
+      if hasSolution(np.where(window, values, finalValues), np.where(window, masks, finalMasks)):
+        return True
+    
+    # settled without searching
+    if not solver.propagate(values, masks):
+      return False
+    if (values != 0).all():
+      return True
+    
+    return hasSolution(values, masks)
+  
   
   @staticmethod
-  def fillSmallRegion(board, cellList):
+  def fillSmallRegion(board, cellList, rng):
     """
     # Fill in a small region (2-9 cells) with a single group. Tries successively
     # smaller groups if the initial fill is invalid.
-    #  -returns the board and a list of cells we have filled (if any)
+    #  -returns a list of cells we have filled (if any)
     #
     """
-    board = copy.deepcopy(board)
-    cellList = copy.deepcopy(cellList)
 
     regionSize = len(cellList)
     
     # try filling the region with a group of exactly that size
-    board, success = BoardGenerator._tryAssignment(board, regionSize, cellList)
-    if success:
-      return board, copy.deepcopy(cellList)
+    if BoardGenerator._tryAssignment(board, regionSize, cellList):
+      return list(cellList)
     
     # try smaller regions
     for smallerRegion in range(regionSize, 1, -1):
       
-      # try a few random walks to fill this smallerRegion
-      for _ in range(BoardGenerator.MAX_FILL_SMALL_REGION_ATTEMPTS):
-        
-        # start at a random cell
-        row, column = cellList.randomCell()
-        
-        # walk for <smallerRegion> number of cells
-        walkList = BoardGenerator._walkFreeCells(row, column, copy.deepcopy(cellList), limit=smallerRegion)
-        
-        # try filling this sub-region
-        board, success = BoardGenerator._tryAssignment(board, smallerRegion, walkList)
-        if success:
-          return board, walkList
+      # pick a random sub-region of <smallerRegion> cells
+      subRegion = BoardGenerator._randomPlacement(board, cellList, smallerRegion, rng)
+      if subRegion is None:
+        continue
+      
+      # try filling this sub-region
+      if BoardGenerator._tryAssignment(board, smallerRegion, subRegion):
+        return list(subRegion)
       
     # no luck
-    return board, CellList()
+    return []
 
 
     
\ No newline at end of file
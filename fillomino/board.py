@@ -1,15 +1,44 @@
 import copy
+import hashlib
 import logging
 logger = logging.getLogger(__name__)
 
 import numpy as np
 
+from scipy import ndimage
+
+from fillomino.codec import BoardCodec
+
 
 class Board(object):
   
   MIN_BOARD_ROWS    = 5
   MIN_BOARD_COLUMNS = 5
   
+  # status of each group label
+  #  -unused labels have no status
+  GROUP_NONE    = 0
+  GROUP_ORPHAN  = 1
+  GROUP_VALID   = 2
+  GROUP_INVALID = 3
+  
+  # largest group, the biggest number a cell can have
+  MAX_GROUP_SIZE = 9
+  
+  # candidate mask with every digit possible, bit (d-1) for digit d
+  ALL_CANDIDATES = (1 << MAX_GROUP_SIZE) - 1
+  
+  # seed for the random Zobrist hashing keys, so hashes are the same in
+  # every process
+  ZOBRIST_SEED = 0x5EED
+  
+  # Zobrist hashing keys for each board size
+  zobristKeyCache = {}
+  
+  # cross-check the maintained group counters against a full regroup
+  # whenever the board is checked for validity or completeness
+  DEBUG_GROUP_COUNTERS = False
+  
   @staticmethod
   def getExampleBoard():
     """ An example 20x20 board for testing """
@@ -82,11 +111,120 @@ class Board(object):
     board.updateGroups()
     return board
   
+  @staticmethod
+  def fromBytes(data, **kwargs):
+    """ Create a board from the packed bytes made by toBytes() """
+    
+    rows, columns, initialArr, finalArr = BoardCodec.decode(data)
+    return Board(rows          = rows,
+                 columns       = columns,
+                 initialValues = initialArr,
+                 finalValues   = finalArr,
+                 **kwargs)
+  
+  @staticmethod
+  def getZobristKeys(rows, columns):
+    """
+    # Random 64-bit keys for each (row, column, value) of a <rows> x <columns>
+    # board, for Zobrist hashing
+    #  -blank cells have a key of 0
+    #
+    """
+    
+    keys = Board.zobristKeyCache.get((rows, columns), None)
+    if keys is None:
+      rng  = np.random.default_rng([Board.ZOBRIST_SEED, rows, columns])
+      keys = rng.integers(0, 2**64, size=(rows, columns, 10), dtype=np.uint64, endpoint=False)
+      keys[:, :, 0] = 0
+      Board.zobristKeyCache[(rows, columns)] = keys
+    return keys
+  
+  @staticmethod
+  def hashValues(values):
+    """ Zobrist hash of an array of board values """
+    
+    rows, columns = values.shape
+    keys = Board.getZobristKeys(rows, columns)
+    rowIndex, columnIndex = np.indices((rows, columns))
+    return int(np.bitwise_xor.reduce(keys[rowIndex, columnIndex, values.astype(np.intp)], axis=None))
+  
+  @staticmethod
+  def getSymmetries(values):
+    """
+    # The dihedral transforms (rotations and reflections) of an array that
+    # keep its shape
+    #  -all 8 for square arrays, 4 for rectangular ones
+    #
+    """
+    
+    transforms = [values, np.flipud(values), np.fliplr(values), np.rot90(values, 2)]
+    if values.shape[0] == values.shape[1]:
+      transposed  = np.swapaxes(values, 0, 1)
+      transforms += [transposed, np.flipud(transposed), np.fliplr(transposed), np.rot90(transposed, 2)]
+    return transforms
+  
+  @staticmethod
+  def canonicalHash(initialValues, finalValues=None):
+    """
+    # Hash of a board that is the same for all of its rotations and reflections
+    #  -picks the transform with the smallest (final values, initial values)
+    #   bytes, and hashes that
+    #
+    """
+    
+    stacked = np.stack([initialValues if finalValues is None else finalValues,
+                        initialValues]).astype(np.int8)
+    
+    # transform the final and initial values together
+    canonical = min(np.ascontiguousarray(np.moveaxis(transformed, -1, 0)).tobytes()
+                    for transformed in Board.getSymmetries(np.moveaxis(stacked, 0, -1)))
+    
+    rows, columns = initialValues.shape
+    header = "{}x{}:".format(rows, columns).encode()
+    return hashlib.blake2b(header + canonical, digest_size=16).hexdigest()
+  
+  @staticmethod
+  def labelGroups(values):
+    """
+    # Label the groups of every number on the board in a single pass
+    #  -returns the label of each cell (0 for blank cells), and the size,
+    #   digit and status of each label
+    #
+    # -values: (array) of board values
+    #
+    """
+    
+    rows, columns = values.shape
+    
+    # label a grid with a cell at every other position, where the positions
+    # in between join neighbouring cells of the same number
+    joined = np.zeros((2*rows-1, 2*columns-1), bool)
+    joined[::2, ::2]  = values > 0
+    joined[::2, 1::2] = (values[:, :-1] == values[:, 1:]) & (values[:, 1:] > 0)
+    joined[1::2, ::2] = (values[:-1, :] == values[1:, :]) & (values[1:, :] > 0)
+    joinedLabels, numLabels = ndimage.label(joined)
+    labels = np.ascontiguousarray(joinedLabels[::2, ::2], np.int32)
+    
+    # classify the groups by their size
+    digits = np.zeros(numLabels+1, np.int8)
+    digits[labels.ravel()] = values.ravel()
+    sizes  = np.bincount(labels.ravel(), minlength=numLabels+1).astype(np.int32)
+    sizes[0] = 0
+    status = np.where(sizes == digits, Board.GROUP_VALID,
+                      np.where(sizes > digits, Board.GROUP_INVALID, Board.GROUP_ORPHAN)).astype(np.int8)
+    status[0] = Board.GROUP_NONE
+    
+    return labels, sizes, digits, status
+  
+  
   @staticmethod
   def createBoard(rows, columns, **kwargs):
-    """ Create a board using the data from the database """
-
-    kwargs = copy.deepcopy(kwargs)
+    """
+    # Create a board using the data from the database
+    #  -initial_board and final_board are flat, row-by-row lists of values,
+    #   or bytes packed with BoardCodec.packValues
+    #
+    """
     
     # need initial and final board values
     initialBoardList = kwargs.pop("initial_board", None)
@@ -94,22 +232,33 @@ class Board(object):
     if initialBoardList is None or finalBoardList is None:
       raise ValueError("Must supply both initial_values and final_values")
     
-    initialArr = np.zeros((rows, columns), np.int8)
-    finalArr   = np.zeros((rows, columns), np.int8)
-
-    # convert the lists to arrays
-    for row in range(rows):
-      for column in range(columns):
-        initialArr[row][column] = initialBoardList[row*rows + column]
-        finalArr[row][column]   = finalBoardList[row*rows + column]
-    
     # create and return the board
     return Board(rows          = rows,
                  columns       = columns,
-                 initialValues = initialArr,
-                 finalValues   = finalArr,
+                 initialValues = Board._valuesFromFlat(initialBoardList, rows, columns),
+                 finalValues   = Board._valuesFromFlat(finalBoardList, rows, columns),
                  **kwargs)
   
+  @staticmethod
+  def _valuesFromFlat(flatValues, rows, columns):
+    """ Convert a flat list of values, or packed bytes, into a <rows> x <columns> array """
+    
+    # packed values
+    if isinstance(flatValues, (bytes, bytearray, memoryview)):
+      if len(flatValues) != BoardCodec.packedLength(rows, columns):
+        raise ValueError("packed values are the wrong length for a {}x{} board".format(rows, columns))
+      arr = BoardCodec.unpackValues(flatValues, rows, columns)
+    else:
+      arr = np.asarray(flatValues)
+    
+    # CHECK: number of values and their range
+    if arr.size != rows * columns:
+      raise ValueError("Got {} values for a {}x{} board".format(arr.size, rows, columns))
+    if arr.size and (arr.min() < 0 or arr.max() > 9):
+      raise ValueError("board values must be between 0 and 9")
+    
+    return arr.astype(np.int8).reshape(rows, columns)
+  
   
   def __init__(self, rows, columns, initialValues=None, finalValues=None, **kwargs):
     """
@@ -153,20 +302,54 @@ class Board(object):
     self.columns = columns
     self.values  = initialValues.copy()
     
+    # Zobrist hash of the values, updated with every cell change
+    #  -None when it needs recalculating
+    self.zobristKeys = Board.getZobristKeys(rows, columns)
+    self.valuesHash  = None
+    
     self.initialValues = initialValues
     self.finalValues   = finalValues
     
     # groups:
-    #  -groups with the correct number of members
-    #  -groups with more than the max number of members
-    #  -all other groups
-    self.invalidGroups = {}
-    self.validGroups   = {}
-    self.orphanGroups  = {}
+    #  -every cell is labelled with the group it belongs to, blank cells are 0
+    #  -each label has a size, digit and status, where the status marks
+    #   groups with the correct number of members, groups with more than the
+    #   max number of members, and all other groups
+    #  -labels freed by single cell changes are reused
+    self.labels      = np.zeros((rows, columns), np.int32)
+    self.labelSizes  = np.zeros(1, np.int32)
+    self.labelDigits = np.zeros(1, np.int8)
+    self.labelStatus = np.zeros(1, np.int8)
+    self.nextLabel   = 1
+    self.freeLabels  = []
+    
+    # counters for the completeness and validity checks
+    #  -number of cells in orphan groups, including blank cells
+    #  -number of invalid groups
+    self.numOrphanCells   = 0
+    self.numInvalidGroups = 0
     
-    # gather the group information
-    self.updateGroups()
+    # valid, invalid and orphan groups as dictionaries of cell lists
+    #  -derived from the labels when asked for
+    self.groupCache = None
     
+    # the labels are only kept in sync with the values while groupsInSync is True
+    #  -groups are found the first time they're needed after a change
+    self.groupsInSync = False
+    
+    # candidate digits of each blank cell as a bit mask, 0 for filled cells
+    #  -worked out the first time they're needed, then kept up to date
+    #   along with the groups
+    #  -None when they need working out again
+    self.candidates = None
+    
+    # transactions:
+    #  -journal of (row, column, old value) for every cell write while a
+    #   transaction is open
+    #  -journal position when each open transaction began
+    self.journal           = []
+    self.transactionStarts = []
+  
   def __deepcopy__(self, memodict={}):
     """ Make a copy of this board """
     
@@ -174,32 +357,116 @@ class Board(object):
                      columns       = self.columns,
                      initialValues = self.initialValues,
                      finalValues   = self.finalValues,
-                     *self.getBoardStats())
+                     **self.getBoardStats())
     
     # copy the stats
     #newBoard.setBoardStats(**self.stats)
     
     # copy the current values
-    newBoard.values = self.values.copy()
+    newBoard.values     = self.values.copy()
+    newBoard.valuesHash = self.valuesHash
     
     # copy the group info
-    newBoard.invalidGroups.update(self.getInvalidGroups())
-    newBoard.validGroups.update(self.getValidGroups())
-    newBoard.orphanGroups.update(self.getOrphanGroups())
+    newBoard.labels       = self.labels.copy()
+    newBoard.labelSizes   = self.labelSizes.copy()
+    newBoard.labelDigits  = self.labelDigits.copy()
+    newBoard.labelStatus  = self.labelStatus.copy()
+    newBoard.nextLabel    = self.nextLabel
+    newBoard.freeLabels   = list(self.freeLabels)
+    newBoard.numOrphanCells   = self.numOrphanCells
+    newBoard.numInvalidGroups = self.numInvalidGroups
+    newBoard.groupsInSync = self.groupsInSync
+    if self.candidates is not None:
+      newBoard.candidates = self.candidates.copy()
     
     return newBoard
   
-
+  
   def getBoardDimensions(self):   return self.values.shape
   def getCellValue(self,row,col): return self.values.item(row,col)
   def getFinalValues(self):       return self.finalValues
   def getID(self):                return self.getBoardStats("id")
   def getInitialValues(self):     return self.initialValues
-  def getInvalidGroups(self):     return self.invalidGroups
-  def getOrphanGroups(self):      return self.orphanGroups
+  def getInvalidGroups(self):     return self._getGroupDicts()[Board.GROUP_INVALID]
+  def getOrphanGroups(self):      return self._getGroupDicts()[Board.GROUP_ORPHAN]
   def getSolveTime(self):         return self.solveTime
   def getValues(self):            return self.values
-  def getValidGroups(self):       return self.validGroups
+  def getValidGroups(self):       return self._getGroupDicts()[Board.GROUP_VALID]
+  
+  
+  def getGroupDigit(self, label):
+    """ Number in the group with the given label """
+    self._ensureGroups()
+    return self.labelDigits.item(label)
+  
+  
+  def getGroupLabel(self, row, column):
+    """ Label of the group the cell belongs to, 0 for blank cells """
+    self._ensureGroups()
+    return self.labels.item(row, column)
+  
+  
+  def getGroupSize(self, label):
+    """ Number of cells in the group with the given label """
+    self._ensureGroups()
+    return self.labelSizes.item(label)
+  
+  
+  def getGroupStatus(self, label):
+    """ GROUP_VALID, GROUP_INVALID or GROUP_ORPHAN for the group with the given label """
+    self._ensureGroups()
+    return self.labelStatus.item(label)
+  
+  
+  def getCandidates(self):
+    """
+    # Candidate digits of every cell, as a (uint16) array of bit masks
+    #  -bit (d-1) is set if digit d is still possible in a blank cell
+    #  -filled cells are 0
+    #  -don't change the returned array, it is kept up to date as cells change
+    #
+    # A digit is ruled out when:
+    #  -joining the groups of that digit next to the cell would make one
+    #   that's too big (including any 1 next to a cell, for digit 1)
+    #  -the cell is walled in by filled cells, none of them that digit, so
+    #   it couldn't grow past a group of 1
+    #
+    """
+    
+    self._ensureGroups()
+    if self.candidates is None:
+      self.candidates = self._findCandidates()
+    return self.candidates
+  
+  
+  def getCellCandidates(self, row, column):
+    """ List of the digits still possible in the given cell """
+    mask = self.getCandidates().item(row, column)
+    return [digit for digit in range(1, Board.MAX_GROUP_SIZE+1) if mask & (1 << (digit-1))]
+  
+  
+  def getValuesHash(self):
+    """ 64-bit Zobrist hash of the current values """
+    if self.valuesHash is None:
+      self.valuesHash = Board.hashValues(self.values)
+    return self.valuesHash
+  
+  
+  def getFinalHash(self):
+    """ 64-bit Zobrist hash of the final values, None if there are none """
+    if self.finalValues is None:
+      return None
+    return Board.hashValues(self.finalValues)
+  
+  
+  def getCanonicalHash(self):
+    """ Hash of the initial and final values that ignores rotations and reflections """
+    return Board.canonicalHash(self.initialValues, self.finalValues)
+  
+  
+  def toBytes(self):
+    """ Pack the initial and final values into bytes, 4 bits per cell """
+    return BoardCodec.encode(self.initialValues, self.finalValues)
   
   
   def getBoardStats(self, statName=None):
@@ -220,22 +487,148 @@ class Board(object):
   
   def isBoardComplete(self):
     """ Is the board complete """
-  
+    
+    self._ensureGroups()
+    if Board.DEBUG_GROUP_COUNTERS:
+      self._checkGroupCounters()
+    
     # complete when we have no orphans or invalid groups
-    numOrphans = np.sum([len(v) for _, v in self.getOrphanGroups().items()])
-    numInvalid = np.sum([len(v) for _, v in self.getInvalidGroups().items()])
-    return numOrphans == numInvalid == 0
+    return self.numOrphanCells == self.numInvalidGroups == 0
   
   
   def isBoardValid(self):
     """ Does the board have no invalid groups """
-    numInvalid = np.sum([len(v) for _, v in self.getInvalidGroups().items()])
-    return numInvalid == 0
+    
+    self._ensureGroups()
+    if Board.DEBUG_GROUP_COUNTERS:
+      self._checkGroupCounters()
+    
+    return self.numInvalidGroups == 0
+  
+  
+  def isCompletable(self, row=None, column=None):
+    """
+    # Can the blank cells still be filled in to complete the board, judging
+    # by the groups and blank cells close to (row, column)
+    #  -checks every group and blank cell if no cell is given
+    #  -False means the board can't be completed; True means no dead end was
+    #   found, not that the board can be completed
+    #
+    # Dead ends found:
+    #  -a group that is too big
+    #  -an unfinished group that can't reach enough cells to grow to its
+    #   size, because it is walled in, or because every way out joins other
+    #   groups of its number and makes them too big
+    #  -a blank cell that no number fits
+    #
+    """
+    
+    self._ensureGroups()
+    if self.numInvalidGroups:
+      return False
+    
+    # blank cells next to the cell that no number fits, and the unfinished
+    # groups within reach of it
+    candidates = self.getCandidates()
+    if row is None:
+      window = (slice(None), slice(None))
+      if not candidates[self.values == 0].all():
+        return False
+    else:
+      reach  = Board.MAX_GROUP_SIZE - 1
+      window = (slice(max(0, row-reach), row+reach+1), slice(max(0, column-reach), column+reach+1))
+      for cell in [(row, column)] + self._getNeighbours(row, column):
+        if self.values.item(*cell) == 0 and candidates.item(*cell) == 0:
+          return False
+    
+    windowLabels = self.labels[window]
+    _, firstCells = np.unique(windowLabels[self.labelStatus[windowLabels] == Board.GROUP_ORPHAN],
+                              return_index=True)
+    
+    # a cell in each group to start from
+    rowOffset, columnOffset = window[0].start or 0, window[1].start or 0
+    orphanCells = np.argwhere(self.labelStatus[windowLabels] == Board.GROUP_ORPHAN)[firstCells]
+    
+    return all(self._canGrow(cellRow + rowOffset, cellColumn + columnOffset)
+               for cellRow, cellColumn in orphanCells.tolist())
+  
+  
+  def _neighbourGroups(self, row, column, digit):
+    """ Labels of the distinct groups of <digit> next to a cell """
+    return {self.labels.item(*cell) for cell in self._getNeighbours(row, column)
+            if self.values.item(*cell) == digit}
+  
+  
+  def _canGrow(self, row, column):
+    """
+    # Can enough cells be reached from the unfinished group at (row, column)
+    # for it to grow to its size
+    #  -a blank cell can join the group unless joining it would make the group
+    #   too big, counting the other groups of the same number next to it
+    #  -unfinished groups of the same number that are reached join in
+    #
+    """
+    
+    label     = self.labels.item(row, column)
+    digit     = self.labelDigits.item(label)
+    groupSize = self.labelSizes.item(label)
+    
+    joined  = {label}
+    visited = {(row, column)}
+    total   = groupSize
+    toVisit = [(row, column)]
+    while toVisit and total < digit:
+      for cell in self._getNeighbours(*toVisit.pop()):
+        if cell in visited:
+          continue
+        value = self.values.item(*cell)
+        
+        # more of the groups already joined
+        if value == digit and self.labels.item(*cell) in joined:
+          visited.add(cell)
+          toVisit.append(cell)
+          continue
+        if value != 0:
+          continue
+        
+        # the cell would join these groups too
+        #  -it may be reachable later, once they have joined
+        otherLabels = self._neighbourGroups(*cell, digit) - joined
+        otherSizes  = sum(self.labelSizes.item(other) for other in otherLabels)
+        if groupSize + 1 + otherSizes > digit:
+          continue
+        
+        visited.add(cell)
+        toVisit.append(cell)
+        total  += 1 + otherSizes
+        joined |= otherLabels
+    
+    return total >= digit
+  
+  
+  @staticmethod
+  def _countGroups(values, sizes, status):
+    """ Count the orphan cells (including blanks) and invalid groups from the label info """
+    
+    numOrphanCells   = int(np.count_nonzero(values == 0) + sizes[status == Board.GROUP_ORPHAN].sum())
+    numInvalidGroups = int(np.count_nonzero(status == Board.GROUP_INVALID))
+    return numOrphanCells, numInvalidGroups
+  
+  
+  def _checkGroupCounters(self):
+    """ Make sure the group counters match a full regroup of the board """
+    
+    _, sizes, _, status = Board.labelGroups(self.values)
+    expected = Board._countGroups(self.values, sizes, status)
+    if (self.numOrphanCells, self.numInvalidGroups) != expected:
+      raise SystemError("Group counters (orphan cells: {}, invalid groups: {}) don't match "
+                        "the board (orphan cells: {}, invalid groups: {})"\
+                        .format(self.numOrphanCells, self.numInvalidGroups, *expected))
   
   
   def updateSolveStats(self, solveTime):
     """ Update the board stats given a new solve time """
-
+    
     # round down and store the new solve time
     solveTime = round(solveTime, 2)
     self.solveTime = solveTime
@@ -261,10 +654,10 @@ class Board(object):
     
     # update count
     count = currCount + 1
-
+    
     # update mean
     mean = currMean + ((solveTime - currMean) / count)
-
+    
     # update varPop and calculate std Dev
     varPop = currVarPop + (solveTime - currMean) * (solveTime - mean)
     #stdDev = np.sqrt(varPop / count)
@@ -277,7 +670,7 @@ class Board(object):
       "solve_var_pop": varPop,
       "solve_count":   count
     })
-    
+  
   
   def getSolveStats(self):
     """
@@ -285,7 +678,7 @@ class Board(object):
     #  -returns count. mean, std dev
     #
     """
-  
+    
     # get the current board stats
     boardStats = self.getBoardStats()
     
@@ -294,17 +687,17 @@ class Board(object):
     mean   = boardStats["solve_mean"]
     stdDev = np.sqrt(boardStats["solve_var_pop"] / count)
     return count, mean, stdDev
-    
+  
   def resetBoard(self):
     """ Resets the board to its initial values """
     
     # set the values
     self.values = self.initialValues.copy()
     
-    # update the groups
-    self.updateGroups()
-    
-    
+    # regroup and rehash when next needed
+    self.invalidateGroups()
+  
+  
   def updateCell(self, x, y, value, updateGroups=True, updateInitialCells=False):
     """ Update the value of an individual cell """
     
@@ -313,9 +706,16 @@ class Board(object):
       return
     
     # update cell and the group info
+    #  -if the groups are in sync with the values, only the groups touching
+    #   this cell need to change
+    #  -otherwise, the whole board is regrouped when the groups are next needed
+    oldValue = self.getCellValue(x, y)
     self._setCellValue(x, y, value)
-    if updateGroups: self.updateGroups()
-    
+    if not updateGroups:
+      self._invalidateGroupInfo()
+    elif self.groupsInSync:
+      self._updateGroupsAroundCell(x, y, oldValue)
+  
   
   def clearErrors(self):
     """
@@ -331,79 +731,363 @@ class Board(object):
     # set every difference to 0
     #  -ignore blank cells
     #  -ignore cells defined by the initial values
-    for row in range(self.rows):
-      for col in range(self.columns):
-        if self.values[row][col] != 0 and self.initialValues[row][col] == 0 and\
-           self.values[row][col] != self.finalValues[row][col]:
-          self._setCellValue(row, col, 0)
-    
-    # update the group information
-    self.updateGroups()
-    
+    errors = (self.values != 0) & (self.initialValues == 0) & (self.values != self.finalValues)
+    for row, col in np.argwhere(errors).tolist():
+      self._setCellValue(row, col, 0)
     
+    # regroup when the groups are next needed
+    self._invalidateGroupInfo()
+  
+  
   def _setCellValue(self, x, y, value):
     """ Set the value of an individual cell """
-    self.values[x][y] = int(value)
-
-
-
+    
+    # record the old value if we're in a transaction
+    if self.transactionStarts:
+      self.journal.append((x, y, self.values.item(x, y)))
+    
+    self._writeCellValue(x, y, int(value))
+  
+  
+  def _writeCellValue(self, row, column, value):
+    """ Write a cell value, updating the values hash """
+    
+    if self.valuesHash is not None:
+      self.valuesHash ^= self.zobristKeys.item(row, column, int(self.values.item(row, column))) ^\
+                         self.zobristKeys.item(row, column, value)
+    self.values[row, column] = value
+  
+  
+  def beginTransaction(self):
+    """
+    # Start recording cell changes so they can be rolled back
+    #  -transactions can be nested
+    #  -only changes made through updateCell are recorded
+    #
+    """
+    self.transactionStarts.append(len(self.journal))
+  
+  
+  def commitTransaction(self):
+    """ Keep the changes made since the last beginTransaction """
+    
+    if not self.transactionStarts:
+      raise SystemError("No transaction to commit")
+    
+    # the outermost transaction is done, so we no longer need the journal
+    self.transactionStarts.pop()
+    if not self.transactionStarts:
+      self.journal = []
+  
+  
+  def rollbackTransaction(self):
+    """ Undo the changes made since the last beginTransaction """
+    
+    if not self.transactionStarts:
+      raise SystemError("No transaction to roll back")
+    
+    journalStart = self.transactionStarts.pop()
+    changes = self.journal[journalStart:]
+    del self.journal[journalStart:]
+    
+    # undo each change, newest first
+    #  -if the groups are in sync, patch them around each restored cell
+    #  -otherwise, they're regrouped when next needed
+    for row, column, oldValue in reversed(changes):
+      newValue = self.values.item(row, column)
+      self._writeCellValue(row, column, oldValue)
+      if self.groupsInSync:
+        self._updateGroupsAroundCell(row, column, newValue)
+  
+  
+  
+  def _getNeighbours(self, row, column):
+    """ The (row, column) locations of the cells N,S,W,E of the given cell """
+    return [(newRow, newColumn) for newRow, newColumn in
+            [(row, column-1), (row, column+1), (row-1, column), (row+1, column)]
+            if 0 <= newRow < self.rows and 0 <= newColumn < self.columns]
+  
+  
+  def getGroupCells(self, label):
+    """ The (row, column) locations of the cells in the group with the given label """
+    
+    self._ensureGroups()
+    
+    # use the group dictionaries if we already have them
+    if self.groupCache is not None:
+      return self.groupCache[Board.GROUP_NONE][label]
+    
+    return [(row, col) for row, col in np.argwhere(self.labels == label).tolist()]
+  
+  
+  def _getGroupDicts(self):
+    """
+    # Derive the valid, invalid, and orphan group dictionaries from the labels
+    #  -keyed by group status, then by number
+    #  -groups by label are kept under GROUP_NONE
+    #
+    """
+    
+    self._ensureGroups()
+    if self.groupCache is not None:
+      return self.groupCache
+    
+    groupDicts = {status: {i: [] for i in range(10)}
+                  for status in [Board.GROUP_VALID, Board.GROUP_INVALID, Board.GROUP_ORPHAN]}
+    
+    # sort the cells by label, so each group is a contiguous run of cells
+    flatLabels  = self.labels.ravel()
+    cellOrder   = np.argsort(flatLabels, kind="stable")
+    cellRows    = (cellOrder // self.columns).tolist()
+    cellColumns = (cellOrder % self.columns).tolist()
+    cells       = list(zip(cellRows, cellColumns))
+    groupEnds   = np.cumsum(np.bincount(flatLabels, minlength=self.nextLabel)).tolist()
+    
+    # empty cells are always orphans
+    groupDicts[Board.GROUP_ORPHAN][0] = [[cell] for cell in cells[:groupEnds[0]]]
+    
+    # add each group to the valid, invalid, or orphan groups
+    groupsByLabel = {}
+    for label in range(1, self.nextLabel):
+      status = self.labelStatus.item(label)
+      if status != Board.GROUP_NONE:
+        group = cells[groupEnds[label-1]:groupEnds[label]]
+        groupDicts[status][self.labelDigits.item(label)].append(group)
+        groupsByLabel[label] = group
+    groupDicts[Board.GROUP_NONE] = groupsByLabel
+    
+    self.groupCache = groupDicts
+    return groupDicts
+  
+  
+  def _newLabel(self):
+    """ Return an unused group label, growing the label arrays if needed """
+    
+    if self.freeLabels:
+      return self.freeLabels.pop()
+    
+    # double the label arrays when we run out of space
+    if self.nextLabel == len(self.labelSizes):
+      newLength = 2 * len(self.labelSizes)
+      for arrName in ["labelSizes", "labelDigits", "labelStatus"]:
+        arr    = getattr(self, arrName)
+        newArr = np.zeros(newLength, arr.dtype)
+        newArr[:len(arr)] = arr
+        setattr(self, arrName, newArr)
+    
+    self.nextLabel += 1
+    return self.nextLabel - 1
+  
+  
+  def _labelGroup(self, row, column):
+    """ Label the group the given (non-empty) cell belongs to, returning its cells """
+    
+    cellVal = self.getCellValue(row, column)
+    group   = self._findNeighbourMatches(row, column, cellVal, [(row, column)])
+    label   = self._newLabel()
+    
+    for cell in group:
+      self.labels[cell] = label
+    
+    # is it a valid, invalid, or orphan group
+    groupSize = len(group)
+    if groupSize == cellVal:  status = Board.GROUP_VALID
+    elif groupSize > cellVal: status = Board.GROUP_INVALID
+    else:                     status = Board.GROUP_ORPHAN
+    
+    self.labelSizes[label]  = groupSize
+    self.labelDigits[label] = cellVal
+    self.labelStatus[label] = status
+    self._countGroup(label, 1)
+    
+    return group
+  
+  
+  def _countGroup(self, label, direction):
+    """ Add (direction=1) or remove (direction=-1) a group from the group counters """
+    
+    status = self.labelStatus.item(label)
+    if status == Board.GROUP_ORPHAN:
+      self.numOrphanCells += direction * self.labelSizes.item(label)
+    elif status == Board.GROUP_INVALID:
+      self.numInvalidGroups += direction
+  
+  
+  def _updateGroupsAroundCell(self, row, column, oldValue):
+    """
+    # Patch the group information after a single cell has changed from
+    # <oldValue> to its current value
+    #  -the cell's old group may shrink or split into several groups
+    #  -neighbouring groups with the new value merge with the cell
+    #  -all other groups are untouched
+    #
+    """
+    
+    newValue = self.getCellValue(row, column)
+    if newValue == oldValue:
+      return
+    
+    neighbours = self._getNeighbours(row, column)
+    
+    # free the cell's old group, and any neighbouring groups it joins
+    #  -freed labels are only reused once the regrouping is done
+    freedLabels = [self.labels.item(row, column)]
+    for cell in neighbours:
+      if newValue != 0 and self.getCellValue(*cell) == newValue:
+        freedLabels.append(self.labels.item(*cell))
+    
+    freedLabels = [label for label in set(freedLabels) if label != 0]
+    for label in freedLabels:
+      self._countGroup(label, -1)
+      self.labelStatus[label] = Board.GROUP_NONE
+      self.labelSizes[label]  = 0
+    self.labels[row, column] = 0
+    
+    # blank cells are orphans
+    if oldValue == 0: self.numOrphanCells -= 1
+    if newValue == 0: self.numOrphanCells += 1
+    
+    # regroup the cell, and each piece of its old group
+    #  -all of the freed cells are reachable from these cells
+    changedCells = [(row, column)] + neighbours
+    for cell in [(row, column)] + neighbours:
+      if self.getCellValue(*cell) != 0 and\
+         self.labelStatus.item(self.labels.item(*cell)) == Board.GROUP_NONE:
+        changedCells += self._labelGroup(*cell)
+    
+    self.freeLabels += freedLabels
+    self.groupCache  = None
+    
+    # only cells next to the regrouped cells can have different candidates
+    if self.candidates is not None:
+      self._updateCandidates(changedCells)
+  
+  
+  def _findCandidates(self):
+    """ Work out the candidate masks of every cell, see getCandidates() """
+    
+    # labels of the neighbouring cells N,S,W,E, 0 for blank cells and off the board
+    paddedLabels = np.pad(self.labels, 1)
+    neighbourLabels = [paddedLabels[:-2, 1:-1], paddedLabels[2:, 1:-1],
+                       paddedLabels[1:-1, :-2], paddedLabels[1:-1, 2:]]
+    
+    # total size of the neighbouring groups of each digit
+    #  -a group next to the cell on more than one side is only counted once
+    neighbourSizes = np.zeros((Board.MAX_GROUP_SIZE+1,) + self.labels.shape, np.int32)
+    for i, labels in enumerate(neighbourLabels):
+      firstSeen = np.ones(labels.shape, bool)
+      for otherLabels in neighbourLabels[:i]:
+        firstSeen &= labels != otherLabels
+      digits = self.labelDigits[labels]
+      sizes  = np.where(firstSeen, self.labelSizes[labels], 0)
+      for digit in range(1, Board.MAX_GROUP_SIZE+1):
+        neighbourSizes[digit] += np.where(digits == digit, sizes, 0)
+    
+    paddedBlanks = np.pad(self.values == 0, 1)
+    hasBlankNeighbour = paddedBlanks[:-2, 1:-1] | paddedBlanks[2:, 1:-1] |\
+                        paddedBlanks[1:-1, :-2] | paddedBlanks[1:-1, 2:]
+    
+    candidates = np.zeros(self.labels.shape, np.uint16)
+    for digit in range(1, Board.MAX_GROUP_SIZE+1):
+      possible = (neighbourSizes[digit] + 1 <= digit) &\
+                 ((digit == 1) | (neighbourSizes[digit] > 0) | hasBlankNeighbour)
+      candidates |= possible.astype(np.uint16) << (digit-1)
+    candidates[self.values != 0] = 0
+    
+    return candidates
+  
+  
+  def _cellCandidates(self, row, column):
+    """ Work out the candidate mask of a single cell, see getCandidates() """
+    
+    if self.values.item(row, column) != 0:
+      return 0
+    
+    # total size of the neighbouring groups of each digit
+    neighbourSizes    = {}
+    seenLabels        = set()
+    hasBlankNeighbour = False
+    for cell in self._getNeighbours(row, column):
+      label = self.labels.item(*cell)
+      if label == 0:
+        hasBlankNeighbour = True
+      elif label not in seenLabels:
+        seenLabels.add(label)
+        digit = self.labelDigits.item(label)
+        neighbourSizes[digit] = neighbourSizes.get(digit, 0) + self.labelSizes.item(label)
+    
+    # walled in, so only a 1 or one of the neighbouring digits
+    if hasBlankNeighbour:
+      mask = Board.ALL_CANDIDATES
+    else:
+      mask = 1
+      for digit in neighbourSizes:
+        mask |= 1 << (digit-1)
+    
+    for digit, size in neighbourSizes.items():
+      if size + 1 > digit:
+        mask &= ~(1 << (digit-1))
+    
+    return mask
+  
+  
+  def _updateCandidates(self, cells):
+    """ Work out the candidate masks again for the given cells and their neighbours """
+    
+    toUpdate = set(cells)
+    for cell in cells:
+      toUpdate.update(self._getNeighbours(*cell))
+    
+    for row, column in toUpdate:
+      self.candidates[row, column] = self._cellCandidates(row, column)
+  
+  
+  def invalidateGroups(self):
+    """
+    # Mark the groups and values hash as out of date after changing the values directly
+    #  -the board is regrouped the next time the group info is needed
+    #
+    """
+    self._invalidateGroupInfo()
+    self.valuesHash = None
+  
+  
+  def _invalidateGroupInfo(self):
+    """ Mark the groups as out of date after cell changes that kept the hash up to date """
+    self.groupsInSync = False
+    self.groupCache   = None
+    self.candidates   = None
+  
+  
+  def _ensureGroups(self):
+    """ Regroup the board if the values have changed since it was last grouped """
+    if not self.groupsInSync:
+      self.updateGroups()
+  
+  
   def updateGroups(self):
     """ Group all of the board cells into groups """
     
-    # reset the group info
-    for i in range(10):
-      self.validGroups[i]   = []
-      self.invalidGroups[i] = []
-      self.orphanGroups[i]  = []
+    # values may have been changed directly
+    self.valuesHash = Board.hashValues(self.values)
     
-    processedLocations = []
-    
-    # look at each cell
-    for row in range(self.rows):
-      for col in range(self.columns):
-        
-        # if we haven't processed it yet
-        if (row,col) not in processedLocations:
-          
-          # get cell value
-          cellVal = self.values[row][col]
-          
-          # empty cells are always orphans
-          if cellVal == 0:
-            self.orphanGroups[0].append([(row, col)])
-            processedLocations.append((row, col))
-          
-          else:
-            
-            # get this group of numbers, ignoring the current cell
-            newGroup = self._findNeighbourMatches(row, col, cellVal, [(row, col)])
-            
-            # is it a valid, invalid, or orphan group
-            if len(newGroup) == cellVal:
-              self.validGroups[cellVal].append(newGroup)
-            elif len(newGroup) > cellVal:
-              self.invalidGroups[cellVal].append(newGroup)
-            else:
-              self.orphanGroups[cellVal].append(newGroup)
-            
-            # processed these cells
-            processedLocations += newGroup
-    
-    #print("validGroups========")
-    #for k,v in self.validGroups.items():
-    #  print(k, v)
-    #print("invalidGroups========")
-    #for k,v in self.invalidGroups.items():
-    #  print(k, v)
-    #print("orphanGroups========")
-    #for k,v in self.orphanGroups.items():
-    #  print(k, v)
+    # label every group on the board
+    self.labels, self.labelSizes, self.labelDigits, self.labelStatus = Board.labelGroups(self.values)
+    self.nextLabel  = len(self.labelSizes)
+    self.freeLabels = []
+    self.groupCache = None
+    self.candidates = None
+    self.numOrphanCells, self.numInvalidGroups = Board._countGroups(self.values, self.labelSizes,
+                                                                    self.labelStatus)
     
+    self.groupsInSync = True
+  
   def _findNeighbourMatches(self, row, column, number, locations=None):
     """
     # From the given cell, find the cells with matching numbers in the
     # N,S,W,E directions, ignoring the loctions we have already found.
-    # Called recursively to find all the members of this number group
+    # Walks outwards from each new match until all the members of this
+    # number group are found
     #
     # row:
     # column:
@@ -415,33 +1099,23 @@ class Board(object):
     if locations is None:
       locations = []
     
-    # north
-    newColumn = column-1
-    if newColumn >= 0 and (row, newColumn) not in locations:
-      if self.values[row][newColumn] == number:
-        locations.append((row, newColumn))
-        self._findNeighbourMatches(row, newColumn, number, locations)
-    
-    # south
-    newColumn = column+1
-    if newColumn < self.columns and (row, newColumn) not in locations:
-      if self.values[row][newColumn] == number:
-        locations.append((row, newColumn))
-        self._findNeighbourMatches(row, newColumn, number, locations)
-        
-    # west
-    newRow = row-1
-    if newRow >= 0 and (newRow, column) not in locations:
-      if self.values[newRow][column] == number:
-        locations.append((newRow, column))
-        self._findNeighbourMatches(newRow, column, number, locations)
-        
-    # east
-    newRow = row+1
-    if newRow < self.rows and (newRow, column) not in locations:
-      if self.values[newRow][column] == number:
-        locations.append((newRow, column))
-        self._findNeighbourMatches(newRow, column, number, locations)
+    # cells we've already seen, flattened to (row * columns + column)
+    visited = bytearray(self.rows * self.columns)
+    for locRow, locColumn in locations:
+      visited[locRow*self.columns + locColumn] = 1
+    
+    # cells whose neighbours we still have to check
+    toCheck = [(row, column)]
+    while toCheck:
+      row, column = toCheck.pop()
+      
+      # N, S, W, E
+      for newRow, newColumn in [(row, column-1), (row, column+1), (row-1, column), (row+1, column)]:
+        if 0 <= newRow < self.rows and 0 <= newColumn < self.columns and\
+           not visited[newRow*self.columns + newColumn] and\
+           self.values.item(newRow, newColumn) == number:
+          visited[newRow*self.columns + newColumn] = 1
+          locations.append((newRow, newColumn))
+          toCheck.append((newRow, newColumn))
     
     return locations
-  
\ No newline at end of file
@@ -0,0 +1,116 @@
+import logging
+logger = logging.getLogger(__name__)
+
+import struct
+
+import numpy as np
+
+
+class BoardCodec(object):
+  """
+  # Pack board values into a compact binary format, 4 bits per cell
+  #
+  # layout:
+  #  -header: version (uint8), rows (uint16), columns (uint16), flags (uint8)
+  #  -initial values, two cells per byte, first cell in the high nibble
+  #  -final values, in the same format, if the header flags say they're present
+  #
+  """
+  
+  VERSION = 1
+  
+  HEADER = struct.Struct("<BHHB")
+  
+  # header flags
+  FLAG_FINAL_VALUES = 0x01
+  
+  @staticmethod
+  def packedLength(rows, columns):
+    """ Number of bytes needed to pack a <rows> x <columns> array of values """
+    return (rows * columns + 1) // 2
+  
+  @staticmethod
+  def packValues(values):
+    """ Pack an array of values (0-9) into bytes, two cells per byte """
+    
+    flatValues = np.asarray(values).ravel()
+    
+    # CHECK: values fit in 4 bits
+    if flatValues.size and (flatValues.min() < 0 or flatValues.max() > 9):
+      raise ValueError("board values must be between 0 and 9")
+    
+    # pad to a whole number of bytes
+    cells = np.zeros(2 * BoardCodec.packedLength(*np.shape(values)), np.uint8)
+    cells[:flatValues.size] = flatValues
+    return ((cells[0::2] << 4) | cells[1::2]).tobytes()
+  
+  @staticmethod
+  def unpackValues(data, rows, columns, offset=0):
+    """ Unpack <rows> x <columns> values from bytes into an int8 array """
+    
+    packed = np.frombuffer(data, np.uint8, count=BoardCodec.packedLength(rows, columns), offset=offset)
+    
+    values = np.empty(2 * packed.size, np.int8)
+    values[0::2] = packed >> 4
+    values[1::2] = packed & 0x0F
+    values = values[:rows*columns]
+    
+    # CHECK: corrupt data can hold nibbles of 10-15
+    if values.size and values.max() > 9:
+      raise ValueError("packed board values must be between 0 and 9")
+    
+    return values.reshape(rows, columns)
+  
+  @staticmethod
+  def encode(initialValues, finalValues=None):
+    """
+    # Encode a board's initial (and final) values
+    #
+    # -initialValues: (array)
+    # -finalValues:   (array) or None
+    #
+    """
+    
+    rows, columns = np.shape(initialValues)
+    
+    # CHECK: shapes match
+    if finalValues is not None and np.shape(finalValues) != (rows, columns):
+      raise ValueError("finalValues is the wrong shape, ({}); should be ({},{})"\
+                       .format(np.shape(finalValues), rows, columns))
+    
+    flags = BoardCodec.FLAG_FINAL_VALUES if finalValues is not None else 0
+    data  = BoardCodec.HEADER.pack(BoardCodec.VERSION, rows, columns, flags)
+    data += BoardCodec.packValues(initialValues)
+    if finalValues is not None:
+      data += BoardCodec.packValues(finalValues)
+    
+    return data
+  
+  @staticmethod
+  def decode(data):
+    """
+    # Decode a board encoded with encode()
+    #  -returns rows, columns, initial values, final values (None if not encoded)
+    #
+    """
+    
+    # CHECK: header
+    if len(data) < BoardCodec.HEADER.size:
+      raise ValueError("data is too short to hold a board header")
+    version, rows, columns, flags = BoardCodec.HEADER.unpack_from(data)
+    if version != BoardCodec.VERSION:
+      raise ValueError("unknown board encoding version: {}".format(version))
+    
+    # CHECK: length
+    numArrays    = 2 if flags & BoardCodec.FLAG_FINAL_VALUES else 1
+    packedLength = BoardCodec.packedLength(rows, columns)
+    if len(data) != BoardCodec.HEADER.size + numArrays * packedLength:
+      raise ValueError("data is the wrong length for a {}x{} board".format(rows, columns))
+    
+    offset        = BoardCodec.HEADER.size
+    initialValues = BoardCodec.unpackValues(data, rows, columns, offset)
+    finalValues   = None
+    if numArrays == 2:
+      finalValues = BoardCodec.unpackValues(data, rows, columns, offset + packedLength)
+    
+    return rows, columns, initialValues, finalValues
@@ -15,7 +15,8 @@ from concurrent import futures
 
 from fillomino.board import Board
 from fillomino.display import PyQtGUI
-from fillomino.database import Database, DatabaseInfo
+from fillomino.database import Database, DatabaseInfo, DuplicateBoardError
+from fillomino.hints import HintEngine
 
 from boardGenerator.generator import BoardGenerator, GenerationFailedError
 
@@ -112,6 +113,9 @@ When generation is done, select [File]=>[Load Random Board] from the main menu t
     self.columns     = self.configData["columns"]
     self.version     = self.configData["version"]
     
+    # optionally, check after each move whether the board can still be completed
+    self.checkCompletable = self.configData.get("check-completable", False)
+    
     # make sure there is a board database
     #if not os.path.exists(self.databaseLoc):
     #  raise SystemError("Board database does not exist")
@@ -136,6 +140,12 @@ When generation is done, select [File]=>[Load Random Board] from the main menu t
     self.board = None
     self.gui = None
     
+    # hints for the current board
+    self.hintEngine = None
+    
+    # whether the player has been told the board can't be completed
+    self.deadEndShown = False
+    
     # clear the board
     self.clearBoard()
 
@@ -175,6 +185,8 @@ When generation is done, select [File]=>[Load Random Board] from the main menu t
     # set the new row and column dimensions
     self.board = board
     self.rows, self.columns = board.getBoardDimensions()
+    self.hintEngine = HintEngine(board.getInitialValues())
+    self.deadEndShown = False
     
     # update the gui
     self.gui.displayNewBoard(self.board)
@@ -199,6 +211,19 @@ When generation is done, select [File]=>[Load Random Board] from the main menu t
     self.board.updateCell(x, y, value)
     self.gui.updateCell(x,y)
     
+    # tell the player when the board can no longer be completed, and clear
+    # the message once it can again
+    #  -while the message is shown, check the whole board, as the dead end
+    #   may be away from this cell
+    if self.checkCompletable:
+      completable = self.board.isCompletable(x, y) and \
+                    (not self.deadEndShown or self.board.isCompletable())
+      if not completable:
+        self.gui.showHint(None, None, "The board can no longer be completed")
+      elif self.deadEndShown:
+        self.gui.showHint(None, None, "")
+      self.deadEndShown = not completable
+    
     # if the board is complete
     if self.board.isBoardComplete():
       self.boardComplete()
@@ -221,6 +246,7 @@ When generation is done, select [File]=>[Load Random Board] from the main menu t
 
     # create a blank board
     self.board = Board(rows=self.rows, columns=self.columns)
+    self.hintEngine = None
 
     # update the gui
     self.gui.displayNewBoard(self.board)
@@ -350,16 +376,22 @@ When generation is done, select [File]=>[Load Random Board] from the main menu t
 
   
   @staticmethod
-  def _parallelGenerate(dimensions, maxAttempts=50):
+  def _parallelGenerate(generatorArgs, maxAttempts=50):
     """
     # Function called by processes in generateBoards(). Creates a new
     # generator and attempts <maxAttempts> times to generate a board with
     # the given dimensions
     #
+    # -generatorArgs: (tuple) of rows, columns, whether the board must
+    #                 have a unique solution, and the board's SeedSequence
+    #
     """
     
-    # get the dimensions
-    rows, columns = dimensions
+    # get the dimensions, mode, and the board's own random stream
+    #  -every attempt carries on from the same stream, so the board only
+    #   depends on its seed
+    rows, columns, uniqueSolution, seed = generatorArgs
+    rng = np.random.default_rng(seed)
     
     # try <maxAttempt> times to generate a board
     for _ in range(maxAttempts):
@@ -372,7 +404,7 @@ When generation is done, select [File]=>[Load Random Board] from the main menu t
         #  #raise GenerationFailedError("Generation is disabled")
         
         # generate and return the board
-        generator = BoardGenerator(rows=rows, columns=columns)
+        generator = BoardGenerator(rows=rows, columns=columns, uniqueSolution=uniqueSolution, seed=rng)
         return generator.generate()
     
       # failed to generate a board
@@ -387,13 +419,15 @@ When generation is done, select [File]=>[Load Random Board] from the main menu t
     raise GenerationFailedError(errMsg)
   
   
-  def generateBoards(self, numberOfBoards, rows, columns):
+  def generateBoards(self, numberOfBoards, rows, columns, uniqueSolution=False, seed=None):
     """
     # Generate and store some new boards
     #
     # -numberOfBoards: (int) number of boards to generate
     # -rows:           (int) board rows
     # -columns:        (int) board columns
+    # -uniqueSolution: (bool) add clues until each board has exactly one solution
+    # -seed:           (int) to make the same boards again, or None for new ones
     #
     """
   
@@ -409,10 +443,17 @@ When generation is done, select [File]=>[Load Random Board] from the main menu t
     self.boardGenerationProgress = 0
     self.boardGenerationStatus   = "Generating {} boards...".format(numberOfBoards)
     
+    # time taken, and time spent making boards unique
+    startTime     = time.perf_counter()
+    uniqueSeconds = []
+    
+    # an independent random stream for each board
+    boardSeeds = np.random.SeedSequence(seed).spawn(numberOfBoards)
+    
     # create a process pool to cycle through each board generation
     with futures.ProcessPoolExecutor() as executor:
       for board in executor.map(Controller._parallelGenerate,
-                                [(rows, columns)]*numberOfBoards):
+                                [(rows, columns, uniqueSolution, boardSeed) for boardSeed in boardSeeds]):
         
         # if there was an issue with generation
         if board is None:
@@ -420,6 +461,8 @@ When generation is done, select [File]=>[Load Random Board] from the main menu t
         
         # store the board
         self.storeGeneratedBoard(board)
+        if uniqueSolution:
+          uniqueSeconds.append(board.getBoardStats("stats")["uniqueness"]["seconds"])
   
         # update the status
         self.boardGenerationProgress += 1/numberOfBoards
@@ -435,11 +478,25 @@ When generation is done, select [File]=>[Load Random Board] from the main menu t
     # done
     self.boardGenerationStatus = "Generation Complete"
     self.boardGenerationProgress = 1.0
+    
+    # report the throughput, and what making boards unique cost
+    secondsPerBoard = (time.perf_counter() - startTime) / numberOfBoards
+    if uniqueSeconds:
+      self.boardGenerationStatus += " ({:.2f}s per board, {:.2f}s of it making boards unique)"\
+                                    .format(secondsPerBoard, np.mean(uniqueSeconds))
+    else:
+      self.boardGenerationStatus += " ({:.2f}s per board)".format(secondsPerBoard)
+    logger.info(self.boardGenerationStatus)
 
   
   
   def storeGeneratedBoard(self, board):
-    """ Store a newly generated board in the database """
+    """
+    # Store a newly generated board in the database
+    #  -returns False if the board, or a rotation or reflection of it, is
+    #   already stored
+    #
+    """
     
     # row and column info from the board
     rows, columns = board.getBoardDimensions()
@@ -454,19 +511,29 @@ When generation is done, select [File]=>[Load Random Board] from the main menu t
     finalBoardList   = list(map(int, board.getFinalValues().flatten()))
     
     # store the board
-    self.db.storeBoard(rows         = rows,
-                       columns      = columns,
-                       boardID      = boardID,
-                       initialBoard = initialBoardList,
-                       finalBoard   = finalBoardList,
-                       creationDate = creationDate,
-                       stats        = {})
+    try:
+      self.db.storeBoard(rows          = rows,
+                         columns       = columns,
+                         boardID       = boardID,
+                         initialBoard  = initialBoardList,
+                         finalBoard    = finalBoardList,
+                         creationDate  = creationDate,
+                         stats         = board.getBoardStats("stats") or {},
+                         canonicalHash = board.getCanonicalHash())
+    
+    # skip duplicate boards
+    except DuplicateBoardError as err:
+      logger.info("Skipping generated board: {}".format(err))
+      return False
+    
+    return True
   
   
   def clearBoard(self):
     """ Clear the board and reset all board-specific information"""
     
     self.board = Board(rows=self.rows, columns=self.columns)
+    self.hintEngine = None
     
     # tell the gui to clear the board
     if self.gui:
@@ -489,6 +556,22 @@ When generation is done, select [File]=>[Load Random Board] from the main menu t
     self.editingEnabled = True
     
     
+  def showHint(self):
+    """ Show the next cell that can be worked out from the current board """
+    
+    if not self.editingEnabled or self.hintEngine is None:
+      return
+    
+    hint = self.hintEngine.getHint(self.board.getValues())
+    if hint is not None:
+      row, column, digit, rule = hint
+      self.gui.showHint(row, column, "Row {}, column {} is a {} ({})".format(row+1, column+1, digit, rule))
+    elif self.hintEngine.contradiction:
+      self.gui.showHint(None, None, "There is a mistake on the board")
+    else:
+      self.gui.showHint(None, None, "No cell can be worked out in one step")
+  
+  
   def clearErrors(self):
     """ Clear any cells that don't match the final board values """
     
@@ -6,9 +6,15 @@ import os
 import json
 import sqlite3
 
+import numpy as np
+
 from fillomino.board import Board
 
 
+class DuplicateBoardError(SystemError):
+  pass
+
+
 class DatabaseInfo(object):
   
   @staticmethod
@@ -26,6 +32,7 @@ class DatabaseInfo(object):
     for rows, columns in [(10, 10), (15, 15), (20, 20)]:
       tableDefinition = DatabaseInfo.getBoardTableDefinition(rows, columns)
       db._executeCommand(tableDefinition)
+      db._executeCommand(DatabaseInfo.getBoardTableIndexDefinition(rows, columns))
     
     # close the database connection
     db.close()
@@ -35,12 +42,13 @@ class DatabaseInfo(object):
     """ Return the columns for the given table"""
     
     """
-    id, creation_date, solve_fastest, solve_slowest, solve_mean, solve_var_pop, solve_count, stats
+    id, creation_date, solve_fastest, solve_slowest, solve_mean, solve_var_pop, solve_count, stats,
+    canonical_hash
     """
     if tableName.startswith("boards"):
       return ["id", "initial_board", "final_board", "creation_date",
               "solve_fastest", "solve_slowest", "solve_mean",
-              "solve_var_pop", "solve_count", "stats"]
+              "solve_var_pop", "solve_count", "stats", "canonical_hash"]
     
     else:
       raise SystemError("Unknown table: {}".format(tableName))
@@ -60,6 +68,7 @@ class DatabaseInfo(object):
     # solve_var_pop: value to calculate standard deviation of average solve time
     # solve_count:   number of times board was solved
     # stats:         miscellaneous board stats
+    # canonical_hash: hash of the board that ignores rotations and reflections
     #
     definition = """
       create table IF NOT EXISTS boards{}x{}(
@@ -73,11 +82,33 @@ class DatabaseInfo(object):
         solve_var_pop FLOAT UNSIGNED DEFAULT NULL,
         solve_count   INT UNSIGNED DEFAULT 0,
         stats         JSON,
+        canonical_hash TEXT DEFAULT NULL,
         PRIMARY KEY (id)
       );
     """.format(rows, columns)
     
     return definition
+  
+  @staticmethod
+  def getBoardTableIndexDefinition(rows, columns):
+    """
+    # SQL index definition for looking up boards by their canonical hash
+    #  -unique, so the database itself refuses duplicate boards
+    #  -boards without a hash (NULL) aren't checked
+    #
+    """
+    
+    definition = """
+      create unique index IF NOT EXISTS boards{0}x{1}_canonical_hash_unique
+        on boards{0}x{1}(canonical_hash);
+    """.format(rows, columns)
+    
+    return definition
+  
+  @staticmethod
+  def getOldBoardTableIndexName(rows, columns):
+    """ Name of the non-unique canonical hash index older databases have """
+    return "boards{}x{}_canonical_hash".format(rows, columns)
     
 class Database(object):
   
@@ -88,15 +119,19 @@ class Database(object):
       def wrapper(*args, **kwargs):
         self = args[0]
         self.connect()
-        result = func(*args, **kwargs)
-        self.close()
-        return result
+        try:
+          return func(*args, **kwargs)
+        finally:
+          self.close()
       return wrapper
       
   def __init__(self, dbFile):
     self.dbFile = dbFile
     self.conn = None
     self.cursor = None
+    
+    # (rows, columns) of the board tables already created or upgraded
+    self.preparedTables = set()
   
   def __del__(self):
     if self.conn is not None:# and self.conn.is_connected():
@@ -201,34 +236,99 @@ class Database(object):
     return Database._processLoadedBoard(rows, columns, ret, columnNames)
     
     
-  def storeBoard(self, rows, columns, boardID, initialBoard, finalBoard, creationDate, stats):
-    """ Store a board in the <rows> x <columns> table """
+  def storeBoard(self, rows, columns, boardID, initialBoard, finalBoard, creationDate, stats,
+                 canonicalHash=None):
+    """
+    # Store a board in the <rows> x <columns> table
+    #  -if given a canonical hash, refuse to store the board if it, or a
+    #   rotation or reflection of it, is already stored
+    #
+    """
     
     # create the table if it doesn't exist
     self._createBoardTable(rows, columns)
     
-    # get the board with the given boardID to see if it already exists
-    cmd  = """SELECT * FROM boards{}x{} WHERE id = {};""".format(rows, columns, boardID)
-    ret = self._executeCommand(cmd)
-  
-    # if the board already exists
-    if len(ret) != 0:
-      raise SystemError("Board with id {} already exists".format(boardID))
-    
     # insert the new board
-    cmd  = """INSERT INTO boards{}x{}(id, initial_board, final_board, creation_date, stats) """ \
+    #  -the table's unique ID and canonical hash refuse boards that already
+    #   exist, even when written by another process at the same time
+    cmd  = """INSERT INTO boards{}x{}(id, initial_board, final_board, creation_date, stats, canonical_hash) """ \
           .format(rows, columns)
-    cmd += """VALUES({},'{}','{}','{}','{}')"""\
+    cmd += """VALUES({},'{}','{}','{}','{}',?)"""\
           .format(boardID,
                   json.dumps(initialBoard),
                   json.dumps(finalBoard),
                   json.dumps(creationDate),
                   json.dumps(stats))
-    self._executeCommand(cmd)
+    try:
+      self._executeCommand(cmd, data=[canonicalHash])
+    
+    # if the board, or the same puzzle, already exists
+    except sqlite3.IntegrityError as err:
+      if "canonical_hash" in str(err):
+        raise DuplicateBoardError("Board with canonical hash {} already exists".format(canonicalHash))
+      raise SystemError("Board with id {} already exists".format(boardID))
     
     return self.cursor.lastrowid
   
   
+  def loadBoardsData(self, rows, columns):
+    """
+    # The ID, initial and final boards, and stats of every <rows> x <columns>
+    # board, as a list of (id, initial_board, final_board, stats)
+    #
+    """
+    
+    cmd = """SELECT id, initial_board, final_board, stats FROM boards{}x{}""".format(rows, columns)
+    return [(boardID, json.loads(initialBoard), json.loads(finalBoard), json.loads(stats or "{}") or {})
+            for boardID, initialBoard, finalBoard, stats in self._executeCommand(cmd)]
+  
+  
+  @Decorators.openAndClose
+  def setBoardsStats(self, rows, columns, statsByID):
+    """
+    # Replace the stats of many <rows> x <columns> boards at once
+    #
+    # -statsByID: (dict) of board ID to stats
+    #
+    """
+    
+    cmd = """UPDATE boards{}x{} SET stats = ? WHERE id = ?""".format(rows, columns)
+    self.cursor.executemany(cmd, [(json.dumps(stats), boardID) for boardID, stats in statsByID.items()])
+    self.conn.commit()
+  
+  
+  def loadBoardByDifficulty(self, rows, columns, minRating=None, maxRating=None, excludeID=None):
+    """
+    # Retrieve a random <rows> x <columns> board whose difficulty rating is
+    # between <minRating> and <maxRating>, and return it
+    #  -only boards that have been rated are considered
+    #  -exclude any board with and ID of <excludeID>
+    #
+    """
+    
+    # columns to load
+    tableName   = "boards{}x{}".format(rows, columns)
+    columnNames = DatabaseInfo.getTableColumns(tableName)
+    
+    clauses = ["json_extract(stats, '$.difficulty.rating') IS NOT NULL"]
+    data    = []
+    if minRating is not None:
+      clauses.append("json_extract(stats, '$.difficulty.rating') >= ?")
+      data.append(minRating)
+    if maxRating is not None:
+      clauses.append("json_extract(stats, '$.difficulty.rating') <= ?")
+      data.append(maxRating)
+    if excludeID:
+      clauses.append("id != ?")
+      data.append(excludeID)
+    
+    cmd = """SELECT * FROM {} WHERE {} ORDER BY RANDOM() LIMIT 1""".format(tableName, " AND ".join(clauses))
+    ret = self._executeCommand(cmd, data=data)
+    
+    # create and return the board
+    return Database._processLoadedBoard(rows, columns, ret, columnNames)
+  
+  
   def removeBoard(self, rows, columns, boardID):
     """ Permanently delete the given board from the database """
 
@@ -303,11 +403,65 @@ class Database(object):
   
   
   def _createBoardTable(self, rows, columns):
-    """ Create a board table if it doesn't alread exist """
+    """
+    # Create a board table if it doesn't already exist, or bring an older
+    # one up to date
+    #  -only checked once per table by each Database
+    #
+    """
     
-    if self.getBoardsInfo().get((rows, columns), None) is None:
-      tableDefinition = DatabaseInfo.getBoardTableDefinition(rows, columns)
-      self._executeCommand(tableDefinition)
+    if (rows, columns) not in self.preparedTables:
+      self._prepareBoardTable(rows, columns)
+      self.preparedTables.add((rows, columns))
+  
+  @Decorators.openAndClose
+  def _prepareBoardTable(self, rows, columns):
+    """
+    # Create or upgrade a board table in a single connection
+    #  -adds the canonical hash column to tables from older databases
+    #  -fills in the canonical hash of boards stored without one, so new
+    #   boards are checked against them too. Boards that are already
+    #   duplicates of each other keep the hash on the first one only
+    #  -replaces the old, non-unique canonical hash index with a unique one
+    #
+    """
+    
+    tableName = "boards{}x{}".format(rows, columns)
+    self.cursor.execute(DatabaseInfo.getBoardTableDefinition(rows, columns))
+    
+    # tables from older databases don't have a canonical hash column
+    tableColumns = [column[1] for column in self.cursor.execute("""PRAGMA table_info({})""".format(tableName))]
+    if "canonical_hash" not in tableColumns:
+      self.cursor.execute("""ALTER TABLE {} ADD COLUMN canonical_hash TEXT DEFAULT NULL""".format(tableName))
+    
+    # hash the boards that don't have one yet
+    knownHashes = {canonicalHash for canonicalHash, in self.cursor.execute(
+                   """SELECT canonical_hash FROM {} WHERE canonical_hash IS NOT NULL""".format(tableName))}
+    newHashes = []
+    for boardID, initialBoard, finalBoard in self.cursor.execute(
+        """SELECT id, initial_board, final_board FROM {} WHERE canonical_hash IS NULL""".format(tableName)).fetchall():
+      try:
+        initialValues = np.reshape(json.loads(initialBoard), (rows, columns))
+        finalValues   = json.loads(finalBoard) if finalBoard is not None else None
+        if finalValues is not None:
+          finalValues = np.reshape(finalValues, (rows, columns))
+        canonicalHash = Board.canonicalHash(initialValues, finalValues)
+      except (TypeError, ValueError) as err:
+        logger.warning("Can't hash {} board {}: {}".format(tableName, boardID, err))
+        continue
+      
+      if canonicalHash in knownHashes:
+        logger.warning("{} board {} is a duplicate, leaving it without a canonical hash".format(tableName, boardID))
+        continue
+      knownHashes.add(canonicalHash)
+      newHashes.append((canonicalHash, boardID))
+    
+    self.cursor.executemany("""UPDATE {} SET canonical_hash = ? WHERE id = ?""".format(tableName), newHashes)
+    
+    # the hashes are unique now, so swap in the unique index
+    self.cursor.execute("""DROP INDEX IF EXISTS {}""".format(DatabaseInfo.getOldBoardTableIndexName(rows, columns)))
+    self.cursor.execute(DatabaseInfo.getBoardTableIndexDefinition(rows, columns))
+    self.conn.commit()
 
   def _getTableLength(self, tableName):
     """ Return the number of entries in the given table """
@@ -0,0 +1,166 @@
+"""
+# Rate how hard boards are to solve, and store the ratings in the database
+#
+# From the main directory, rate every board that doesn't have a rating yet:
+#   python3 -m fillomino.difficulty --database boards.db
+#
+"""
+import logging
+logger = logging.getLogger(__name__)
+
+import argparse
+
+from concurrent import futures
+
+import numpy as np
+
+from fillomino.board import Board
+from fillomino.database import Database
+from fillomino.solver import Solver
+
+
+class DifficultyRater(object):
+  """
+  # Rate a board by solving it logically with the solver's deduction rules
+  #
+  # The board is propagated from its clues, and where propagation stalls,
+  # the search guesses the board's own solution first, so only the guesses
+  # a player would need are counted. The rating is the average weight of
+  # the deductions made, plus log2 of the number of search nodes.
+  #
+  """
+  
+  # key of the difficulty stats in the board's stats
+  STATS_KEY = "difficulty"
+  
+  # how hard each rule is to spot
+  RULE_WEIGHTS = {
+    Solver.RULE_COMPLETE_GROUP:   1,
+    Solver.RULE_MERGE_TOO_BIG:    1,
+    Solver.RULE_SINGLE_CANDIDATE: 1,
+    Solver.RULE_SINGLE_LIBERTY:   1,
+    Solver.RULE_REGION_TOO_SMALL: 2,
+    Solver.RULE_REGION_EXACT_FIT: 2,
+    Solver.RULE_GROUP_EXTENSION:  3,
+    Solver.RULE_GROUP_BOUNDARY:   3,
+    Solver.RULE_UNREACHABLE:      4,
+  }
+  
+  @staticmethod
+  def rateValues(initialValues, finalValues=None):
+    """
+    # Difficulty stats of a board's clues
+    #  -rating:       (float) the difficulty rating
+    #  -rules:        (dict) number of cells each rule changed
+    #  -logic_solved: (float) fraction of the blank cells filled before the first guess
+    #  -search_nodes: (int) search nodes needed, 1 if no guesses were needed
+    #  -dead_ends:    (int) search nodes that couldn't be solved
+    #  -returns None if the clues can't be solved
+    #
+    # -initialValues: (array) of the board's clues
+    # -finalValues:   (array) the board's solution, or None
+    #
+    """
+    
+    solver = Solver(initialValues, guide=finalValues)
+    values, masks = solver.getInitialState()
+    numBlank = int(np.count_nonzero(values == 0))
+    
+    # fill in what can be worked out without guessing
+    if not solver.propagate(values, masks):
+      return None
+    logicSolved = 1.0 if numBlank == 0 else 1 - np.count_nonzero(values == 0) / numBlank
+    
+    # then guess, as little as possible
+    if solver.countSolutions(limit=1, values=values, masks=masks) == 0:
+      return None
+    
+    numChanged = sum(solver.ruleCounts.values())
+    meanWeight = 0.0
+    if numChanged:
+      meanWeight = sum(DifficultyRater.RULE_WEIGHTS[rule] * count
+                       for rule, count in solver.ruleCounts.items()) / numChanged
+    
+    return {
+      "rating":       round(meanWeight + float(np.log2(solver.numNodes)), 3),
+      "rules":        dict(solver.ruleCounts),
+      "logic_solved": round(float(logicSolved), 3),
+      "search_nodes": solver.numNodes,
+      "dead_ends":    solver.numDeadEnds,
+    }
+  
+  @staticmethod
+  def rateBoard(board):
+    """ Difficulty stats of a board, see rateValues() """
+    return DifficultyRater.rateValues(board.getInitialValues(), board.getFinalValues())
+  
+  @staticmethod
+  def _parallelRate(boardData):
+    """
+    # Function called by processes in rateDatabase(). Rates one board from
+    # the database, returning its ID and difficulty stats
+    #
+    """
+    
+    rows, columns, boardID, initialBoard, finalBoard = boardData
+    board = Board.createBoard(rows, columns, initial_board=initialBoard, final_board=finalBoard)
+    return boardID, DifficultyRater.rateBoard(board)
+  
+  @staticmethod
+  def rateDatabase(dbFile, rerate=False, maxWorkers=None):
+    """
+    # Rate the boards in every board table of a database, in parallel, and
+    # store their difficulty stats in their stats
+    #  -returns the number of boards rated
+    #
+    # -rerate:     (bool) rate boards that already have a rating
+    # -maxWorkers: (int) processes to use, or None for one per processor
+    #
+    """
+    
+    db = Database(dbFile)
+    
+    numRated = 0
+    for rows, columns in sorted(db.getBoardsInfo()):
+      
+      # boards that need rating
+      boardStats = {}
+      boardData  = []
+      for boardID, initialBoard, finalBoard, stats in db.loadBoardsData(rows, columns):
+        if rerate or DifficultyRater.STATS_KEY not in stats:
+          boardStats[boardID] = stats
+          boardData.append((rows, columns, boardID, initialBoard, finalBoard))
+      
+      if not boardData:
+        continue
+      logger.info("Rating {} {}x{} boards".format(len(boardData), rows, columns))
+      
+      with futures.ProcessPoolExecutor(max_workers=maxWorkers) as executor:
+        for boardID, difficulty in executor.map(DifficultyRater._parallelRate, boardData, chunksize=4):
+          if difficulty is None:
+            logger.warning("{}x{} board {} can't be solved".format(rows, columns, boardID))
+            continue
+          boardStats[boardID][DifficultyRater.STATS_KEY] = difficulty
+          numRated += 1
+      
+      # store the new stats together
+      db.setBoardsStats(rows, columns, {boardID: stats for boardID, stats in boardStats.items()
+                                        if DifficultyRater.STATS_KEY in stats})
+    
+    return numRated
+
+
+def main():
+  parser = argparse.ArgumentParser(description="Rate the difficulty of the boards in a database")
+  parser.add_argument("--database", default="boards.db", help="database file")
+  parser.add_argument("--workers", type=int, default=None, help="processes to use")
+  parser.add_argument("--rerate", action="store_true", help="rate boards that already have a rating")
+  args = parser.parse_args()
+  
+  logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+  numRated = DifficultyRater.rateDatabase(args.database, rerate=args.rerate, maxWorkers=args.workers)
+  logger.info("Rated {} boards".format(numRated))
+
+
+if __name__ == "__main__":
+  main()
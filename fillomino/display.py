@@ -41,6 +41,10 @@ class GUI(object):
   def setBoardTitle(self, title):
     """ Set the title of the board """
     raise NotImplementedError("subclass must implement")
+  
+  def showHint(self, row, column, text):
+    """ Point out the hinted cell (if any) and explain the hint """
+    raise NotImplementedError("subclass must implement")
 
   def updateCell(self, row, column):
     """ Called when the given board cell is updated """
@@ -163,7 +167,8 @@ class PyQtGUI(GUI, QtCore.QObject):
         
         # start board generation
         generatorThread = threading.Thread(target=gui.controller.generateBoards,
-                                           args=(int(numBoards), int(rows), int(columns)))
+                                           args=(int(numBoards), int(rows), int(columns),
+                                                 dialog.getUniqueSolutionChoice()))
         generatorThread.start()
 
         # create the monitoring thread
@@ -274,6 +279,9 @@ class PyQtGUI(GUI, QtCore.QObject):
       horizontalLayout_6 = QtWidgets.QHBoxLayout()
       
       
+      self.uniqueSolutionCheckBox = QtWidgets.QCheckBox(self)
+      horizontalLayout_6.addWidget(self.uniqueSolutionCheckBox)
+      
       self.toGenerateLabel = QtWidgets.QLineEdit(self)
       self.toGenerateLabel.setAlignment(QtCore.Qt.AlignCenter)
       horizontalLayout_6.addWidget(self.toGenerateLabel)
@@ -321,6 +329,7 @@ class PyQtGUI(GUI, QtCore.QObject):
       # default values for labels
       self.inDatabaseLabel.setText(" 0 ")
       self.toGenerateLabel.setText("10")
+      self.uniqueSolutionCheckBox.setText("Unique solution")
       self.timeElapsedLabel.setText("")
       self.statusLabel.setText("")
       
@@ -368,6 +377,9 @@ class PyQtGUI(GUI, QtCore.QObject):
     def getNumBoardsChoice(self):
       return self.toGenerateLabel.text()
     
+    def getUniqueSolutionChoice(self):
+      return self.uniqueSolutionCheckBox.isChecked()
+    
     def setInDatabaseStatus(self, value):
       if isinstance(value, int):
         self.inDatabaseLabel.setText(" " + str(value) + " ")
@@ -391,7 +403,9 @@ class PyQtGUI(GUI, QtCore.QObject):
       # when the <x> button is pressed, call function:
       controlMap = {
         "Reset":        gui.controller.resetBoard,
-        "Clear Errors": gui.controller.clearErrors
+        "Clear Errors": gui.controller.clearErrors,
+        "Hint":         gui.controller.showHint,
+        "Pencil Marks": gui.togglePencilMarks
       }
   
       # if we have a function for this button, call it
@@ -689,12 +703,12 @@ class PyQtGUI(GUI, QtCore.QObject):
       controlsGrid = QtWidgets.QHBoxLayout()
       
       # add buttons
-      for buttonText in ["Clear Errors", "Reset"]:
+      for buttonText in ["Hint", "Pencil Marks", "Clear Errors", "Reset"]:
         button = QtWidgets.QPushButton(buttonText)
         button.clicked.connect(lambda: PyQtGUI.UserActions.controlButton(self.gui))
         controlsGrid.addWidget(button)
     
-      controlsGrid.insertStretch(2, 10)
+      controlsGrid.insertStretch(4, 10)
     
       # get an outside reference to the status text as we will want to
       # update it later
@@ -720,6 +734,11 @@ class PyQtGUI(GUI, QtCore.QObject):
     # highlighted/selected cell
     self.selectedCell = None
     
+    # show the candidate digits in blank cells, and the candidate mask
+    # each of those cells is showing
+    self.pencilMarksOn   = False
+    self.pencilMarkMasks = {}
+    
     # gui representation of the board
     #self.gameGrid = None
     
@@ -739,6 +758,9 @@ class PyQtGUI(GUI, QtCore.QObject):
     self.TEXT_STYLE_NORMAL  = ""
     self.TEXT_STYLE_INITIAL = " text-decoration: underline; "
     
+    # candidate digits shown in blank cells
+    self.PENCIL_MARK_HTML = "<span style='font-size: 6pt; color: grey; '>{}</span>"
+    
     # cell styles
     defaultCellStyle = "border-style: outset; border-width: 1px; border-color: black; "
     self.CELL_STYLE_INITIAL     = defaultCellStyle + " background: linen; "
@@ -811,7 +833,7 @@ class PyQtGUI(GUI, QtCore.QObject):
     """ Return the value we are currently showing for this game cell """
     
     val = self._getGameGrid()[x][y].text()
-    if val == "":
+    if val == "" or (x, y) in self.pencilMarkMasks:
       return 0
     else:
       return int(val)
@@ -823,6 +845,37 @@ class PyQtGUI(GUI, QtCore.QObject):
     if value == "0": value = ""
   
     self._getGameGrid()[x][y].setText(value)
+    self.pencilMarkMasks.pop((x, y), None)
+  
+  def _showPencilMarks(self):
+    """ Show the candidate digits of each blank cell, if pencil marks are on """
+    
+    # blank any pencil marks that are no longer needed
+    if not self.pencilMarksOn:
+      for cell in list(self.pencilMarkMasks):
+        self._setCellValue(*cell, "")
+      return
+    
+    # only repaint the blank cells whose candidates changed
+    #  -a move can change candidates well away from the cell, along the
+    #   groups it joins, so every blank cell's mask is compared
+    candidates = self.board.getCandidates()
+    for row, column in np.argwhere(self.board.getValues() == 0).tolist():
+      mask = candidates.item(row, column)
+      if self.pencilMarkMasks.get((row, column)) == mask:
+        continue
+      
+      # candidates laid out in a 3x3 grid of small digits
+      marks = "<br>".join("&nbsp;".join(str(digit) if mask & (1 << (digit-1)) else "&nbsp;"
+                                        for digit in range(start, start+3))
+                          for start in (1, 4, 7))
+      self._getGameGrid()[row][column].setText(self.PENCIL_MARK_HTML.format(marks))
+      self.pencilMarkMasks[(row, column)] = mask
+  
+  def togglePencilMarks(self):
+    """ Turn the pencil marks on or off """
+    self.pencilMarksOn = not self.pencilMarksOn
+    self._showPencilMarks()
 
   def _setCellStyle(self, x, y, style):
     """ Set the style of an individual cell in the game grid """
@@ -849,6 +902,9 @@ class PyQtGUI(GUI, QtCore.QObject):
       
         # clear the cell value
         self._setCellValue(row, col, "")
+    
+    # the grid may have been rebuilt, so no cell is showing pencil marks
+    self.pencilMarkMasks = {}
   
     # clear the status text
     self._setStatusText("")
@@ -978,6 +1034,7 @@ class PyQtGUI(GUI, QtCore.QObject):
     
     # highlight the groups
     self._highlightGroups()
+    self._showPencilMarks()
 
     # set the board title
     self.setBoardTitle(board.getID())
@@ -1003,10 +1060,19 @@ class PyQtGUI(GUI, QtCore.QObject):
     # set the value of the cell
     self._setCellValue(x, y, str(newVal))
     
-    # update the highlighting
+    # update the highlighting, and the candidates that changed
     self._highlightGroups()
+    self._showPencilMarks()
 
 
+  def showHint(self, row, column, text):
+    """ Select the hinted cell (if any) and explain the hint in the status text """
+    
+    if row is not None:
+      self.highlightSelectedCell(row, column)
+    self._setStatusText(text)
+  
+  
   def highlightSelectedCell(self, x, y):
     """
     # Highlight the given cell and revert the previously highlighted cell
@@ -0,0 +1,312 @@
+import logging
+logger = logging.getLogger(__name__)
+
+import numpy as np
+
+from fillomino.polyomino import PolyominoLibrary
+from fillomino.solver import Solver
+
+
+class ExactCoverSolver(object):
+  """
+  # Solve boards, and count their solutions, as an exact cover problem
+  # with dancing links
+  #
+  # -each row is a placement of one group: a polyomino of k cells, all of
+  #  which could be k
+  # -each board cell is a primary column, which exactly one row must cover
+  # -same-digit groups can't touch, so there is a secondary column, which at
+  #  most one row can cover, for each digit and each pair of neighbouring
+  #  cells; a group of k covers the (k, pair) columns of the pairs that
+  #  cross its boundary, so two groups of k that would touch share a column
+  #
+  # The solver's propagation runs first, and only placements that agree
+  # with the candidate digits it leaves are rows. Given a guide solution,
+  # its groups come first in every column, so it is found first.
+  #
+  """
+  
+  def __init__(self, values, guide=None):
+    """
+    # -values: (array) of clues, 0 for blank cells
+    # -guide:  (array) a known solution, or None
+    #
+    """
+    
+    self.rows, self.columns = values.shape
+    self.clues = np.asarray(values).astype(np.int8)
+    self.guide = None if guide is None else np.asarray(guide).astype(np.int8)
+    
+    # solutions found by the last search
+    self.solutions = []
+    
+    # stats
+    #  -number of placements, and search nodes
+    self.numPlacements = 0
+    self.numNodes      = 0
+  
+  @staticmethod
+  def countBoardSolutions(board, limit=2):
+    """
+    # Count the solutions of a board's initial values, stopping at <limit>
+    #  -the board's final values, if it has them, guide the search
+    #
+    """
+    return ExactCoverSolver(board.getInitialValues(), guide=board.getFinalValues()).countSolutions(limit=limit)
+  
+  def countSolutions(self, limit=2):
+    """
+    # Count solutions, stopping as soon as <limit> are found
+    #  -solutions found are kept in self.solutions
+    #
+    """
+    
+    self.solutions = []
+    self.numNodes  = 0
+    
+    # narrow down the candidate digits of each cell
+    solver = Solver(self.clues)
+    values, masks = solver.getInitialState()
+    if not solver.propagate(values, masks):
+      return 0
+    
+    placements = self.getPlacements(masks)
+    rowDigits  = [digit for digit, cells in placements for _ in range(len(cells))]
+    rowCells   = [groupCells for _, cells in placements for groupCells in cells]
+    self.numPlacements = len(rowDigits)
+    
+    # put the groups of the guide solution first
+    rowOrder = np.arange(self.numPlacements)
+    if self.guide is not None and self.numPlacements:
+      inGuide  = np.concatenate([(self.guide.ravel()[cells] == digit).all(axis=1) for digit, cells in placements])
+      rowOrder = np.argsort(~inGuide, kind="stable")
+    rowDigits = [rowDigits[row] for row in rowOrder]
+    rowCells  = [rowCells[row] for row in rowOrder]
+    
+    links = self._buildLinks(placements, masks, np.argsort(rowOrder))
+    for rowIDs in self._searchLinks(links, limit):
+      solution = np.zeros((self.rows, self.columns), np.int8)
+      for rowID in rowIDs:
+        solution.flat[rowCells[rowID]] = rowDigits[rowID]
+      self.solutions.append(solution)
+    
+    return len(self.solutions)
+  
+  def solve(self):
+    """ Return a solution of the clues, or None if there isn't one """
+    
+    if self.countSolutions(limit=1) == 0:
+      return None
+    return self.solutions[0]
+  
+  def _neighbourTable(self):
+    """
+    # Flat index of the N, S, W, E neighbour of every cell, -1 off the
+    # board, and the index of the pair of cells each neighbour makes
+    #  -pairs are numbered 2*cell for a cell and its E neighbour, and
+    #   2*cell+1 for a cell and its S neighbour
+    #
+    """
+    
+    cells = np.arange(self.rows * self.columns).reshape(self.rows, self.columns)
+    neighbours = np.stack(Solver.neighbourArrays(cells, fill=-1), axis=-1).reshape(-1, 4)
+    
+    flat  = cells.ravel()
+    pairs = np.stack([2*(flat - self.columns) + 1, 2*flat + 1, 2*(flat - 1), 2*flat], axis=-1)
+    return neighbours, np.where(neighbours >= 0, pairs, -1)
+  
+  def getPlacements(self, masks):
+    """
+    # Every group that could be part of a solution, given the candidate masks
+    #  -a group of k only covers cells that could be k, and doesn't border a
+    #   cell that has to be k
+    #  -returns a list of (digit, (count, digit) array of flat cells) for each
+    #   digit with any groups
+    #
+    """
+    
+    neighbours, _ = self._neighbourTable()
+    
+    placements = []
+    for digit in range(1, 10):
+      bit     = Solver.DIGIT_BITS[digit]
+      allowed = (masks & bit) != 0
+      forced  = (masks == bit).ravel()
+      
+      cells = PolyominoLibrary.getPlacements(allowed, digit)
+      
+      # reject groups next to a cell that has to be the same digit
+      around   = neighbours[cells]
+      outside  = (around >= 0) & ~(around[:, :, :, None] == cells[:, None, None, :]).any(axis=3)
+      bordered = (outside & forced[around]).any(axis=(1, 2))
+      
+      if not bordered.all():
+        placements.append((digit, cells[~bordered]))
+    
+    return placements
+  
+  def _buildLinks(self, placements, masks, rowIDOf):
+    """
+    # Build the dancing links for the placements
+    #  -node 0 is the root, and nodes 1 to the number of columns are the
+    #   column headers, followed by the nodes of each row
+    #  -the placements, in order, are rows rowIDOf[0], rowIDOf[1], ...
+    #  -rows come in order of their IDs in every column
+    #  -returns the left, right, up, down, column, and row ID of each node,
+    #   and the size of each column, as lists
+    #
+    """
+    
+    numCells = self.rows * self.columns
+    neighbours, pairs = self._neighbourTable()
+    
+    rowIDs    = []
+    columnIDs = []
+    firstRow  = 0
+    for digit, cells in placements:
+      numRows = len(cells)
+      
+      # the pairs crossing each group's boundary, into cells that could also be this digit
+      around   = neighbours[cells]
+      crossing = (around >= 0) & ~(around[:, :, :, None] == cells[:, None, None, :]).any(axis=3)
+      crossing &= (masks.ravel()[around] & Solver.DIGIT_BITS[digit]) != 0
+      crossingRows, crossingCells, crossingSides = np.nonzero(crossing)
+      boundaryPairs = pairs[cells[crossingRows, crossingCells], crossingSides]
+      
+      rowIDs    += [firstRow + np.repeat(np.arange(numRows), digit), firstRow + crossingRows]
+      columnIDs += [cells.ravel(), numCells + (digit-1) * 2 * numCells + boundaryPairs]
+      firstRow  += numRows
+    
+    # group the nodes of each row together
+    rowIDs    = rowIDOf[np.concatenate(rowIDs)] if rowIDs else np.empty(0, np.intp)
+    columnIDs = np.concatenate(columnIDs) if columnIDs else np.empty(0, np.intp)
+    order     = np.argsort(rowIDs, kind="stable")
+    rowIDs    = rowIDs[order]
+    columnIDs = columnIDs[order]
+    
+    # number the secondary columns that are used, after the primary ones
+    usedColumns, columnIDs = np.unique(np.concatenate([np.arange(numCells), columnIDs]), return_inverse=True)
+    columnIDs  = columnIDs[numCells:]
+    numColumns = len(usedColumns)
+    numNodes   = 1 + numColumns + len(columnIDs)
+    nodes      = np.arange(1 + numColumns, numNodes)
+    
+    # rows: each node links to its neighbours in the same row, wrapping around
+    left  = np.arange(numNodes)
+    right = np.arange(numNodes)
+    if len(nodes):
+      rowStarts = np.flatnonzero(np.r_[True, rowIDs[1:] != rowIDs[:-1]])
+      rowEnds   = np.r_[rowStarts[1:], len(nodes)] - 1
+      right[nodes] = nodes + 1
+      right[nodes[rowEnds]] = nodes[rowStarts]
+      left[nodes]  = nodes - 1
+      left[nodes[rowStarts]] = nodes[rowEnds]
+    
+    # headers: the root links to the primary columns only
+    headers = np.arange(numCells + 1)
+    right[headers] = np.roll(headers, -1)
+    left[headers]  = np.roll(headers, 1)
+    
+    # columns: each node links to the nodes above and below it in its column,
+    # wrapping around through the header
+    column = np.r_[0, np.arange(1, numColumns + 1), columnIDs + 1]
+    order  = np.argsort(column[nodes], kind="stable")
+    byColumn = nodes[order]
+    columnOf = column[byColumn]
+    starts = np.flatnonzero(np.r_[True, columnOf[1:] != columnOf[:-1]]) if len(byColumn) else np.empty(0, np.intp)
+    ends   = np.r_[starts[1:], len(byColumn)] - 1
+    up   = np.arange(numNodes)
+    down = np.arange(numNodes)
+    up[byColumn[1:]]     = byColumn[:-1]
+    down[byColumn[:-1]]  = byColumn[1:]
+    up[byColumn[starts]] = columnOf[starts]
+    down[columnOf[starts]] = byColumn[starts]
+    down[byColumn[ends]] = columnOf[ends]
+    up[columnOf[ends]]   = byColumn[ends]
+    
+    sizes  = np.bincount(column[nodes], minlength=numColumns + 1)
+    nodeRows = np.r_[np.full(1 + numColumns, -1), rowIDs]
+    
+    return left.tolist(), right.tolist(), up.tolist(), down.tolist(), column.tolist(),\
+           nodeRows.tolist(), sizes.tolist()
+  
+  def _searchLinks(self, links, limit):
+    """
+    # Knuth's Algorithm X on the dancing links, always branching on the
+    # primary column with the fewest rows
+    #  -returns the row IDs of up to <limit> solutions
+    #
+    """
+    
+    left, right, up, down, column, nodeRows, sizes = links
+    
+    def cover(header):
+      right[left[header]] = right[header]
+      left[right[header]] = left[header]
+      i = down[header]
+      while i != header:
+        j = right[i]
+        while j != i:
+          down[up[j]] = down[j]
+          up[down[j]] = up[j]
+          sizes[column[j]] -= 1
+          j = right[j]
+        i = down[i]
+    
+    def uncover(header):
+      i = up[header]
+      while i != header:
+        j = left[i]
+        while j != i:
+          sizes[column[j]] += 1
+          down[up[j]] = j
+          up[down[j]] = j
+          j = left[j]
+        i = up[i]
+      right[left[header]] = header
+      left[right[header]] = header
+    
+    solutions = []
+    chosen    = []
+    
+    def search():
+      self.numNodes += 1
+      
+      # every primary column is covered
+      if right[0] == 0:
+        solutions.append([nodeRows[node] for node in chosen])
+        return
+      
+      # the column with the fewest rows
+      header = right[0]
+      best   = header
+      while header != 0:
+        if sizes[header] < sizes[best]:
+          best = header
+          if sizes[best] < 2:
+            break
+        header = right[header]
+      if sizes[best] == 0:
+        return
+      
+      cover(best)
+      node = down[best]
+      while node != best and len(solutions) < limit:
+        chosen.append(node)
+        j = right[node]
+        while j != node:
+          cover(column[j])
+          j = right[j]
+        
+        search()
+        
+        j = left[node]
+        while j != node:
+          uncover(column[j])
+          j = left[j]
+        chosen.pop()
+        node = down[node]
+      uncover(best)
+    
+    search()
+    return solutions
@@ -0,0 +1,92 @@
+import logging
+logger = logging.getLogger(__name__)
+
+import numpy as np
+
+from fillomino.solver import Solver
+
+
+class HintEngine(object):
+  """
+  # Find the next logically forced step from the values a player has filled in
+  #
+  # Hints come from the solver's deduction rules, cheapest rule first, so
+  # each one can be explained by the rule that forced it. Nothing is taken
+  # from the board's final values.
+  #
+  # The engine keeps the candidate masks worked out for the last hint, and
+  # the other cells forced at the same time. When the player has only filled
+  # in more cells since, those are applied to the kept state instead of
+  # starting over; erasing or changing a cell starts over from the values.
+  #
+  """
+  
+  PLAYER_ENTRY = "player entry"
+  
+  def __init__(self, initialValues):
+    """
+    # -initialValues: (array) of the board's clues
+    #
+    """
+    
+    self.solver = Solver(initialValues)
+    self.reset()
+  
+  def reset(self):
+    """ Forget the kept state """
+    
+    self.values  = None
+    self.masks   = None
+    self.pending = []
+    
+    # whether the values the last hint was asked for can't be solved
+    self.contradiction = False
+  
+  def getHint(self, values):
+    """
+    # The next forced cell, as (row, column, digit, rule)
+    #  -returns None if no cell is forced by a single rule, or if the values
+    #   can't be solved (self.contradiction is set)
+    #
+    # -values: (array) of the board's current values, 0 for blank cells
+    #
+    """
+    
+    self._update(np.asarray(values).astype(np.int8))
+    self.contradiction = False
+    
+    while not self.pending:
+      result = self.solver.deduce(self.values, self.masks)
+      if result is None:
+        self.contradiction = True
+        return None
+      
+      # eliminations are kept, so the next round picks up from them
+      assignments, changed = result
+      if assignments:
+        self.pending = assignments
+      elif not changed:
+        return None
+    
+    return self.pending[0]
+  
+  def _update(self, values):
+    """ Bring the kept state up to date with the current values """
+    
+    if self.values is not None and self.values.shape == values.shape:
+      changed = self.values != values
+      
+      # only blanks were filled in, so add them to the kept state
+      if not (changed & (self.values != 0)).any():
+        rowList, columnList = np.nonzero(changed)
+        entries = [(row, column, int(values[row, column]), HintEngine.PLAYER_ENTRY)
+                   for row, column in zip(rowList.tolist(), columnList.tolist())]
+        if self.solver.assign(self.values, self.masks, entries):
+          self.pending = [(row, column, digit, rule) for row, column, digit, rule in self.pending
+                          if self.values[row, column] == 0 and self.masks[row, column] & (1 << (digit-1))]
+          return
+    
+    # start over from the current values
+    self.values  = values.copy()
+    self.masks   = Solver.digitMasks(values)
+    self.pending = []
@@ -0,0 +1,211 @@
+import logging
+logger = logging.getLogger(__name__)
+
+import os
+import tempfile
+
+import numpy as np
+
+
+class PolyominoLibrary(object):
+  """
+  # Every fixed polyomino (rotations and reflections counted separately) up
+  # to MAX_SIZE cells, for looking up the groups that fit in part of a board
+  #
+  # -shapes of each size are (count, size, 2) arrays of (row, column)
+  #  offsets, sorted in row-major order, from the shape's anchor: its first
+  #  cell in row-major order
+  # -the shapes are enumerated once and cached in CACHE_FILE, which is
+  #  loaded at import
+  # -for each board size there is an index of the shapes that fit on the
+  #  board when anchored at each cell
+  #
+  """
+  
+  MAX_SIZE = 9
+  
+  # number of fixed polyominoes of each size
+  FIXED_COUNTS = [0, 1, 2, 6, 19, 63, 216, 760, 2725, 9910]
+  
+  CACHE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "polyominoes.npz")
+  
+  # offsets of the shapes of each size
+  shapes = {}
+  
+  # (last row, first column, last column) offsets of the shapes of each size
+  extents = {}
+  
+  # placement index of each (rows, columns, size)
+  placementIndexCache = {}
+  
+  @staticmethod
+  def enumerateShapes(maxSize):
+    """
+    # Enumerate the fixed polyominoes of up to <maxSize> cells with
+    # Redelmeier's algorithm
+    #  -grows each shape one cell at a time from the cells next to it, never
+    #   adding a cell that was a candidate in an earlier branch, so every
+    #   shape is found exactly once
+    #  -returns a dictionary of size: (count, size, 2) offset array
+    #
+    """
+    
+    shapes = {size: [] for size in range(1, maxSize+1)}
+    
+    # anchors are the first cell in row-major order, so no cell can be above
+    # it, or to its left on the same row
+    def canAdd(cell):
+      return cell[0] > 0 or (cell[0] == 0 and cell[1] >= 0)
+    
+    def extend(shape, untried, seen):
+      untried = list(untried)
+      while untried:
+        cell     = untried.pop()
+        newShape = shape + [cell]
+        shapes[len(newShape)].append(sorted(newShape))
+        if len(newShape) == maxSize:
+          continue
+        
+        # add the new neighbours of this cell as candidates for the larger shapes
+        newUntried = list(untried)
+        newSeen    = set(seen)
+        row, column = cell
+        for neighbour in [(row+1, column), (row-1, column), (row, column+1), (row, column-1)]:
+          if neighbour not in newSeen and canAdd(neighbour):
+            newSeen.add(neighbour)
+            newUntried.append(neighbour)
+        extend(newShape, newUntried, newSeen)
+    
+    extend([], [(0, 0)], {(0, 0)})
+    
+    return {size: np.array(sorted(sizeShapes), np.int8).reshape(-1, size, 2)
+            for size, sizeShapes in shapes.items()}
+  
+  @staticmethod
+  def loadShapes(cacheFile=None):
+    """
+    # Load the shapes from the cache file, enumerating them and writing the
+    # cache if it is missing or out of date
+    #
+    """
+    
+    cacheFile = PolyominoLibrary.CACHE_FILE if cacheFile is None else cacheFile
+    
+    shapes = None
+    try:
+      with np.load(cacheFile) as cached:
+        shapes = {size: cached["size{}".format(size)] for size in range(1, PolyominoLibrary.MAX_SIZE+1)}
+    except (OSError, KeyError, ValueError):
+      pass
+    
+    # CHECK: the cache has every shape
+    if shapes is None or any(len(shapes[size]) != PolyominoLibrary.FIXED_COUNTS[size] for size in shapes):
+      shapes = PolyominoLibrary.enumerateShapes(PolyominoLibrary.MAX_SIZE)
+      PolyominoLibrary._writeCache(cacheFile, shapes)
+    
+    PolyominoLibrary.shapes  = shapes
+    PolyominoLibrary.extents = {size: (sizeShapes[:, :, 0].max(axis=1).astype(np.int32),
+                                       sizeShapes[:, :, 1].min(axis=1).astype(np.int32),
+                                       sizeShapes[:, :, 1].max(axis=1).astype(np.int32))
+                                for size, sizeShapes in shapes.items()}
+    PolyominoLibrary.placementIndexCache = {}
+  
+  @staticmethod
+  def _writeCache(cacheFile, shapes):
+    """ Write the shapes to the cache file, replacing it in one step """
+    
+    try:
+      fd, tempFile = tempfile.mkstemp(suffix=".npz", dir=os.path.dirname(os.path.abspath(cacheFile)))
+      with os.fdopen(fd, "wb") as f:
+        np.savez_compressed(f, **{"size{}".format(size): sizeShapes for size, sizeShapes in shapes.items()})
+      os.chmod(tempFile, 0o644)
+      os.replace(tempFile, cacheFile)
+    except OSError as err:
+      logger.warning("could not write the polyomino cache {}: {}".format(cacheFile, err))
+  
+  @staticmethod
+  def getShapes(size):
+    """ The (count, size, 2) offsets of the shapes with <size> cells """
+    
+    # CHECK: size
+    if not 1 <= size <= PolyominoLibrary.MAX_SIZE:
+      raise ValueError("polyomino size must be between 1 and {}".format(PolyominoLibrary.MAX_SIZE))
+    
+    return PolyominoLibrary.shapes[size]
+  
+  @staticmethod
+  def getPlacementIndex(rows, columns, size):
+    """
+    # Index of the <size>-cell shapes that fit on a <rows> x <columns> board
+    #  -returns the flat cell offsets of each shape, the IDs of the shapes that
+    #   fit at each anchor cell, and where each anchor's IDs start:
+    #   shapeIDs[starts[i]:starts[i+1]] fit when anchored at flat cell i
+    #
+    """
+    
+    index = PolyominoLibrary.placementIndexCache.get((rows, columns, size), None)
+    if index is None:
+      
+      shapes      = PolyominoLibrary.getShapes(size).astype(np.int32)
+      flatOffsets = shapes[:, :, 0] * columns + shapes[:, :, 1]
+      lastRow, firstColumn, lastColumn = PolyominoLibrary.extents[size]
+      
+      # the shapes that stay on the board from each anchor
+      anchorRows, anchorColumns = np.divmod(np.arange(rows * columns), columns)
+      fits = (anchorRows[:, None] + lastRow < rows) &\
+             (anchorColumns[:, None] + firstColumn >= 0) &\
+             (anchorColumns[:, None] + lastColumn < columns)
+      anchors, shapeIDs = np.nonzero(fits)
+      starts = np.searchsorted(anchors, np.arange(rows * columns + 1)).astype(np.int32)
+      
+      index = (flatOffsets, shapeIDs.astype(np.int16), starts)
+      PolyominoLibrary.placementIndexCache[(rows, columns, size)] = index
+    
+    return index
+  
+  @staticmethod
+  def getPlacements(allowed, size, cell=None):
+    """
+    # Every placement of a <size>-cell group that only uses allowed cells
+    #  -returns a (count, size) array of the flat indices of each placement's
+    #   cells
+    #
+    # -allowed: (array) of bools, True for cells a group can use
+    # -size:    (int) number of cells in the group
+    # -cell:    (row, column) that every placement must cover, or None
+    #
+    """
+    
+    rows, columns = allowed.shape
+    flatAllowed   = allowed.ravel()
+    flatOffsets, shapeIDs, starts = PolyominoLibrary.getPlacementIndex(rows, columns, size)
+    
+    # every shape that fits at each allowed anchor
+    if cell is None:
+      anchors   = np.flatnonzero(flatAllowed)
+      numShapes = starts[anchors+1] - starts[anchors]
+      positions = np.repeat(starts[anchors] - np.cumsum(numShapes) + numShapes, numShapes) +\
+                  np.arange(numShapes.sum())
+      anchors   = np.repeat(anchors, numShapes)
+      ids       = shapeIDs[positions]
+    
+    # every shape that covers the cell with one of its own cells, and fits
+    # from the anchor that puts it there
+    else:
+      row, column = cell
+      if not flatAllowed[row * columns + column]:
+        return np.empty((0, size), np.intp)
+      shapes = PolyominoLibrary.getShapes(size).astype(np.intp)
+      lastRow, firstColumn, lastColumn = PolyominoLibrary.extents[size]
+      anchorRows    = row - shapes[:, :, 0]
+      anchorColumns = column - shapes[:, :, 1]
+      fits = (anchorRows >= 0) & (anchorRows + lastRow[:, None] < rows) &\
+             (anchorColumns + firstColumn[:, None] >= 0) & (anchorColumns + lastColumn[:, None] < columns)
+      ids, pivots = np.nonzero(fits)
+      anchors = anchorRows[ids, pivots] * columns + anchorColumns[ids, pivots]
+    
+    # keep the placements that only use allowed cells
+    cells = anchors[:, None] + flatOffsets[ids]
+    return cells[flatAllowed[cells].all(axis=1)]
+
+PolyominoLibrary.loadShapes()
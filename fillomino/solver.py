@@ -0,0 +1,948 @@
+import logging
+logger = logging.getLogger(__name__)
+
+import itertools
+
+import numpy as np
+
+from scipy import ndimage
+
+from fillomino.board import Board
+
+
+class SearchLimitError(Exception):
+  pass
+
+
+class _ExtensionLimitError(Exception):
+  pass
+
+
+class Solver(object):
+  """
+  # Solve boards, and count their solutions, by constraint propagation
+  # followed by backtracking
+  #
+  # Every cell has a 9-bit mask of the digits it could still be (bit d-1
+  # for digit d). Each round of propagation labels the groups of filled
+  # cells and applies the deduction rules below, until nothing changes:
+  #  -complete group:     blanks next to a complete group of d can't be d
+  #  -merge too big:      blanks joining their neighbouring d-groups would make a
+  #                       group of more than d can't be d
+  #  -single candidate:   blanks with one possible digit are that digit
+  #  -single liberty:     unfinished groups with one blank cell to grow into must grow there
+  #  -region too small:   cells that could be d, connected to fewer than d-1 other
+  #                       cells that could be d, can't be d
+  #  -region exact fit:   an unfinished d-group inside a region of exactly d cells that
+  #                       could be d fills the whole region
+  #  -group extension:    cells in every possible completion of an unfinished group
+  #                       are part of it
+  #  -group boundary:     blanks bordering every possible completion of an unfinished
+  #                       d-group can't be d
+  #  -unreachable:        blanks that no completion of an unfinished d-group covers,
+  #                       and that can't be in a new d-group, can't be d
+  #
+  # Completions are enumerated for groups with few of them; groups with
+  # more than MAX_EXTENSION_STEPS steps of enumeration are skipped.
+  #
+  # When propagation stalls, parts of the board that can't affect each other
+  # are searched separately, each only for as many solutions as the parts
+  # before it leave the limit needing, and parts found to have none are
+  # remembered whatever the rest of the board holds. Within a part the search
+  # tries each completion of the unfinished group with the fewest, or each
+  # digit of the blank cell with the fewest, favouring cells near earlier
+  # dead ends.
+  #
+  """
+  
+  # deduction rules
+  RULE_COMPLETE_GROUP    = "complete group"
+  RULE_MERGE_TOO_BIG     = "merge too big"
+  RULE_SINGLE_CANDIDATE  = "single candidate"
+  RULE_SINGLE_LIBERTY    = "single liberty"
+  RULE_REGION_TOO_SMALL  = "region too small"
+  RULE_REGION_EXACT_FIT  = "region exact fit"
+  RULE_GROUP_EXTENSION   = "group extension"
+  RULE_GROUP_BOUNDARY    = "group boundary"
+  RULE_UNREACHABLE       = "unreachable"
+  RULES = [RULE_COMPLETE_GROUP, RULE_MERGE_TOO_BIG, RULE_SINGLE_CANDIDATE,
+           RULE_SINGLE_LIBERTY, RULE_REGION_TOO_SMALL, RULE_REGION_EXACT_FIT,
+           RULE_GROUP_EXTENSION, RULE_GROUP_BOUNDARY, RULE_UNREACHABLE]
+  
+  # most steps spent enumerating the completions of one group, and the
+  # most enumerations, and unsolvable states, to remember
+  MAX_EXTENSION_STEPS = 2000
+  MAX_CACHED          = 10000
+  
+  # mask of all digits, and the bit for each digit (0 has no bit)
+  ALL_DIGITS = 0x1FF
+  DIGIT_BITS = np.array([0] + [1 << (digit-1) for digit in range(1, 10)], np.uint16)
+  
+  # number of digits in, and lowest digit of, each mask
+  MASK_COUNTS = np.array([bin(mask).count("1") for mask in range(512)], np.int8)
+  MASK_LOWEST = np.array([0] + [(mask & -mask).bit_length() for mask in range(1, 512)], np.int8)
+  
+  # cells connect to their N, S, W, E neighbours
+  CONNECTIVITY = ndimage.generate_binary_structure(2, 1)
+  
+  # number of solutions
+  SOLUTIONS_NONE     = 0
+  SOLUTIONS_UNIQUE   = 1
+  SOLUTIONS_MULTIPLE = 2
+  
+  @staticmethod
+  def countBoardSolutions(board, limit=2):
+    """
+    # Count the solutions of a board's initial values, stopping at <limit>
+    #  -with the default limit, returns SOLUTIONS_NONE, SOLUTIONS_UNIQUE, or
+    #   SOLUTIONS_MULTIPLE
+    #  -the board's final values, if it has them, guide the search
+    #
+    """
+    return Solver(board.getInitialValues(), guide=board.getFinalValues()).countSolutions(limit=limit)
+  
+  @staticmethod
+  def digitMasks(values):
+    """ Candidate masks where filled cells have their own digit, and blank cells have every digit """
+    return np.where(values > 0, Solver.DIGIT_BITS[np.clip(values, 0, 9).astype(np.intp)],
+                    Solver.ALL_DIGITS).astype(np.uint16)
+  
+  @staticmethod
+  def neighbourArrays(arr, fill=0):
+    """ The N, S, W, E neighbour of every cell of a 2D array, <fill> outside the board """
+    
+    padded = np.pad(arr, 1, constant_values=fill)
+    return [padded[:-2, 1:-1], padded[2:, 1:-1], padded[1:-1, :-2], padded[1:-1, 2:]]
+  
+  def __init__(self, values, guide=None):
+    """
+    # -values: (array) of clues, 0 for blank cells
+    # -guide:  (array) a known solution, or None
+    #
+    # A guide doesn't change the result, only the order of the search: the
+    # guide is found first, so a second solution is found, or ruled out,
+    # without having to search for the first
+    #
+    """
+    
+    self.rows, self.columns = values.shape
+    self.clues = np.asarray(values).astype(np.int8)
+    self.guide = None if guide is None else np.asarray(guide).astype(np.int8)
+    
+    # solutions found by the last search
+    self.solutions = []
+    
+    # stats
+    #  -number of cells each rule changed
+    #  -number of search nodes, and the number that were dead ends
+    self.ruleCounts   = {rule: 0 for rule in Solver.RULES}
+    self.numNodes     = 0
+    self.numDeadEnds  = 0
+    
+    # node count at which the current search gives up
+    self.nodeLimit = None
+    
+    # completions of unfinished groups, and the cells they depend on
+    self.completionCache = {}
+    
+    # propagated states of parts of the board known to have no solutions
+    self.unsolvableStates = set()
+    
+    # (labels, sizes, digits, status) of the groups of the values the last
+    # round of deductions was made on
+    self.groupInfo = None
+    
+    # cells that showed the last state couldn't be solved, and how often
+    # each cell has been close to a dead end
+    self.conflict        = None
+    self.conflictWeights = np.zeros(self.clues.shape, np.float64)
+  
+  
+  def getInitialState(self):
+    """ Values and candidate masks of the clues, before any deductions """
+    values = self.clues.copy()
+    return values, Solver.digitMasks(values)
+  
+  
+  def countSolutions(self, limit=2, values=None, masks=None, maxNodes=None):
+    """
+    # Count solutions, stopping as soon as <limit> are found
+    #  -searches from the clues unless given a (values, masks) state
+    #  -solutions found are kept in self.solutions
+    #  -raises SearchLimitError if the search needs more than <maxNodes> nodes
+    #
+    """
+    
+    if values is None:
+      values, masks = self.getInitialState()
+    
+    self.nodeLimit = None if maxNodes is None else self.numNodes + maxNodes
+    self.solutions = self._search(values.copy(), masks.copy(), limit, np.ones(values.shape, bool))
+    return len(self.solutions)
+  
+  
+  def solve(self):
+    """ Return a solution of the clues, or None if there isn't one """
+    
+    if self.countSolutions(limit=1) == 0:
+      return None
+    return self.solutions[0]
+  
+  
+  def _search(self, values, masks, limit, part):
+    """
+    # Depth-first search for up to <limit> ways of filling the blank cells
+    # of a part of the board, propagating at every node
+    #  -parts of the board that can't affect each other are searched
+    #   separately, and their solutions combined
+    #  -returns the solutions found; only cells in the part are filled
+    #
+    """
+    
+    self.numNodes += 1
+    if self.nodeLimit is not None and self.numNodes > self.nodeLimit:
+      raise SearchLimitError("search reached its limit of {} nodes".format(self.numNodes - 1))
+    
+    if not self.propagate(values, masks):
+      self.numDeadEnds += 1
+      self._weighConflict()
+      return []
+    
+    # nothing left to fill
+    blank = (values == 0) & part
+    if not blank.any():
+      return [values]
+    
+    # the last round of propagation made no changes, so its groups are the
+    # groups of these values
+    groupInfo = self.groupInfo
+    
+    # already searched, without finding a solution, by another route
+    stateKey = Solver._partStateKey(values, masks, part, *groupInfo)
+    if stateKey in self.unsolvableStates:
+      self.numDeadEnds += 1
+      return []
+    
+    solutions = self._searchState(values, masks, limit, part, blank, groupInfo)
+    if not solutions:
+      if len(self.unsolvableStates) >= Solver.MAX_CACHED:
+        self.unsolvableStates.clear()
+      self.unsolvableStates.add(stateKey)
+    return solutions
+  
+  
+  @staticmethod
+  def _partStateKey(values, masks, part, labels, sizes, digits, status):
+    """
+    # Key of the state of a part of the board, for remembering parts with
+    # no solutions
+    #  -a part's solutions only depend on the masks of its cells, and the
+    #   values of the cells around it and of the groups touching it, so the
+    #   same part is recognised whatever the rest of the board holds
+    #
+    """
+    
+    zone = part.copy()
+    for neighbourPart in Solver.neighbourArrays(part, fill=False):
+      zone |= neighbourPart
+    touching = np.zeros(len(sizes), bool)
+    touching[labels[zone]] = True
+    touching[0] = False
+    zone |= touching[labels]
+    
+    return (part.tobytes(), np.where(zone, values, -1).tobytes(), np.where(part, masks, 0).tobytes())
+  
+  
+  def _searchState(self, values, masks, limit, part, blank, groupInfo):
+    """ Search a propagated state with blank cells left to fill """
+    
+    # search each independent part for its own solutions
+    #  -the number of solutions is the product of the parts' numbers, so
+    #   each part only needs enough to make up the limit with the parts
+    #   before it
+    #  -smallest parts first: they're the cheapest to rule out, and a part
+    #   with more than one solution leaves the bigger ones needing just one
+    subParts = self._independentParts(values, blank, groupInfo)
+    if len(subParts) > 1:
+      subParts.sort(key=np.count_nonzero)
+      partSolutions   = []
+      numCombinations = 1
+      for subPart in subParts:
+        solutions = self._search(values.copy(), masks.copy(), -(-limit // numCombinations), subPart)
+        if not solutions:
+          return []
+        partSolutions.append(solutions)
+        numCombinations *= len(solutions)
+      
+      combined = []
+      for combination in itertools.islice(itertools.product(*partSolutions), limit):
+        solution = values.copy()
+        for subPart, partSolution in zip(subParts, combination):
+          solution[subPart] = partSolution[subPart]
+        combined.append(solution)
+      return combined
+    
+    solutions = []
+    # try the child that agrees with the guide solution first
+    children = list(self._branches(values, masks, blank, groupInfo))
+    if self.guide is not None:
+      children.sort(key=lambda child: not self._agreesWithGuide(*child))
+    
+    for childValues, childMasks in children:
+      solutions += self._search(childValues, childMasks, limit-len(solutions), part)
+      if len(solutions) >= limit:
+        break
+    return solutions
+  
+  
+  def _weighConflict(self):
+    """
+    # Make the cells around the last contradiction more likely to be branched
+    # on, so the search settles the parts of the board that keep failing
+    # first, instead of failing there again under every choice made elsewhere
+    #
+    """
+    
+    around = self.conflict.copy()
+    for neighbourConflict in Solver.neighbourArrays(self.conflict, fill=False):
+      around |= neighbourConflict
+    self.conflictWeights[around] += 1
+  
+  
+  def _independentParts(self, values, blank, groupInfo):
+    """
+    # Split blank cells into parts that can be filled independently
+    #  -blank cells that touch each other, or touch the same unfinished
+    #   group, are in the same part
+    #  -returns a boolean array of the cells in each part
+    #
+    """
+    
+    regions, numRegions = ndimage.label(blank, Solver.CONNECTIVITY)
+    if numRegions <= 1:
+      return [blank]
+    
+    # regions touching each unfinished group
+    labels, sizes, digits, status = groupInfo
+    orphanCells = (status == Board.GROUP_ORPHAN)[labels]
+    groupLabels  = []
+    regionLabels = []
+    for neighbourRegions in Solver.neighbourArrays(regions):
+      touching = orphanCells & (neighbourRegions > 0)
+      groupLabels.append(labels[touching])
+      regionLabels.append(neighbourRegions[touching])
+    groupLabels  = np.concatenate(groupLabels).tolist()
+    regionLabels = np.concatenate(regionLabels).tolist()
+    
+    # merge regions touching the same group
+    parent = list(range(numRegions+1))
+    def find(region):
+      while parent[region] != region:
+        parent[region] = parent[parent[region]]
+        region = parent[region]
+      return region
+    
+    firstRegion = {}
+    for label, region in zip(groupLabels, regionLabels):
+      parent[find(region)] = find(firstRegion.setdefault(label, region))
+    
+    roots = np.array([0] + [find(region) for region in range(1, numRegions+1)])
+    partOf = roots[regions]
+    return [partOf == root for root in np.unique(roots[1:]).tolist()]
+  
+  
+  def _agreesWithGuide(self, values, masks):
+    """ Is the guide solution still possible in this state """
+    return ((values == 0) | (values == self.guide)).all() and\
+           ((masks & Solver.DIGIT_BITS[self.guide]) != 0).all()
+  
+  
+  def _branches(self, values, masks, blank, groupInfo):
+    """
+    # Split a state into child states that between them hold all of its solutions
+    #  -try each way of completing the unfinished group with the fewest completions,
+    #   or, with no unfinished groups, each digit of the blank cell with the fewest
+    #   possible digits; both are scaled down by the cells' conflict weights
+    #  -if no completions are known, grow the unfinished group with the fewest
+    #   cells it could grow into: either a neighbouring cell joins the group, or
+    #   it doesn't
+    #
+    """
+    
+    # only branch on the given blank cells, and the unfinished groups touching them
+    labels, sizes, digits, status = groupInfo
+    orphan = status == Board.GROUP_ORPHAN
+    touching = np.zeros(len(status), bool)
+    for neighbourBlank in Solver.neighbourArrays(blank, fill=False):
+      touching[labels[neighbourBlank]] = True
+    orphan &= touching
+    orphan[0] = False
+    
+    # unfinished group with the fewest completions, for the highest conflict
+    # weight of its cells; these were enumerated, and cached, by the last
+    # round of propagation
+    fewest = None
+    if orphan.any():
+      bits = BoardBits(values, masks, labels, sizes)
+      groupWeights = ndimage.maximum(self.conflictWeights, labels, np.arange(len(sizes)))
+      for label in np.nonzero(orphan)[0].tolist():
+        completions = self._getCompletions(bits, label, int(digits[label]))
+        if completions is None:
+          continue
+        score = len(completions) / (1 + groupWeights[label])
+        if fewest is None or score < fewest[0]:
+          fewest = (score, int(digits[label]), completions)
+    
+    # each completion of the group
+    if fewest is not None:
+      _, digit, completions = fewest
+      bit = 1 << (digit-1)
+      for added, boundary in completions:
+        childValues = values.copy()
+        childMasks  = masks.copy()
+        childValues.flat[BoardBits.cells(added)] = digit
+        childMasks.flat[BoardBits.cells(added)]  = bit
+        childMasks.flat[BoardBits.cells(boundary)] &= Solver.ALL_DIGITS ^ bit
+        yield childValues, childMasks
+    
+    # each digit of the blank cell with the fewest possible digits, for the
+    # cells' conflict weights
+    elif not orphan.any():
+      counts = np.where(blank, Solver.MASK_COUNTS[masks], 10)
+      scores = np.where(blank, counts / (1 + self.conflictWeights), np.inf)
+      row, column = np.unravel_index(np.argmin(scores), scores.shape)
+      cellMask = int(masks[row, column])
+      for digit in range(1, 10):
+        if cellMask & (1 << (digit-1)):
+          childValues = values.copy()
+          childMasks  = masks.copy()
+          childValues[row, column] = digit
+          childMasks[row, column]  = 1 << (digit-1)
+          yield childValues, childMasks
+    
+    # either a cell joins the group, or it doesn't
+    else:
+      neighbourLabels, distinctLabels, neighbourDigits, _ = Solver._neighbourGroups(labels, sizes, digits)
+      libertyCounts, libertyCells = self._findLiberties(values, masks, orphan, neighbourLabels,
+                                                        distinctLabels, neighbourDigits)
+      label = int(np.argmin(np.where(orphan, libertyCounts, values.size+1)))
+      row, column = divmod(int(libertyCells[label]), self.columns)
+      bit = 1 << (int(digits[label])-1)
+      
+      childValues = values.copy()
+      childMasks  = masks.copy()
+      childValues[row, column] = digits[label]
+      childMasks[row, column]  = bit
+      yield childValues, childMasks
+      
+      childMasks = masks.copy()
+      childMasks[row, column] &= Solver.ALL_DIGITS ^ bit
+      yield values.copy(), childMasks
+  
+  
+  def propagate(self, values, masks):
+    """
+    # Apply the deduction rules until nothing changes
+    #  -updates the values and masks in place
+    #  -returns False if the board can't be solved
+    #
+    """
+    
+    while True:
+      result = self.deduce(values, masks)
+      if result is None:
+        return False
+      
+      assignments, changed = result
+      if assignments:
+        if not self.assign(values, masks, assignments):
+          return False
+      elif not changed:
+        return True
+  
+  
+  def assign(self, values, masks, assignments):
+    """
+    # Fill in cells
+    #  -returns False if a cell can't take its digit
+    #
+    # -assignments: list of (row, column, digit, rule)
+    #
+    """
+    
+    for row, column, digit, rule in assignments:
+      bit = 1 << (digit-1)
+      if not masks[row, column] & bit:
+        self.conflict = np.zeros(values.shape, bool)
+        self.conflict[row, column] = True
+        return False
+      values[row, column] = digit
+      masks[row, column]  = bit
+    
+    return True
+  
+  
+  def _contradiction(self, cells):
+    """ Note the cells that show the board can't be solved, and return None """
+    self.conflict = cells
+    return None
+  
+  
+  def _eliminate(self, masks, cells, bit, rule):
+    """ Remove a digit's bit from the masks of the given cells, returning whether any changed """
+    
+    changed = cells & ((masks & bit) != 0)
+    numChanged = int(np.count_nonzero(changed))
+    if numChanged:
+      masks[changed] &= ~np.uint16(bit)
+      self.ruleCounts[rule] += numChanged
+    return numChanged != 0
+  
+  
+  def _assignments(self, cells, digits, rule):
+    """ List of (row, column, digit, rule) assignments for the marked cells """
+    
+    rowList, columnList = np.nonzero(cells)
+    self.ruleCounts[rule] += len(rowList)
+    return [(row, column, int(digits[row, column]), rule)
+            for row, column in zip(rowList.tolist(), columnList.tolist())]
+  
+  
+  def deduce(self, values, masks):
+    """
+    # One round of deductions
+    #  -eliminates impossible digits from the masks in place
+    #  -returns None if the board can't be solved, otherwise the list of
+    #   forced (row, column, digit, rule) assignments from the first rule
+    #   that found any, and whether any masks changed
+    #
+    """
+    
+    changed = False
+    blank   = values == 0
+    
+    # CHECK: no group is too big
+    labels, sizes, digits, status = Board.labelGroups(values)
+    self.groupInfo = (labels, sizes, digits, status)
+    invalid = status == Board.GROUP_INVALID
+    if invalid.any():
+      return self._contradiction(invalid[labels])
+    
+    # the distinct groups next to each cell
+    neighbourLabels, distinctLabels, neighbourDigits, neighbourSizes = \
+      Solver._neighbourGroups(labels, sizes, digits)
+    
+    # blanks can't join groups that would become too big
+    for digit in range(1, 10):
+      bit = 1 << (digit-1)
+      
+      mergedSize   = np.ones(values.shape, np.int32)
+      nextComplete = np.zeros(values.shape, bool)
+      for distinct, neighbourDigit, neighbourSize in zip(distinctLabels, neighbourDigits, neighbourSizes):
+        isDigit = distinct & (neighbourDigit == digit)
+        mergedSize   += np.where(isDigit, neighbourSize, 0)
+        nextComplete |= isDigit & (neighbourSize >= digit)
+      
+      changed |= self._eliminate(masks, blank & nextComplete, bit, Solver.RULE_COMPLETE_GROUP)
+      changed |= self._eliminate(masks, blank & (mergedSize > digit), bit, Solver.RULE_MERGE_TOO_BIG)
+    
+    # CHECK: every blank has a possible digit
+    maskCounts = Solver.MASK_COUNTS[masks]
+    if (blank & (maskCounts == 0)).any():
+      return self._contradiction(blank & (maskCounts == 0))
+    
+    # blanks with one possible digit
+    singles = blank & (maskCounts == 1)
+    if singles.any():
+      return self._assignments(singles, Solver.MASK_LOWEST[masks], Solver.RULE_SINGLE_CANDIDATE), changed
+    
+    # unfinished groups with one cell to grow into
+    orphan = status == Board.GROUP_ORPHAN
+    libertyCounts, libertyCells = self._findLiberties(values, masks, orphan, neighbourLabels,
+                                                      distinctLabels, neighbourDigits)
+    
+    # CHECK: every unfinished group can grow
+    stuck = orphan & (libertyCounts == 0)
+    if stuck.any():
+      return self._contradiction(stuck[labels])
+    
+    singleLabels = np.nonzero(orphan & (libertyCounts == 1))[0].tolist()
+    if singleLabels:
+      self.ruleCounts[Solver.RULE_SINGLE_LIBERTY] += len(singleLabels)
+      return [(*divmod(int(libertyCells[label]), self.columns), int(digits[label]), Solver.RULE_SINGLE_LIBERTY)
+              for label in singleLabels], changed
+    
+    # regions of cells that could be each digit
+    blankDigits = np.zeros(values.shape, np.int8)
+    for digit in range(1, 10):
+      bit = 1 << (digit-1)
+      
+      regions, numRegions = ndimage.label((masks & bit) != 0, Solver.CONNECTIVITY)
+      if numRegions == 0:
+        continue
+      regionSizes = np.bincount(regions.ravel(), minlength=numRegions+1)
+      
+      # too small for a group of this digit
+      tooSmall    = regionSizes < digit
+      tooSmall[0] = False
+      smallCells  = tooSmall[regions]
+      if (smallCells & (values == digit)).any():
+        return self._contradiction(smallCells & (values == digit))
+      changed |= self._eliminate(masks, blank & smallCells, bit, Solver.RULE_REGION_TOO_SMALL)
+      
+      # exactly the right size for an unfinished group of this digit
+      hasGroup = np.bincount(regions[values == digit], minlength=numRegions+1) > 0
+      exactFit = (regionSizes == digit) & hasGroup
+      exactFit[0] = False
+      blankDigits[blank & exactFit[regions] & (blankDigits == 0)] = digit
+    
+    if (blankDigits > 0).any():
+      return self._assignments(blankDigits > 0, blankDigits, Solver.RULE_REGION_EXACT_FIT), changed
+    
+    # only when the cheaper rules are stuck, look at how unfinished groups could be completed
+    if changed:
+      return [], changed
+    return self._extensionDeductions(values, masks, labels, sizes, digits, status)
+  
+  
+  @staticmethod
+  def _neighbourGroups(labels, sizes, digits):
+    """
+    # The labels, digits and sizes of the groups next to each cell, in the
+    # N, S, W, E directions, and which of those are distinct groups
+    #
+    """
+    
+    neighbourLabels = Solver.neighbourArrays(labels)
+    distinctLabels  = []
+    for iLabel, neighbourLabel in enumerate(neighbourLabels):
+      distinct = neighbourLabel > 0
+      for otherLabel in neighbourLabels[:iLabel]:
+        distinct &= neighbourLabel != otherLabel
+      distinctLabels.append(distinct)
+    neighbourDigits = [digits[neighbourLabel] for neighbourLabel in neighbourLabels]
+    neighbourSizes  = [sizes[neighbourLabel] for neighbourLabel in neighbourLabels]
+    
+    return neighbourLabels, distinctLabels, neighbourDigits, neighbourSizes
+  
+  
+  def _findLiberties(self, values, masks, orphan, neighbourLabels, distinctLabels, neighbourDigits):
+    """
+    # Count the blank cells each unfinished group could grow into
+    #  -returns the count for each label, and the flat index of one of the cells
+    #
+    """
+    
+    blank     = values == 0
+    numLabels = len(orphan)
+    flatCells = np.arange(values.size).reshape(values.shape)
+    
+    libertyCounts = np.zeros(numLabels, np.int32)
+    libertyCells  = np.zeros(numLabels, np.intp)
+    for neighbourLabel, distinct, neighbourDigit in zip(neighbourLabels, distinctLabels, neighbourDigits):
+      canGrow = blank & distinct & orphan[neighbourLabel] &\
+                ((masks & Solver.DIGIT_BITS[neighbourDigit]) != 0)
+      growLabels = neighbourLabel[canGrow]
+      libertyCounts += np.bincount(growLabels, minlength=numLabels).astype(np.int32)
+      libertyCells[growLabels] = flatCells[canGrow]
+    
+    return libertyCounts, libertyCells
+  
+  
+  def _extensionDeductions(self, values, masks, labels, sizes, digits, status):
+    """
+    # Deductions from enumerating the completions of each unfinished group
+    #  -returns None if a group can't be completed, otherwise the forced
+    #   assignments and whether any masks changed
+    #
+    """
+    
+    bits = BoardBits(values, masks, labels, sizes)
+    
+    # the groups closest to being complete first
+    orphanLabels = np.nonzero(status == Board.GROUP_ORPHAN)[0]
+    orphanLabels = orphanLabels[np.argsort(digits[orphanLabels] - sizes[orphanLabels], kind="stable")]
+    
+    # cells some unfinished group of each digit could cover
+    coverage = [0] * 10
+    
+    assignments  = []
+    eliminations = []
+    for label in orphanLabels.tolist():
+      
+      digit = int(digits[label])
+      completions = self._getCompletions(bits, label, digit)
+      
+      # too many completions; the group could reach any cell close enough
+      if completions is None:
+        coverage[digit] |= self._groupReach(bits, label, digit, digit-int(sizes[label]))
+        continue
+      
+      if not completions:
+        return self._contradiction(labels == label)
+      
+      inAll     = bits.full
+      borderAll = bits.full
+      for added, boundary in completions:
+        coverage[digit] |= added
+        inAll     &= added
+        borderAll &= boundary
+      
+      for cell in BoardBits.cells(inAll):
+        assignments.append((*divmod(cell, self.columns), digit, Solver.RULE_GROUP_EXTENSION))
+      borderAll &= bits.forDigit(digit)[0]
+      if borderAll:
+        eliminations.append((borderAll, digit))
+    
+    if assignments:
+      self.ruleCounts[Solver.RULE_GROUP_EXTENSION] += len(assignments)
+      return assignments, False
+    
+    changed = False
+    for cells, digit in eliminations:
+      changed |= self._eliminate(masks, bits.toArray(cells), 1 << (digit-1), Solver.RULE_GROUP_BOUNDARY)
+    
+    # blanks must be part of an unfinished group, or of a new group of blank
+    # cells that doesn't touch any cells of the same digit
+    blank = values == 0
+    neighbourValues = Solver.neighbourArrays(values)
+    for digit in range(1, 10):
+      bit = 1 << (digit-1)
+      
+      nextToDigit = np.zeros(values.shape, bool)
+      for neighbourValue in neighbourValues:
+        nextToDigit |= neighbourValue == digit
+      
+      fresh = blank & ((masks & bit) != 0) & ~nextToDigit
+      regions, numRegions = ndimage.label(fresh, Solver.CONNECTIVITY)
+      bigEnough    = np.bincount(regions.ravel(), minlength=numRegions+1) >= digit
+      bigEnough[0] = False
+      
+      changed |= self._eliminate(masks, blank & ~bigEnough[regions] & ~bits.toArray(coverage[digit]),
+                                 bit, Solver.RULE_UNREACHABLE)
+    
+    return [], changed
+  
+  
+  def _getCompletions(self, bits, label, digit):
+    """
+    # The completions of an unfinished group, reusing the last enumeration
+    # if none of the cells it looked at have changed since
+    #
+    """
+    
+    allowed, forced, filled = bits.forDigit(digit)
+    
+    key    = (digit, bits.group(label))
+    cached = self.completionCache.get(key)
+    if cached is not None:
+      touched, snapshot, completions = cached
+      if snapshot == (allowed & touched, forced & touched, filled & touched, bits.blank & touched):
+        return completions
+    
+    completions, touched = self._enumerateCompletions(bits, label, digit)
+    
+    if len(self.completionCache) >= Solver.MAX_CACHED:
+      self.completionCache.clear()
+    snapshot = (allowed & touched, forced & touched, filled & touched, bits.blank & touched)
+    self.completionCache[key] = (touched, snapshot, completions)
+    
+    return completions
+  
+  
+  def _enumerateCompletions(self, bits, label, digit):
+    """
+    # Enumerate the ways an unfinished group could grow to its full size
+    #  -each completion is a bitset of the blank cells added, and a bitset of
+    #   the blank cells bordering the completed group
+    #  -growing next to another group of the same digit merges it in
+    #  -completions are None if enumeration takes more than MAX_EXTENSION_STEPS
+    #  -also returns a bitset of every cell the enumeration looked at
+    #
+    """
+    
+    allowed, forced, filled = bits.forDigit(digit)
+    blank      = bits.blank
+    neighbours = bits.neighbours
+    group      = bits.group(label)
+    
+    completions = []
+    steps       = [0]
+    visited     = [group]
+    
+    def grow(region, around, frontier, excluded, total):
+      steps[0] += 1
+      if steps[0] > Solver.MAX_EXTENSION_STEPS:
+        raise _ExtensionLimitError("enumeration reached its limit of {} steps"
+                                   .format(Solver.MAX_EXTENSION_STEPS))
+      
+      # complete: every blank cell around the group must be able to be another digit
+      if total == digit:
+        boundary = around & blank & ~region
+        if not boundary & forced:
+          completions.append((region & blank, boundary))
+        return
+      
+      if not frontier:
+        return
+      
+      cell = frontier & -frontier
+      rest = frontier ^ cell
+      
+      # grow into the cell, merging any neighbouring groups of the same digit
+      grown    = cell
+      newTotal = total + 1
+      touching = neighbours(cell) & filled & ~region
+      while touching:
+        otherGroup = bits.groupOf(touching & -touching)
+        grown     |= otherGroup
+        newTotal  += bits.groupSize(otherGroup)
+        touching  &= ~otherGroup
+      visited[0] |= grown
+      
+      if newTotal <= digit:
+        grownAround = neighbours(grown)
+        grow(region | grown, around | grownAround,
+             (rest | grownAround) & allowed & ~excluded & ~region & ~grown, excluded, newTotal)
+      
+      # or keep it out of the group
+      grow(region, around, rest, excluded | cell, total)
+    
+    try:
+      grow(group, neighbours(group), neighbours(group) & allowed, 0, int(bits.sizes[label]))
+    except _ExtensionLimitError:
+      completions = None
+    
+    # the enumeration only looked at cells in, or next to, the group as it grew
+    return completions, visited[0] | neighbours(visited[0])
+  
+  
+  def _groupReach(self, bits, label, digit, need):
+    """
+    # Bitset of the blank cells an unfinished group could reach by growing
+    # <need> more cells
+    #  -passing through other groups of the same digit is free, so this never
+    #   underestimates the reach
+    #
+    """
+    
+    allowed, forced, filled = bits.forDigit(digit)
+    
+    def absorb(reach):
+      while True:
+        touching = bits.neighbours(reach) & filled & ~reach
+        if not touching:
+          return reach
+        reach |= touching
+    
+    reach = absorb(bits.group(label))
+    for step in range(need):
+      reach = absorb(reach | (bits.neighbours(reach) & allowed))
+    
+    return reach & bits.blank
+
+
+
+class BoardBits(object):
+  """
+  # A board state as bitsets: python ints with bit (row * columns + column)
+  # set for each cell in the set. Used to quickly enumerate the ways groups
+  # could grow.
+  #
+  """
+  
+  # first and last column masks, for each board shape
+  columnMasks = {}
+  
+  @staticmethod
+  def fromArray(arr):
+    """ Bitset of the True cells of a boolean array """
+    return int.from_bytes(np.packbits(arr.ravel(), bitorder="little").tobytes(), "little")
+  
+  @staticmethod
+  def cells(bits):
+    """ Flat indices of the cells in a bitset """
+    
+    cells = []
+    while bits:
+      cell  = bits & -bits
+      bits ^= cell
+      cells.append(cell.bit_length() - 1)
+    return cells
+  
+  def __init__(self, values, masks, labels, sizes):
+    """
+    # -values: (array) board values, 0 for blank cells
+    # -masks:  (array) candidate digit masks
+    # -labels: (array) group labels, as returned by Board.labelGroups
+    # -sizes:  (array) size of each label
+    #
+    """
+    
+    self.shape   = values.shape
+    self.columns = values.shape[1]
+    self.full    = (1 << values.size) - 1
+    
+    if self.shape not in BoardBits.columnMasks:
+      columnIndex = np.indices(self.shape)[1]
+      BoardBits.columnMasks[self.shape] = (BoardBits.fromArray(columnIndex != 0),
+                                           BoardBits.fromArray(columnIndex != self.columns-1))
+    self.notFirstColumn, self.notLastColumn = BoardBits.columnMasks[self.shape]
+    
+    self.values = values
+    self.masks  = masks
+    self.blank  = BoardBits.fromArray(values == 0)
+    
+    # group lookups
+    self.sizes      = sizes
+    self.flatLabels = labels.ravel().tolist()
+    self.groupOrder = np.argsort(labels.ravel(), kind="stable")
+    self.groupEnds  = np.cumsum(np.bincount(labels.ravel(), minlength=len(sizes)))
+    self.groupBits  = {}
+    
+    self.digitBits  = {}
+  
+  def toArray(self, bits):
+    """ Boolean array of the cells in a bitset """
+    
+    numCells = self.shape[0] * self.shape[1]
+    packed   = np.frombuffer(bits.to_bytes((numCells+7) // 8, "little"), np.uint8)
+    return np.unpackbits(packed, bitorder="little")[:numCells].reshape(self.shape).astype(bool)
+  
+  def neighbours(self, bits):
+    """ Bitset of the N, S, W, E neighbours of the cells in a bitset """
+    return ((bits >> self.columns) | (bits << self.columns) |
+            ((bits & self.notLastColumn) << 1) | ((bits & self.notFirstColumn) >> 1)) & self.full
+  
+  def group(self, label):
+    """ Bitset of a group's cells """
+    
+    if label not in self.groupBits:
+      bits = 0
+      for cell in self.groupOrder[self.groupEnds[label-1]:self.groupEnds[label]].tolist():
+        bits |= 1 << cell
+      self.groupBits[label] = bits
+    return self.groupBits[label]
+  
+  def groupOf(self, cell):
+    """ Bitset of the group containing a single-cell bitset """
+    return self.group(self.flatLabels[cell.bit_length() - 1])
+  
+  def groupSize(self, group):
+    """ Number of cells in a group's bitset """
+    return int(self.sizes[self.flatLabels[(group & -group).bit_length() - 1]])
+  
+  def forDigit(self, digit):
+    """
+    # Bitsets of the blank cells that could be the digit, the blank cells that
+    # can only be the digit, and the cells that are the digit
+    #
+    """
+    
+    if digit not in self.digitBits:
+      bit   = 1 << (digit-1)
+      blank = self.values == 0
+      self.digitBits[digit] = (BoardBits.fromArray(blank & ((self.masks & bit) != 0)),
+                               BoardBits.fromArray(blank & (self.masks == bit)),
+                               BoardBits.fromArray(self.values == digit))
+    return self.digitBits[digit]
@@ -4,6 +4,7 @@ import unittest
 import numpy as np
 
 from fillomino.board import Board
+from fillomino.codec import BoardCodec
 
 class test_Board(unittest.TestCase):
   
@@ -237,4 +238,406 @@ class test_Board(unittest.TestCase):
     board.updateCell(1,0,1)
     self.assertTrue(board.isBoardValid())
     self.assertTrue(board.isBoardComplete())
-    
\ No newline at end of file
+      
+  
+  @staticmethod
+  def _groupSets(board):
+    """ The board's groups as sets of cells, for comparing group info """
+    return [{number: sorted(sorted(group) for group in groups) for number, groups in groupDict.items()}
+            for groupDict in [board.getValidGroups(), board.getInvalidGroups(), board.getOrphanGroups()]]
+  
+  
+  @unittest.skipIf(not TEST_ALL, " not part of individual test")
+  def test_incrementalGroups(self):
+    """ Updating single cells gives the same groups as regrouping the whole board """
+    
+    numTests = 10
+    
+    for _ in range(numTests):
+      
+      rows    = int(np.random.randint(5, 12))
+      columns = int(np.random.randint(5, 12))
+      
+      board = Board(rows=rows, columns=columns)
+      board.updateGroups()
+      
+      # update random cells, mostly with small numbers so groups merge and
+      # split, only ever patching the groups
+      for step in range(1, 501):
+        row   = int(np.random.randint(0, rows))
+        col   = int(np.random.randint(0, columns))
+        value = int(np.random.choice([0, 1, 2, 3, 4, 9]))
+        board.updateCell(row, col, value)
+        self.assertTrue(board.groupsInSync)
+        
+        if step % 25:
+          continue
+        
+        # a fresh board, grouped from scratch
+        freshBoard = Board(rows=rows, columns=columns, initialValues=board.getValues().copy())
+        freshBoard.updateGroups()
+        filled = board.getValues() != 0
+        
+        # TEST: cells share a label exactly when they share a fresh label
+        self.assertTrue((board.labels[~filled] == 0).all())
+        labelPairs = set(zip(board.labels[filled].tolist(), freshBoard.labels[filled].tolist()))
+        self.assertEqual(len(labelPairs), len(np.unique(board.labels[filled])))
+        self.assertEqual(len(labelPairs), len(np.unique(freshBoard.labels[filled])))
+        
+        # TEST: every cell's group has the same size, digit and status
+        for labelInfo in ["labelSizes", "labelDigits", "labelStatus"]:
+          self.assertListEqual(getattr(board, labelInfo)[board.labels][filled].tolist(),
+                               getattr(freshBoard, labelInfo)[freshBoard.labels][filled].tolist())
+        
+        # TEST: the group counters match
+        self.assertEqual(board.numOrphanCells,   freshBoard.numOrphanCells)
+        self.assertEqual(board.numInvalidGroups, freshBoard.numInvalidGroups)
+        self.assertListEqual(test_Board._groupSets(board), test_Board._groupSets(freshBoard))
+  
+  
+  @unittest.skipIf(not TEST_ALL, " not part of individual test")
+  def test_isCompletable(self):
+    """ Moves that leave the board impossible to complete are found """
+    
+    # the values in the top left corner of a blank board
+    def makeBoard(valueList):
+      board = Board(rows=Board.MIN_BOARD_ROWS, columns=Board.MIN_BOARD_COLUMNS)
+      for row, rowValues in enumerate(valueList):
+        for column, value in enumerate(rowValues):
+          board.updateCell(row, column, value)
+      return board
+    
+    # TEST: filling in the solution never leaves a dead end
+    board = Board.getExampleBoard()
+    self.assertTrue(board.isCompletable())
+    for row, column in np.argwhere(board.getValues() == 0).tolist():
+      board.updateCell(row, column, int(board.getFinalValues()[row, column]))
+      self.assertTrue(board.isCompletable(row, column))
+    
+    # TEST: a 5 walled into a 3 cell pocket
+    board = makeBoard([[5, 0, 1], [0, 1, 0], [1, 0, 0]])
+    self.assertFalse(board.isCompletable(0, 0))
+    self.assertFalse(board.isCompletable())
+    board.updateCell(1, 1, 0)
+    self.assertTrue(board.isCompletable(1, 1))
+    
+    # TEST: the only way out merges two 2s
+    board = makeBoard([[2, 0, 2], [1, 4, 1], [4, 4, 4]])
+    self.assertFalse(board.isCompletable(0, 0))
+    
+    # TEST: a blank cell surrounded by 1s
+    board = makeBoard([[1, 0, 1], [3, 1, 3], [3, 3, 3]])
+    self.assertFalse(board.isCompletable(0, 1))
+    
+    # TEST: a group that's too big
+    board = makeBoard([[2, 2, 2], [0, 0, 0], [0, 0, 0]])
+    self.assertFalse(board.isCompletable(1, 1))
+  
+  
+  @unittest.skipIf(not TEST_ALL, " not part of individual test")
+  def test_candidates(self):
+    """ Candidate masks follow the groups around each blank cell """
+    
+    board = Board(rows=5, columns=5)
+    self.assertTrue((board.getCandidates() == Board.ALL_CANDIDATES).all())
+    
+    # TEST: a 1 rules out 1s next to it, a finished 2 rules out 2s
+    board.updateCell(0, 0, 1)
+    board.updateCell(2, 2, 2)
+    board.updateCell(2, 3, 2)
+    self.assertEqual(board.getCellCandidates(0, 0), [])
+    self.assertEqual(board.getCellCandidates(0, 1), list(range(2, 10)))
+    self.assertEqual(board.getCellCandidates(1, 2), [1] + list(range(3, 10)))
+    
+    # TEST: merging two 3s past 3 is ruled out, and a walled in cell can
+    # only be a 1 or join its neighbours
+    board.updateCell(4, 0, 3)
+    board.updateCell(4, 1, 0)
+    board.updateCell(4, 2, 3)
+    board.updateCell(3, 2, 3)
+    self.assertEqual(board.getCellCandidates(4, 1), [1, 2] + list(range(4, 10)))
+    board.updateCell(3, 1, 4)
+    self.assertEqual(board.getCellCandidates(4, 1), [1, 4])
+    
+    # TEST: candidates kept up to date through single cell updates and
+    # rollbacks match working them out again
+    rows, columns = 12, 12
+    board = Board(rows=rows, columns=columns)
+    board.getCandidates()
+    board.beginTransaction()
+    for _ in range(300):
+      row   = int(np.random.randint(0, rows))
+      col   = int(np.random.randint(0, columns))
+      value = int(np.random.choice([0, 0, 1, 2, 3, 4, 9]))
+      board.updateCell(row, col, value)
+      self.assertTrue((board.getCandidates() == board._findCandidates()).all())
+    board.rollbackTransaction()
+    self.assertTrue((board.getCandidates() == Board.ALL_CANDIDATES).all())
+  
+  
+  @unittest.skipIf(not TEST_ALL, " not part of individual test")
+  def test_groupLabels(self):
+    """ Cell labels give the group, size and status of every cell """
+    
+    board = Board.getExampleFinishedBoard()
+    board.updateCell(0, 0, 4, updateInitialCells=True)
+    
+    statusGroups = [(Board.GROUP_VALID,   board.getValidGroups()),
+                    (Board.GROUP_INVALID, board.getInvalidGroups()),
+                    (Board.GROUP_ORPHAN,  board.getOrphanGroups())]
+    
+    for status, groupDict in statusGroups:
+      for number, groups in groupDict.items():
+        for group in groups:
+          for row, col in group:
+            
+            # TEST: blank cells have no label
+            label = board.getGroupLabel(row, col)
+            if number == 0:
+              self.assertEqual(label, 0)
+              continue
+            
+            # TEST: label matches the group
+            self.assertEqual(board.getGroupStatus(label), status)
+            self.assertEqual(board.getGroupSize(label), len(group))
+            self.assertEqual(board.getGroupDigit(label), number)
+            self.assertListEqual(sorted(board.getGroupCells(label)), sorted(group))
+  
+  
+  @unittest.skipIf(not TEST_ALL, " not part of individual test")
+  def test_largeGroups(self):
+    """ Groups far larger than the recursion limit are found """
+    
+    rows    = 150
+    columns = 150
+    
+    initialVals = np.full((rows, columns), 2, np.int8)
+    initialVals[0][0] = 0
+    board = Board(rows=rows, columns=columns, initialValues=initialVals)
+    
+    # TEST: joining the big group finds all of its cells
+    board.updateCell(0, 0, 2)
+    label = board.getGroupLabel(0, 0)
+    self.assertEqual(board.getGroupSize(label), rows*columns)
+    self.assertEqual(board.getGroupStatus(label), Board.GROUP_INVALID)
+    self.assertEqual(len(board._findNeighbourMatches(0, 0, 2, [(0, 0)])), rows*columns)
+  
+  
+  @unittest.skipIf(not TEST_ALL, " not part of individual test")
+  def test_transactions(self):
+    """ Rolled back changes restore the values and groups, committed changes are kept """
+    
+    board = Board.getExampleBoard()
+    rows, columns = board.getBoardDimensions()
+    
+    def randomUpdates(numUpdates, updateGroups=True):
+      for _ in range(numUpdates):
+        row = int(np.random.randint(0, rows))
+        col = int(np.random.randint(0, columns))
+        board.updateCell(row, col, int(np.random.randint(0, 10)), updateGroups=updateGroups)
+    
+    for _ in range(10):
+      
+      startValues = board.getValues().copy()
+      startGroups = test_Board._groupSets(board)
+      
+      # TEST: rolling back restores the values and groups
+      board.beginTransaction()
+      randomUpdates(50)
+      board.rollbackTransaction()
+      self.assertListEqual(board.getValues().tolist(), startValues.tolist())
+      self.assertListEqual(test_Board._groupSets(board), startGroups)
+      
+      # TEST: rolling back un-grouped changes regroups the board
+      board.beginTransaction()
+      randomUpdates(50, updateGroups=False)
+      board.rollbackTransaction()
+      self.assertListEqual(board.getValues().tolist(), startValues.tolist())
+      self.assertListEqual(test_Board._groupSets(board), startGroups)
+      
+      # TEST: nested transactions only roll back their own changes
+      board.beginTransaction()
+      randomUpdates(20)
+      innerValues = board.getValues().copy()
+      innerGroups = test_Board._groupSets(board)
+      board.beginTransaction()
+      randomUpdates(20)
+      board.rollbackTransaction()
+      self.assertListEqual(board.getValues().tolist(), innerValues.tolist())
+      self.assertListEqual(test_Board._groupSets(board), innerGroups)
+      
+      # TEST: committed changes are kept
+      board.commitTransaction()
+      self.assertListEqual(board.getValues().tolist(), innerValues.tolist())
+      self.assertListEqual(board.journal, [])
+    
+    # TEST: can't commit or roll back without a transaction
+    self.assertRaises(SystemError, board.commitTransaction)
+    self.assertRaises(SystemError, board.rollbackTransaction)
+  
+  
+  @unittest.skipIf(not TEST_ALL, " not part of individual test")
+  def test_groupCounters(self):
+    """ Maintained group counters match a full regroup """
+    
+    Board.DEBUG_GROUP_COUNTERS = True
+    try:
+      board = Board.getExampleBoard()
+      rows, columns = board.getBoardDimensions()
+      
+      # TEST: counters stay correct through single cell updates and rollbacks
+      board.beginTransaction()
+      for _ in range(300):
+        row = int(np.random.randint(0, rows))
+        col = int(np.random.randint(0, columns))
+        board.updateCell(row, col, int(np.random.randint(0, 10)))
+        board.isBoardValid()
+        board.isBoardComplete()
+      board.rollbackTransaction()
+      board.isBoardComplete()
+      
+      # TEST: a finished board is complete
+      finishedBoard = Board.getExampleFinishedBoard()
+      self.assertTrue(finishedBoard.isBoardComplete())
+      
+      # TEST: counters that don't match the board are caught
+      board.numInvalidGroups += 1
+      self.assertRaises(SystemError, board.isBoardValid)
+    
+    finally:
+      Board.DEBUG_GROUP_COUNTERS = False
+  
+  
+  @unittest.skipIf(not TEST_ALL, " not part of individual test")
+  def test_lazyGroups(self):
+    """ Groups are only found when needed after a change """
+    
+    # TEST: new boards aren't grouped until the groups are needed
+    board = Board.getExampleBoard()
+    self.assertFalse(board.groupsInSync)
+    self.assertFalse(board.isBoardComplete())
+    self.assertTrue(board.groupsInSync)
+    
+    # TEST: single cell updates keep the groups in sync
+    board.updateCell(0, 1, 5)
+    self.assertTrue(board.groupsInSync)
+    
+    # TEST: bulk changes mark the groups as out of date, and they're
+    #       regrouped when next needed
+    for bulkChange in [board.resetBoard, board.clearErrors]:
+      board.updateCell(0, 1, 3)
+      bulkChange()
+      self.assertFalse(board.groupsInSync)
+      self.assertEqual(board.getGroupLabel(0, 1), 0)
+      self.assertTrue(board.groupsInSync)
+    
+    board.updateCell(0, 1, 5, updateGroups=False)
+    self.assertFalse(board.groupsInSync)
+    self.assertEqual(board.getGroupSize(board.getGroupLabel(0, 1)), 2)
+  
+  
+  @unittest.skipIf(not TEST_ALL, " not part of individual test")
+  def test_bytes(self):
+    """ Boards pack to bytes and back """
+    
+    # TEST: example board packs to 4 bits per cell, plus the header
+    board = Board.getExampleBoard()
+    data  = board.toBytes()
+    self.assertEqual(len(data), BoardCodec.HEADER.size + 2*200)
+    
+    # TEST: boards (including odd numbers of cells and no final values) unpack to the same values
+    for _ in range(20):
+      rows    = int(np.random.randint(5, 30))
+      columns = int(np.random.randint(5, 30))
+      initialVals = np.random.randint(0, 10, (rows, columns))
+      finalVals   = np.random.randint(1, 10, (rows, columns)) if np.random.rand() < 0.5 else None
+      
+      board = Board(rows=rows, columns=columns, initialValues=initialVals, finalValues=finalVals)
+      newBoard = Board.fromBytes(board.toBytes(), id=3)
+      
+      self.assertEqual(newBoard.getBoardDimensions(), (rows, columns))
+      self.assertEqual(newBoard.getID(), 3)
+      self.assertListEqual(newBoard.getInitialValues().tolist(), initialVals.tolist())
+      if finalVals is None:
+        self.assertIsNone(newBoard.getFinalValues())
+      else:
+        self.assertListEqual(newBoard.getFinalValues().tolist(), finalVals.tolist())
+    
+    # TEST: bad data is rejected
+    data = Board.getExampleBoard().toBytes()
+    self.assertRaises(ValueError, Board.fromBytes, data[:-1])
+    self.assertRaises(ValueError, Board.fromBytes, bytes([BoardCodec.VERSION+1]) + data[1:])
+    self.assertRaises(ValueError, BoardCodec.packValues, np.full((5, 5), 10))
+    
+    # TEST: corrupt cells, in the initial or final values, are rejected
+    for offset in [0, BoardCodec.packedLength(*Board.getExampleBoard().getBoardDimensions())]:
+      corrupt = bytearray(data)
+      corrupt[BoardCodec.HEADER.size + offset] = 0xFF
+      self.assertRaises(ValueError, BoardCodec.decode, bytes(corrupt))
+      self.assertRaises(ValueError, Board.fromBytes, bytes(corrupt))
+  
+  
+  @unittest.skipIf(not TEST_ALL, " not part of individual test")
+  def test_createBoard(self):
+    """ Boards are created from flat lists or packed values, including rectangular boards """
+    
+    for _ in range(20):
+      rows    = int(np.random.randint(5, 30))
+      columns = int(np.random.randint(5, 30))
+      initialVals = np.random.randint(0, 10, (rows, columns))
+      finalVals   = np.random.randint(1, 10, (rows, columns))
+      stats       = {"id": 4, "stats": {"a": 1}}
+      
+      # TEST: flat lists
+      board = Board.createBoard(rows, columns,
+                                initial_board=initialVals.flatten().tolist(),
+                                final_board=finalVals.flatten().tolist(),
+                                **stats)
+      self.assertListEqual(board.getInitialValues().tolist(), initialVals.tolist())
+      self.assertListEqual(board.getFinalValues().tolist(), finalVals.tolist())
+      self.assertDictEqual(board.getBoardStats(), stats)
+      
+      # TEST: packed values
+      board = Board.createBoard(rows, columns,
+                                initial_board=BoardCodec.packValues(initialVals),
+                                final_board=BoardCodec.packValues(finalVals))
+      self.assertListEqual(board.getInitialValues().tolist(), initialVals.tolist())
+      self.assertListEqual(board.getFinalValues().tolist(), finalVals.tolist())
+    
+    # TEST: missing, wrongly sized, or out of range values are rejected
+    validList = [1] * 5 * 6
+    self.assertRaises(ValueError, Board.createBoard, 5, 6, initial_board=validList)
+    self.assertRaises(ValueError, Board.createBoard, 5, 6, initial_board=validList, final_board=[1]*29)
+    self.assertRaises(ValueError, Board.createBoard, 5, 6, initial_board=validList, final_board=[10]*30)
+    self.assertRaises(ValueError, Board.createBoard, 5, 6, initial_board=validList, final_board=b"\x11"*14)
+    self.assertRaises(ValueError, Board.createBoard, 5, 6, initial_board=validList, final_board=b"\xff"+b"\x11"*14)
+  
+  
+  @unittest.skipIf(not TEST_ALL, " not part of individual test")
+  def test_valuesHash(self):
+    """ The maintained values hash matches a full rehash """
+    
+    board = Board.getExampleBoard()
+    rows, columns = board.getBoardDimensions()
+    startHash = board.getValuesHash()
+    
+    # TEST: hash is kept up to date through single cell updates and rollbacks
+    board.beginTransaction()
+    for _ in range(200):
+      row = int(np.random.randint(0, rows))
+      col = int(np.random.randint(0, columns))
+      board.updateCell(row, col, int(np.random.randint(0, 10)), updateGroups=bool(np.random.rand() < 0.5))
+      self.assertEqual(board.getValuesHash(), Board.hashValues(board.getValues()))
+    board.rollbackTransaction()
+    self.assertEqual(board.getValuesHash(), startHash)
+    
+    # TEST: boards with the same values have the same hash
+    self.assertEqual(Board.getExampleBoard().getValuesHash(), startHash)
+    self.assertEqual(Board.getExampleFinishedBoard().getValuesHash(), board.getFinalHash())
+    self.assertNotEqual(board.getFinalHash(), startHash)
+    
+    # TEST: direct changes are rehashed
+    board.values[0][1] = 5
+    board.invalidateGroups()
+    self.assertEqual(board.getValuesHash(), Board.hashValues(board.getValues()))
+    self.assertNotEqual(board.getValuesHash(), startHash)
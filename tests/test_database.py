@@ -2,11 +2,13 @@
 import unittest
 
 import datetime
+import json
 import os
 
 import numpy as np
 
-from fillomino.database import Database, DatabaseInfo
+from fillomino.board import Board
+from fillomino.database import Database, DatabaseInfo, DuplicateBoardError
 
 class test_Database(unittest.TestCase):
   
@@ -345,3 +347,118 @@ class test_Database(unittest.TestCase):
     # TEST: the board info matches the boards we added
     for rows, cols, count in dimCountList:
       self.assertEqual(boardInfo[(rows,cols)]["length"], count)
+
+
+  @unittest.skipIf(not TEST_ALL, " not part of individual test")
+  def test_duplicateBoards(self):
+    """ Can't store a board, or a rotation or reflection of it, twice """
+    
+    board = Board.getExampleBoard()
+    rows, columns = board.getBoardDimensions()
+    
+    def storeArgs(boardID, initialValues, finalValues):
+      return {
+        "rows":          rows,
+        "columns":       columns,
+        "boardID":       boardID,
+        "initialBoard":  initialValues.flatten().tolist(),
+        "finalBoard":    finalValues.flatten().tolist(),
+        "creationDate":  str(datetime.datetime.utcnow()),
+        "stats":         {},
+        "canonicalHash": Board.canonicalHash(initialValues, finalValues)
+      }
+    
+    # store the board
+    self.db.storeBoard(**storeArgs(1, board.getInitialValues(), board.getFinalValues()))
+    self.assertRaises(DuplicateBoardError, self.db.storeBoard,
+                      **storeArgs(30, board.getInitialValues(), board.getFinalValues()))
+    
+    # TEST: every rotation and reflection is a duplicate
+    for boardID, (initialValues, finalValues) in enumerate(zip(Board.getSymmetries(board.getInitialValues()),
+                                                               Board.getSymmetries(board.getFinalValues())), 2):
+      self.assertRaises(DuplicateBoardError, self.db.storeBoard,
+                        **storeArgs(boardID, initialValues, finalValues))
+    
+    # TEST: a different puzzle with the same solution is stored
+    otherInitial = board.getInitialValues().copy()
+    otherInitial[0][0] = 0
+    self.assertIsNotNone(self.db.storeBoard(**storeArgs(20, otherInitial, board.getFinalValues())))
+    
+    # TEST: loaded boards keep their canonical hash
+    loadedBoard = self.db.loadBoard(rows=rows, columns=columns, boardID=1)
+    self.assertEqual(loadedBoard.getBoardStats("canonical_hash"), board.getCanonicalHash())
+
+
+  @unittest.skipIf(not TEST_ALL, " not part of individual test")
+  def test_oldBoardTables(self):
+    """ Tables without a canonical hash column are upgraded """
+    
+    rows    = 12
+    columns = 12
+    
+    # create a table without the canonical hash column, with boards 1 and 2
+    # the same puzzle
+    tableDefinition = DatabaseInfo.getBoardTableDefinition(rows, columns)
+    self.db._executeCommand(tableDefinition.replace("canonical_hash TEXT DEFAULT NULL,", ""))
+    boardValues = {boardID: ([boardID % 9]*rows*columns, [(boardID+1) % 9]*rows*columns) for boardID in range(1, 6)}
+    boardValues[2] = boardValues[1]
+    for boardID, (initialBoard, finalBoard) in boardValues.items():
+      self.db._executeCommand("""INSERT INTO boards{}x{}(id, initial_board, final_board, creation_date, stats)
+                                 VALUES(?, ?, ?, ?, '{{}}')""".format(rows, columns),
+                              data=[boardID, json.dumps(initialBoard), json.dumps(finalBoard),
+                                    json.dumps(str(datetime.datetime.utcnow()))])
+    
+    # TEST: boards with a canonical hash can be stored and loaded
+    initialBoard = [1]*rows*columns
+    self.db.storeBoard(rows=rows, columns=columns, boardID=6,
+                       initialBoard=initialBoard, finalBoard=initialBoard,
+                       creationDate=str(datetime.datetime.utcnow()), stats={},
+                       canonicalHash="abc")
+    self.assertRaises(DuplicateBoardError, self.db.storeBoard, rows=rows, columns=columns, boardID=8,
+                      initialBoard=initialBoard, finalBoard=initialBoard,
+                      creationDate=str(datetime.datetime.utcnow()), stats={},
+                      canonicalHash="abc")
+    self.assertEqual(self.db.loadBoard(rows=rows, columns=columns, boardID=6).getBoardStats("canonical_hash"), "abc")
+    self.assertIn((rows, columns), self.db.preparedTables)
+    
+    # TEST: older boards were given their canonical hash, except the duplicate
+    for boardID, (initialBoard, finalBoard) in boardValues.items():
+      canonicalHash = Board.canonicalHash(np.reshape(initialBoard, (rows, columns)),
+                                          np.reshape(finalBoard, (rows, columns)))
+      loadedHash = self.db.loadBoard(rows=rows, columns=columns, boardID=boardID).getBoardStats("canonical_hash")
+      self.assertEqual(loadedHash, None if boardID == 2 else canonicalHash)
+    
+    # TEST: older boards are duplicates of new ones
+    self.assertRaises(DuplicateBoardError, self.db.storeBoard, rows=rows, columns=columns, boardID=7,
+                      initialBoard=boardValues[3][0], finalBoard=boardValues[3][1],
+                      creationDate=str(datetime.datetime.utcnow()), stats={},
+                      canonicalHash=Board.canonicalHash(np.reshape(boardValues[3][0], (rows, columns)),
+                                                        np.reshape(boardValues[3][1], (rows, columns))))
+  
+  
+  @unittest.skipIf(not TEST_ALL, " not part of individual test")
+  def test_uniqueCanonicalHash(self):
+    """ The database refuses a duplicate board from another connection """
+    
+    rows    = 10
+    columns = 10
+    
+    # two writers that have both prepared the table
+    otherDB = Database(self.dbName)
+    for db, boardID in [(self.db, 1), (otherDB, 2)]:
+      db.storeBoard(rows=rows, columns=columns, boardID=boardID,
+                    initialBoard=[boardID]*rows*columns, finalBoard=[boardID]*rows*columns,
+                    creationDate=str(datetime.datetime.utcnow()), stats={},
+                    canonicalHash=str(boardID))
+    
+    # TEST: both try to store the same board
+    storeArgs = {"rows": rows, "columns": columns, "initialBoard": [3]*rows*columns,
+                 "finalBoard": [3]*rows*columns, "creationDate": str(datetime.datetime.utcnow()),
+                 "stats": {}, "canonicalHash": "3"}
+    self.db.storeBoard(boardID=3, **storeArgs)
+    self.assertRaises(DuplicateBoardError, otherDB.storeBoard, boardID=4, **storeArgs)
+    
+    # TEST: IDs are unique too
+    storeArgs["canonicalHash"] = "4"
+    self.assertRaises(SystemError, otherDB.storeBoard, boardID=3, **storeArgs)
+    self.assertEqual(self.db.getBoardsInfo()[(rows, columns)]["length"], 3)
@@ -0,0 +1,98 @@
+import unittest
+
+import datetime
+import os
+
+import numpy as np
+
+from fillomino.board import Board
+from fillomino.database import Database, DatabaseInfo
+from fillomino.difficulty import DifficultyRater
+from fillomino.solver import Solver
+
+class test_DifficultyRater(unittest.TestCase):
+  
+  # perform all tests in this class
+  TEST_ALL = True
+  
+  @classmethod
+  def setUpClass(cls):
+    pass
+  
+  def setUp(self):
+    self.dbName = "testDifficultyDB.db"
+    
+    # make sure the test database doesn't already exist
+    if os.path.exists(self.dbName):
+      raise FileExistsError("test database {} already exists".format(self.dbName))
+  
+  def tearDown(self):
+    
+    # delete the test database
+    if os.path.exists(self.dbName):
+      os.remove(self.dbName)
+  
+  @unittest.skipIf(not TEST_ALL, " not part of individual test")
+  def test_rating(self):
+    """ Boards with fewer clues rate harder """
+    
+    board      = Board.getExampleBoard()
+    difficulty = DifficultyRater.rateBoard(board)
+    
+    # the example board can be solved without guessing
+    self.assertEqual(difficulty["logic_solved"], 1.0)
+    self.assertEqual(difficulty["search_nodes"], 1)
+    self.assertEqual(set(difficulty["rules"]), set(Solver.RULES))
+    self.assertGreaterEqual(difficulty["rating"], 1)
+    
+    # removing clues needs guessing
+    clues = board.getInitialValues().copy()
+    clues.flat[np.flatnonzero(clues)[::3]] = 0
+    harder = DifficultyRater.rateValues(clues, board.getFinalValues())
+    self.assertLess(harder["logic_solved"], 1.0)
+    self.assertGreater(harder["search_nodes"], 1)
+    self.assertGreater(harder["rating"], difficulty["rating"])
+    
+    # clues that can't be solved aren't rated
+    self.assertIsNone(DifficultyRater.rateValues(np.array([[2, 2], [2, 0]])))
+  
+  @unittest.skipIf(not TEST_ALL, " not part of individual test")
+  def test_rateDatabase(self):
+    """ Ratings are stored in the board stats, and boards can be loaded by rating """
+    
+    numBoards = 3
+    
+    DatabaseInfo.createDatabase(self.dbName)
+    db = Database(self.dbName)
+    
+    board = Board.getExampleBoard()
+    for boardID in range(1, numBoards+1):
+      db.storeBoard(rows         = 20,
+                    columns      = 20,
+                    boardID      = boardID,
+                    initialBoard = list(map(int, board.getInitialValues().flatten())),
+                    finalBoard   = list(map(int, board.getFinalValues().flatten())),
+                    creationDate = str(datetime.datetime.utcnow()),
+                    stats        = {"a": boardID})
+    
+    # no boards are rated yet
+    self.assertIsNone(db.loadBoardByDifficulty(20, 20))
+    
+    # rate every board, only once
+    self.assertEqual(DifficultyRater.rateDatabase(self.dbName, maxWorkers=2), numBoards)
+    self.assertEqual(DifficultyRater.rateDatabase(self.dbName, maxWorkers=2), 0)
+    
+    # other stats are kept
+    rating = DifficultyRater.rateBoard(board)["rating"]
+    for boardID, _, _, stats in db.loadBoardsData(20, 20):
+      self.assertEqual(stats["a"], boardID)
+      self.assertEqual(stats[DifficultyRater.STATS_KEY]["rating"], rating)
+    
+    # load by rating
+    loaded = db.loadBoardByDifficulty(20, 20, minRating=rating, maxRating=rating, excludeID=1)
+    self.assertIn(loaded.getID(), [2, 3])
+    self.assertIsNone(db.loadBoardByDifficulty(20, 20, minRating=rating+0.1))
+
+
+if __name__ == '__main__':
+  unittest.main()
@@ -0,0 +1,71 @@
+import unittest
+
+import numpy as np
+
+from fillomino.board import Board
+from fillomino.exactcover import ExactCoverSolver
+from fillomino.solver import Solver
+
+class test_ExactCoverSolver(unittest.TestCase):
+  
+  # perform all tests in this class
+  TEST_ALL = True
+  
+  @classmethod
+  def setUpClass(cls):
+    pass
+  
+  def setUp(self):
+    pass
+  
+  @unittest.skipIf(not TEST_ALL, " not part of individual test")
+  def test_uniqueBoard(self):
+    """ The example board has exactly one solution """
+    
+    board = Board.getExampleBoard()
+    
+    self.assertEqual(ExactCoverSolver.countBoardSolutions(board), Solver.SOLUTIONS_UNIQUE)
+    
+    solver = ExactCoverSolver(board.getInitialValues())
+    self.assertEqual(solver.countSolutions(), Solver.SOLUTIONS_UNIQUE)
+    self.assertTrue(np.array_equal(solver.solve(), board.getFinalValues()))
+  
+  @unittest.skipIf(not TEST_ALL, " not part of individual test")
+  def test_solutionCounts(self):
+    """ Solution counts match the propagation solver """
+    
+    # no solutions
+    self.assertEqual(ExactCoverSolver(np.array([[5, 0], [0, 0]])).countSolutions(), Solver.SOLUTIONS_NONE)
+    self.assertIsNone(ExactCoverSolver(np.array([[2, 2], [2, 0]])).solve())
+    
+    # every solution of some small boards
+    for clues in [np.zeros((3, 3), np.int8), np.array([[0, 0, 0, 0], [0, 3, 0, 0], [0, 0, 0, 2]], np.int8)]:
+      solver = ExactCoverSolver(clues)
+      numSolutions = solver.countSolutions(limit=1000)
+      self.assertEqual(numSolutions, Solver(clues).countSolutions(limit=1000))
+      self.assertEqual(len({solution.tobytes() for solution in solver.solutions}), numSolutions)
+      for solution in solver.solutions:
+        _, _, _, status = Board.labelGroups(solution)
+        self.assertTrue((status[1:] == Board.GROUP_VALID).all())
+        self.assertTrue(((clues == 0) | (clues == solution)).all())
+  
+  @unittest.skipIf(not TEST_ALL, " not part of individual test")
+  def test_removedClues(self):
+    """ With clues removed, counts match the propagation solver, and a guide is found first """
+    
+    numTests = 3
+    
+    finalValues = Board.getExampleBoard().getFinalValues()
+    
+    for _ in range(numTests):
+      
+      clues = finalValues.copy()
+      clues.flat[np.random.choice(clues.size, 80, replace=False)] = 0
+      
+      solver = ExactCoverSolver(clues, guide=finalValues)
+      self.assertEqual(solver.countSolutions(limit=3), Solver(clues, guide=finalValues).countSolutions(limit=3))
+      self.assertTrue(np.array_equal(solver.solutions[0], finalValues))
+
+
+if __name__ == '__main__':
+  unittest.main()
@@ -0,0 +1,206 @@
+import unittest
+
+import numpy as np
+
+from boardGenerator.generator import BoardGenerator, CellSet, GenerationFailedError
+from fillomino.board import Board
+from fillomino.solver import Solver
+
+class test_BoardGenerator(unittest.TestCase):
+  
+  # perform all tests in this class
+  TEST_ALL = True
+  
+  @classmethod
+  def setUpClass(cls):
+    pass
+  
+  def setUp(self):
+    pass
+  
+  @staticmethod
+  def _generateBoard(rows, columns, seed=None, **kwargs):
+    """ Generate a board, retrying with the same random stream until generation succeeds """
+    rng = np.random.default_rng(seed)
+    while True:
+      try:
+        return BoardGenerator(rows, columns, seed=rng, **kwargs).generate()
+      except GenerationFailedError:
+        pass
+  
+  @unittest.skipIf(not TEST_ALL, " not part of individual test")
+  def test_cellSet(self):
+    """ Cell sets behave like sets of (row, column) cells """
+    
+    rows, columns = 6, 7
+    rng     = np.random.default_rng()
+    cellSet = CellSet(rows, columns)
+    cells   = set()
+    self.assertFalse(cellSet)
+    self.assertIsNone(cellSet.pop())
+    
+    # TEST: random adds and removes match a set
+    for _ in range(500):
+      cell = (int(rng.integers(-1, rows+1)), int(rng.integers(-1, columns+1)))
+      if rng.random() < 0.5:
+        cellSet.remove(cell)
+        cells.discard(cell)
+      elif 0 <= cell[0] < rows and 0 <= cell[1] < columns:
+        cellSet.append(cell)
+        cells.add(cell)
+      
+      self.assertEqual(len(cellSet), len(cells))
+      self.assertEqual(cell in cellSet, cell in cells)
+      self.assertEqual(set(cellSet), cells)
+    
+    # TEST: random cells and the mask come from the set
+    if cells:
+      self.assertIn(cellSet.randomCell(rng), cells)
+    self.assertEqual({tuple(cell) for cell in np.argwhere(cellSet.toMask()).tolist()}, cells)
+    
+    # TEST: copies are independent, and popping empties the set
+    filledSet = CellSet.filledSet(rows, columns)
+    copySet   = filledSet.copy()
+    popped    = {filledSet.pop() for _ in range(rows * columns)}
+    self.assertEqual(len(popped), rows * columns)
+    self.assertFalse(filledSet)
+    self.assertEqual(len(copySet), rows * columns)
+  
+  @unittest.skipIf(not TEST_ALL, " not part of individual test")
+  def test_findBlankRegions(self):
+    """ Free cells are split into their connected regions """
+    
+    freeCells = CellSet(5, 5)
+    for cell in [(0, 0), (0, 1), (1, 1), (2, 1), (2, 0), (4, 0), (3, 3), (3, 4), (4, 4), (2, 4)]:
+      freeCells.append(cell)
+    
+    regions = BoardGenerator.findBlankRegions(freeCells)
+    self.assertEqual(sorted(sorted(region) for region in regions),
+                     [[(0, 0), (0, 1), (1, 1), (2, 0), (2, 1)],
+                      [(2, 4), (3, 3), (3, 4), (4, 4)],
+                      [(4, 0)]])
+    self.assertEqual(len(freeCells), 10)
+  
+  @unittest.skipIf(not TEST_ALL, " not part of individual test")
+  def test_addInitialOnes(self):
+    """ 1s are added apart from each other, without walling in blank cells """
+    
+    rows, columns = 12, 9
+    rng = np.random.default_rng()
+    
+    for _ in range(10):
+      board = Board(rows=rows, columns=columns)
+      usedCells = BoardGenerator.addInitialOnes(board, 25, rng)
+      values = board.getValues()
+      
+      self.assertEqual(len(usedCells), 25)
+      self.assertEqual(set(usedCells), {tuple(cell) for cell in np.argwhere(values == 1).tolist()})
+      self.assertTrue(board.isBoardValid())
+      
+      # TEST: every blank cell has a neighbour that isn't a 1
+      padded = np.pad(values != 1, 1)
+      notOne = padded[:-2, 1:-1] | padded[2:, 1:-1] | padded[1:-1, :-2] | padded[1:-1, 2:]
+      self.assertTrue(notOne[values == 0].all())
+    
+    # TEST: generation fails when there's no room for the 1s
+    board = Board(rows=rows, columns=columns)
+    self.assertRaises(GenerationFailedError, BoardGenerator.addInitialOnes, board, rows * columns // 2, rng)
+  
+  @unittest.skipIf(not TEST_ALL, " not part of individual test")
+  def test_seed(self):
+    """ The same seed and size always make the same board """
+    
+    for seed in range(3):
+      board      = test_BoardGenerator._generateBoard(10, 12, seed=seed, uniqueSolution=True)
+      sameBoard  = test_BoardGenerator._generateBoard(10, 12, seed=seed, uniqueSolution=True)
+      otherBoard = test_BoardGenerator._generateBoard(10, 12, seed=seed+100, uniqueSolution=True)
+      
+      self.assertTrue(np.array_equal(board.getFinalValues(), sameBoard.getFinalValues()))
+      self.assertTrue(np.array_equal(board.getInitialValues(), sameBoard.getInitialValues()))
+      self.assertFalse(np.array_equal(board.getFinalValues(), otherBoard.getFinalValues()))
+    
+    # TEST: streams spawned from one seed make different boards
+    boards = [test_BoardGenerator._generateBoard(10, 12, seed=childSeed)
+              for childSeed in np.random.SeedSequence(0).spawn(3)]
+    self.assertFalse(np.array_equal(boards[0].getFinalValues(), boards[1].getFinalValues()))
+    self.assertFalse(np.array_equal(boards[1].getFinalValues(), boards[2].getFinalValues()))
+  
+  @unittest.skipIf(not TEST_ALL, " not part of individual test")
+  def test_makeUnique(self):
+    """ Clues are added until boards have exactly one solution """
+    
+    numTests = 3
+    
+    # a board that already has one solution
+    board = Board.getExampleBoard()
+    uniqueBoard, numCluesAdded = BoardGenerator.makeUnique(board)
+    self.assertEqual(numCluesAdded, 0)
+    self.assertTrue(np.array_equal(uniqueBoard.getInitialValues(), board.getInitialValues()))
+    
+    for _ in range(numTests):
+      board = test_BoardGenerator._generateBoard(10, 10)
+      uniqueBoard, numCluesAdded = BoardGenerator.makeUnique(board)
+      initialValues = uniqueBoard.getInitialValues()
+      
+      # only clues from the final values are added
+      added = initialValues != board.getInitialValues()
+      self.assertEqual(np.count_nonzero(added), numCluesAdded)
+      self.assertTrue((board.getInitialValues()[added] == 0).all())
+      self.assertTrue((initialValues[added] == board.getFinalValues()[added]).all())
+      self.assertEqual(Solver.countBoardSolutions(uniqueBoard), Solver.SOLUTIONS_UNIQUE)
+    
+    # TEST: hardly any of the added clues could be left out again
+    board = test_BoardGenerator._generateBoard(15, 15, seed=5)
+    uniqueBoard, numCluesAdded = BoardGenerator.makeUnique(board)
+    initialValues = uniqueBoard.getInitialValues()
+    finalValues   = board.getFinalValues()
+    numUnneeded = 0
+    for row, column in np.argwhere(initialValues != board.getInitialValues()).tolist():
+      clues = initialValues.copy()
+      clues[row, column] = 0
+      solver = Solver(clues, guide=finalValues)
+      values, masks = solver.getInitialState()
+      masks[row, column] &= ~Solver.DIGIT_BITS[finalValues[row, column]]
+      if solver.countSolutions(limit=1, values=values, masks=masks) == 0:
+        numUnneeded += 1
+    self.assertLessEqual(numUnneeded, max(2, numCluesAdded // 5))
+    
+    # the generator records what it cost
+    board = test_BoardGenerator._generateBoard(10, 10, uniqueSolution=True)
+    self.assertEqual(Solver.countBoardSolutions(board), Solver.SOLUTIONS_UNIQUE)
+    self.assertEqual(set(board.getBoardStats("stats")["uniqueness"]), {"seconds", "clues_added"})
+  
+  @unittest.skipIf(not TEST_ALL, " not part of individual test")
+  def test_minimiseClues(self):
+    """ Minimised boards are uniquely solvable, with clues from the final values """
+    
+    numTests = 2
+    
+    for _ in range(numTests):
+      board = test_BoardGenerator._generateBoard(10, 10, minimiseClues=True)
+      initialValues = board.getInitialValues()
+      finalValues   = board.getFinalValues()
+      
+      self.assertTrue(np.array_equal(board.getValues(), initialValues))
+      self.assertTrue(((initialValues == 0) | (initialValues == finalValues)).all())
+      self.assertEqual(Solver.countBoardSolutions(board), Solver.SOLUTIONS_UNIQUE)
+    
+    # TEST: clues of 8 and 9 are only removed if the board stays unique
+    rng = np.random.default_rng(2)
+    while True:
+      board = test_BoardGenerator._generateBoard(10, 10, seed=rng)
+      if (board.getInitialValues() == 8).any() and (board.getInitialValues() == 9).any():
+        break
+    board, _ = BoardGenerator.makeUnique(board)
+    minimised = BoardGenerator.minimiseClues(board, rng)
+    initialValues = minimised.getInitialValues()
+    
+    self.assertTrue(((initialValues == 0) | (initialValues == board.getFinalValues())).all())
+    removed = (initialValues == 0) & (board.getInitialValues() != 0)
+    self.assertTrue((board.getInitialValues()[removed] == 8).any())
+    self.assertTrue((board.getInitialValues()[removed] == 9).any())
+    self.assertEqual(Solver(initialValues).countSolutions(), Solver.SOLUTIONS_UNIQUE)
+
+
+if __name__ == '__main__':
+  unittest.main()
@@ -0,0 +1,70 @@
+import unittest
+
+import numpy as np
+
+from fillomino.board import Board
+from fillomino.hints import HintEngine
+from fillomino.solver import Solver
+
+class test_HintEngine(unittest.TestCase):
+  
+  # perform all tests in this class
+  TEST_ALL = True
+  
+  @classmethod
+  def setUpClass(cls):
+    pass
+  
+  def setUp(self):
+    pass
+  
+  @unittest.skipIf(not TEST_ALL, " not part of individual test")
+  def test_followHints(self):
+    """ Following the hints solves the example board """
+    
+    board  = Board.getExampleBoard()
+    engine = HintEngine(board.getInitialValues())
+    values = board.getInitialValues().copy()
+    
+    while (values == 0).any():
+      hint = engine.getHint(values)
+      self.assertIsNotNone(hint)
+      
+      row, column, digit, rule = hint
+      self.assertEqual(values[row, column], 0)
+      self.assertEqual(digit, board.getFinalValues()[row, column])
+      self.assertIn(rule, Solver.RULES)
+      values[row, column] = digit
+    
+    self.assertIsNone(engine.getHint(values))
+    self.assertFalse(engine.contradiction)
+  
+  @unittest.skipIf(not TEST_ALL, " not part of individual test")
+  def test_changedValues(self):
+    """ Hints follow the player's own changes """
+    
+    board  = Board.getExampleBoard()
+    engine = HintEngine(board.getInitialValues())
+    values = board.getInitialValues().copy()
+    
+    # fill in some cells, then take them out again
+    for _ in range(20):
+      row, column, digit, _ = engine.getHint(values)
+      values[row, column] = digit
+    filled = np.argwhere(values != board.getInitialValues())
+    for row, column in filled[::2]:
+      values[row, column] = 0
+    
+    row, column, digit, _ = engine.getHint(values)
+    self.assertEqual(values[row, column], 0)
+    self.assertEqual(digit, board.getFinalValues()[row, column])
+    
+    # a group that's too big can't be solved
+    values = board.getInitialValues().copy()
+    values[0, :3] = [1, 1, 1]
+    self.assertIsNone(engine.getHint(values))
+    self.assertTrue(engine.contradiction)
+
+
+if __name__ == '__main__':
+  unittest.main()
@@ -0,0 +1,122 @@
+import unittest
+
+import os
+
+import numpy as np
+
+from scipy import ndimage
+
+from fillomino.polyomino import PolyominoLibrary
+
+class test_PolyominoLibrary(unittest.TestCase):
+  
+  # perform all tests in this class
+  TEST_ALL = True
+  
+  @classmethod
+  def setUpClass(cls):
+    pass
+  
+  def setUp(self):
+    self.cacheFile = "testPolyominoes.npz"
+  
+  def tearDown(self):
+    
+    # delete the test cache
+    if os.path.exists(self.cacheFile):
+      os.remove(self.cacheFile)
+  
+  @unittest.skipIf(not TEST_ALL, " not part of individual test")
+  def test_shapes(self):
+    """ Every fixed polyomino is there once, anchored at its first cell """
+    
+    for size in range(1, PolyominoLibrary.MAX_SIZE+1):
+      
+      shapes = PolyominoLibrary.getShapes(size)
+      self.assertEqual(shapes.shape, (PolyominoLibrary.FIXED_COUNTS[size], size, 2))
+      self.assertEqual(len({shape.tobytes() for shape in shapes}), len(shapes))
+      
+      # anchored at (0,0), with the cells in row-major order
+      self.assertTrue((shapes[:, 0] == 0).all())
+      order = shapes[:, :, 0].astype(int) * 100 + shapes[:, :, 1]
+      self.assertTrue((np.diff(order, axis=1) > 0).all())
+      
+      # connected
+      for shape in shapes[::max(1, len(shapes) // 50)]:
+        grid = np.zeros((size, 2*size), bool)
+        grid[shape[:, 0], shape[:, 1] + size] = True
+        self.assertEqual(ndimage.label(grid)[1], 1)
+    
+    with self.assertRaises(ValueError):
+      PolyominoLibrary.getShapes(10)
+  
+  @unittest.skipIf(not TEST_ALL, " not part of individual test")
+  def test_placements(self):
+    """ Placements only use allowed cells, and cover the given cell """
+    
+    numTests = 20
+    
+    for _ in range(numTests):
+      
+      rows, columns = np.random.randint(1, 8, 2)
+      size    = int(np.random.randint(1, PolyominoLibrary.MAX_SIZE+1))
+      allowed = np.random.random((rows, columns)) < 0.8
+      
+      # every placement, found by placing each shape at each cell
+      expected = set()
+      for shape in PolyominoLibrary.getShapes(size):
+        for row in range(rows):
+          for column in range(columns):
+            cells = shape + (row, column)
+            if (cells >= 0).all() and (cells < (rows, columns)).all() and allowed[cells[:, 0], cells[:, 1]].all():
+              expected.add(tuple(sorted(cells[:, 0] * columns + cells[:, 1])))
+      
+      placements = PolyominoLibrary.getPlacements(allowed, size)
+      self.assertEqual(len(placements), len(expected))
+      self.assertEqual({tuple(sorted(placement)) for placement in placements}, expected)
+      
+      # the placements covering a cell
+      row, column = np.random.randint(rows), np.random.randint(columns)
+      covering = PolyominoLibrary.getPlacements(allowed, size, (row, column))
+      self.assertEqual({tuple(sorted(placement)) for placement in covering},
+                       {placement for placement in expected if row * columns + column in placement})
+  
+  @unittest.skipIf(not TEST_ALL, " not part of individual test")
+  def test_placementsOnLargeBoards(self):
+    """ Placements covering cells beyond the range of the shapes' own offsets """
+    
+    for rows, columns, cell in [(140, 140, (130, 135)), (6, 300, (3, 200)), (300, 6, (250, 2))]:
+      for size in [4, 7]:
+        
+        allowed = np.random.random((rows, columns)) < 0.8
+        allowed[cell] = True
+        
+        # every placement covering the cell, found by putting each of each shape's cells on it
+        expected = set()
+        for shape in PolyominoLibrary.getShapes(size).astype(int):
+          for pivot in shape:
+            cells = shape - pivot + cell
+            if (cells >= 0).all() and (cells < (rows, columns)).all() and allowed[cells[:, 0], cells[:, 1]].all():
+              expected.add(tuple(sorted(cells[:, 0] * columns + cells[:, 1])))
+        
+        covering = PolyominoLibrary.getPlacements(allowed, size, cell)
+        self.assertGreater(len(expected), 0)
+        self.assertEqual({tuple(sorted(placement)) for placement in covering}, expected)
+  
+  @unittest.skipIf(not TEST_ALL, " not part of individual test")
+  def test_cache(self):
+    """ The shapes are written to, and read back from, the cache """
+    
+    shapes = PolyominoLibrary.shapes
+    try:
+      PolyominoLibrary.loadShapes(self.cacheFile)
+      self.assertTrue(os.path.exists(self.cacheFile))
+      PolyominoLibrary.loadShapes(self.cacheFile)
+      for size in range(1, PolyominoLibrary.MAX_SIZE+1):
+        self.assertTrue(np.array_equal(PolyominoLibrary.getShapes(size), shapes[size]))
+    finally:
+      PolyominoLibrary.loadShapes()
+
+
+if __name__ == '__main__':
+  unittest.main()
@@ -0,0 +1,137 @@
+import unittest
+
+import numpy as np
+
+from boardGenerator.generator import BoardGenerator, GenerationFailedError
+from fillomino.board import Board
+from fillomino.solver import SearchLimitError, Solver
+
+class test_Solver(unittest.TestCase):
+  
+  # perform all tests in this class
+  TEST_ALL = True
+  
+  @classmethod
+  def setUpClass(cls):
+    pass
+  
+  def setUp(self):
+    pass
+  
+  def _checkSolution(self, clues, solution):
+    """ A solution is complete, valid, and keeps the clues """
+    
+    _, _, _, status = Board.labelGroups(solution)
+    self.assertTrue((solution > 0).all())
+    self.assertTrue((status[1:] == Board.GROUP_VALID).all())
+    self.assertTrue(((clues == 0) | (clues == solution)).all())
+  
+  @unittest.skipIf(not TEST_ALL, " not part of individual test")
+  def test_uniqueBoard(self):
+    """ The example board has exactly one solution """
+    
+    board = Board.getExampleBoard()
+    
+    self.assertEqual(Solver.countBoardSolutions(board), Solver.SOLUTIONS_UNIQUE)
+    
+    # solve it without knowing the answer
+    solver = Solver(board.getInitialValues())
+    self.assertEqual(solver.countSolutions(), Solver.SOLUTIONS_UNIQUE)
+    self.assertTrue(np.array_equal(solver.solutions[0], board.getFinalValues()))
+    self.assertTrue(np.array_equal(solver.solve(), board.getFinalValues()))
+  
+  @unittest.skipIf(not TEST_ALL, " not part of individual test")
+  def test_solutionCounts(self):
+    """ Boards with no solutions, and with more than one """
+    
+    # a 5 walled into a 4-cell board
+    self.assertEqual(Solver(np.array([[5, 0], [0, 0]])).countSolutions(), Solver.SOLUTIONS_NONE)
+    self.assertIsNone(Solver(np.array([[5, 0], [0, 0]])).solve())
+    
+    # a group that is already too big
+    self.assertEqual(Solver(np.array([[2, 2], [2, 0]])).countSolutions(), Solver.SOLUTIONS_NONE)
+    
+    # a blank board
+    solver = Solver(np.zeros((3, 3), np.int8))
+    self.assertEqual(solver.countSolutions(), Solver.SOLUTIONS_MULTIPLE)
+    self.assertEqual(solver.countSolutions(limit=5), 5)
+    solutions = {solution.tobytes() for solution in solver.solutions}
+    self.assertEqual(len(solutions), 5)
+    for solution in solver.solutions:
+      self._checkSolution(np.zeros((3, 3), np.int8), solution)
+    
+    # a search that needs more nodes than it's allowed
+    with self.assertRaises(SearchLimitError):
+      solver.countSolutions(limit=1000, maxNodes=10)
+    self.assertEqual(solver.countSolutions(limit=1000), 445)
+  
+  @unittest.skipIf(not TEST_ALL, " not part of individual test")
+  def test_removedClues(self):
+    """ Every solution found keeps the clues, and a guide doesn't change the count """
+    
+    numTests = 5
+    
+    finalValues = Board.getExampleBoard().getFinalValues()
+    
+    for _ in range(numTests):
+      
+      # blank out some random cells of the solution
+      clues = finalValues.copy()
+      clues.flat[np.random.choice(clues.size, 80, replace=False)] = 0
+      
+      solver = Solver(clues)
+      numSolutions = solver.countSolutions(limit=3)
+      self.assertGreaterEqual(numSolutions, 1)
+      for solution in solver.solutions:
+        self._checkSolution(clues, solution)
+      
+      guided = Solver(clues, guide=finalValues)
+      self.assertEqual(guided.countSolutions(limit=3), numSolutions)
+      self.assertTrue(np.array_equal(guided.solutions[0], finalValues))
+  
+  @unittest.skipIf(not TEST_ALL, " not part of individual test")
+  def test_unguidedCount(self):
+    """ A generated 20x20 board is counted in few search nodes without knowing its solution """
+    
+    rng = np.random.default_rng(12)
+    while True:
+      try:
+        board = BoardGenerator(20, 20, uniqueSolution=True, seed=rng).generate()
+        break
+      except GenerationFailedError:
+        pass
+    
+    # raises SearchLimitError if the search needs more nodes
+    solver = Solver(board.getInitialValues())
+    self.assertEqual(solver.countSolutions(limit=2, maxNodes=500), Solver.SOLUTIONS_UNIQUE)
+    self.assertTrue(np.array_equal(solver.solutions[0], board.getFinalValues()))
+  
+  @unittest.skipIf(not TEST_ALL, " not part of individual test")
+  def test_deductions(self):
+    """ Single deduction rules """
+    
+    # the 2 must grow into its only free neighbour
+    values = np.array([[2, 0, 1],
+                       [1, 0, 0]], np.int8)
+    solver = Solver(values)
+    values, masks = solver.getInitialState()
+    assignments, _ = solver.deduce(values, masks)
+    self.assertIn((0, 1, 2, Solver.RULE_SINGLE_LIBERTY), assignments)
+    
+    # blanks next to a complete group can't have its digit
+    values = np.array([[1, 0, 0]], np.int8)
+    masks  = Solver.digitMasks(values)
+    Solver(values).deduce(values, masks)
+    self.assertFalse(masks[0, 1] & Solver.DIGIT_BITS[1])
+    
+    # propagation alone solves it
+    values = np.array([[3, 0, 0],
+                       [1, 2, 0]], np.int8)
+    solver = Solver(values)
+    values, masks = solver.getInitialState()
+    self.assertTrue(solver.propagate(values, masks))
+    self.assertTrue(np.array_equal(values, [[3, 3, 3], [1, 2, 2]]))
+
+
+if __name__ == '__main__':
+  unittest.main()